@@ -0,0 +1,372 @@
+# code/clean_dataset.py
+#
+# One pass over the dataset that replaces convert_jpg.py, preprocess_data.py,
+# remove_blur.py, reduce_train.py and final_reduce.py. Every image is read
+# and decoded exactly once, in a process pool, and in that single decode we
+# get its size, blur score (Laplacian variance), content hash, perceptual
+# hashes (for near_duplicates.py) and the resized JPEG. The keep/drop rules are then applied per breed:
+#
+#   unreadable → too small → blurry → duplicate → over the split quota
+#
+# Kept images are written as .jpg to TARGET_DIR/<split>/<breed>/; the
+# source tree is never modified. The source is either a folder tree or the
+# raw split index from split_index.py (--source-index), and the kept images
+# are listed in TARGET_DIR/splits.csv: the index of the cleaned dataset that
+# train.py (split_index_path) and the backend evaluators should read. With a
+# flat <breed>/<image> source, the index assigns splits with the same
+# hash as split_index.py.
+#
+# Blur and the duplicate hash are measured on the image after it has been
+# resized to TARGET_SIZE, which is where the old remove_blur.py measured
+# them (on processed_dataset, after preprocess_data.py). BLUR_THRESHOLD is
+# calibrated for that scale, and images that only become identical once
+# resized are still caught as duplicates. Width and height stay those of
+# the original, for the MIN_WIDTH/MIN_HEIGHT rule.
+#
+# Metrics are stored in the manifest (manifest.py), so a re-run only
+# decodes new or changed files; everything else is re-judged from the
+# stored size, blur score and hash. Outputs of images that are now dropped
+# are removed from the target. The manifest records the size the metrics
+# were taken at, so changing TARGET_SIZE re-measures everything; use a
+# fresh target as well.
+#
+#   python clean_dataset.py --source dataset --target processed_dataset --workers 8
+#   python clean_dataset.py --source-index splits.csv --target processed_dataset
+
+import argparse
+import hashlib
+import os
+import shutil
+import time
+from collections import Counter, defaultdict
+from functools import partial
+from multiprocessing import Pool
+
+import cv2
+import numpy as np
+
+from manifest import MANIFEST_PATH, Manifest
+from split_index import assign_split, read_index, write_index
+
+# ---------------- CONFIG ----------------
+SOURCE_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\dataset"
+TARGET_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\processed_dataset"
+SPLITS = ["train", "val", "test"]
+TARGET_IMAGES = {"train": 60, "val": 20, "test": 20}   # per breed, per split
+MIN_WIDTH = 100
+MIN_HEIGHT = 100
+BLUR_THRESHOLD = 100.0    # Laplacian variance; lower = more blurry
+TARGET_SIZE = (224, 224)  # None keeps the original size
+JPEG_QUALITY = 95
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def list_images(source_dir, splits=SPLITS):
+    """(path, split, breed) for every image; split is None for a flat breed-folder layout."""
+    tasks = []
+    layout = [(s, os.path.join(source_dir, s)) for s in splits if os.path.isdir(os.path.join(source_dir, s))]
+    if not layout:
+        layout = [(None, source_dir)]
+    for split, split_dir in layout:
+        for breed in sorted(os.listdir(split_dir)):
+            breed_dir = os.path.join(split_dir, breed)
+            if not os.path.isdir(breed_dir):
+                continue
+            for name in sorted(os.listdir(breed_dir)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    tasks.append((os.path.join(breed_dir, name), split, breed))
+    return tasks
+
+
+def list_index(index_path, splits=SPLITS):
+    """(path, split, breed) from a split index, grouped like list_images()."""
+    order = {split: i for i, split in enumerate(splits)}
+    entries = [(path, split, breed) for path, breed, split in read_index(index_path)
+               if split in order and path.lower().endswith(IMAGE_EXTENSIONS)]
+    return sorted(entries, key=lambda t: (order[t[1]], t[2], os.path.basename(t[0])))
+
+# ---------------- PER-IMAGE WORK (runs in the pool) ----------------
+METRICS = ("width", "height", "blur", "hash", "phash", "dhash", "metrics_size")
+
+
+def metrics_size(target_size):
+    """How the manifest records the scale blur and hashes were measured at."""
+    return "x".join(map(str, target_size)) if target_size else "original"
+
+
+def blur_score(gray):
+    """Return Laplacian variance (higher = sharper)"""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def _bits_to_hex(bits):
+    return np.packbits(bits.flatten()).tobytes().hex()
+
+
+def phash(gray):
+    """64-bit DCT perceptual hash as 16 hex chars; survives resizing and recompression."""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    return _bits_to_hex(low > np.median(low))
+
+
+def dhash(gray):
+    """64-bit gradient hash as 16 hex chars."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    return _bits_to_hex(small[:, 1:] > small[:, :-1])
+
+
+def decode(path):
+    """BGR image, or None if it cannot be read."""
+    try:
+        return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    except Exception:
+        return None
+
+
+def measure(img, target_size=None):
+    """
+    Everything the cleaning rules and the manifest need from one decoded
+    image, and the image resized to target_size (None keeps it as is).
+    Size is that of the original; blur and hashes are taken after resizing.
+    """
+    if img is None:
+        return dict.fromkeys(METRICS), None
+    h, w = img.shape[:2]
+    if target_size:
+        img = cv2.resize(img, target_size)   # same (bilinear) resize as preprocess_data.py
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    return {
+        "width": w,
+        "height": h,
+        "blur": blur_score(gray),
+        # Hash of the decoded pixels: same duplicates as re-encoding + MD5, without the encode
+        "hash": hashlib.md5(img.tobytes()).hexdigest(),
+        "phash": phash(gray),
+        "dhash": dhash(gray),
+        "metrics_size": metrics_size(target_size),
+    }, img
+
+
+def analyze(task, settings):
+    """Decode once; measure the image and, if it can be kept, encode the output JPEG."""
+    path, split, breed = task
+    metrics, img = measure(decode(path), settings["target_size"])
+    record = {"path": path, "split": split, "breed": breed, "name": os.path.basename(path), "jpeg": None}
+    record.update(metrics)
+    record["status"] = classify(record, settings)
+
+    # JPEGs that need no resize are copied byte-for-byte instead of re-encoded
+    if record["status"] == "ok" and (settings["target_size"] or not path.lower().endswith((".jpg", ".jpeg"))):
+        ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, settings["jpeg_quality"]])
+        if ok:
+            record["jpeg"] = buf.tobytes()
+        else:
+            record["status"] = "unreadable"
+    return record
+
+
+def classify(record, settings):
+    """Per-image rules; duplicates and quotas need the whole breed and are applied later."""
+    if record["width"] is None:
+        return "unreadable"
+    if record["width"] < settings["min_width"] or record["height"] < settings["min_height"]:
+        return "too_small"
+    if record["blur"] < settings["blur_threshold"]:
+        return "blurry"
+    return "ok"
+
+
+def from_manifest(task, row, settings):
+    """Rebuild a record from stored metrics, or None if the image has to be decoded."""
+    if row is None or row["readable"] is None or (row["readable"] and row["phash"] is None):
+        return None
+    if row["readable"] and row["metrics_size"] != metrics_size(settings["target_size"]):
+        return None  # blur/hash were measured at another scale
+    path, split, breed = task
+    record = {"path": path, "split": split, "breed": breed, "name": os.path.basename(path),
+              "jpeg": None, "cached": True}
+    record.update({key: row[key] for key in METRICS})
+    record["status"] = classify(record, settings)
+    return record
+
+
+def store_metrics(manifest, record):
+    metrics = {key: record[key] for key in METRICS}
+    manifest.record_metrics(record["path"], dict(metrics, split=record["split"], breed=record["breed"],
+                                                 readable=int(record["width"] is not None)))
+
+# ---------------- PER-BREED RULES ----------------
+def select(records, seen_hashes, quota):
+    """Apply duplicate and quota rules to one breed's records (sorted by name)."""
+    kept = []
+    for r in records:
+        if r["status"] != "ok":
+            continue
+        if r["hash"] in seen_hashes:
+            r["status"] = "duplicate"
+            continue
+        seen_hashes.add(r["hash"])
+        if quota is not None and len(kept) >= quota:
+            r["status"] = "over_quota"
+            continue
+        r["status"] = "kept"
+        kept.append(r)
+    return kept
+
+
+def output_path(record, target_dir):
+    out_dir = os.path.join(target_dir, *(p for p in (record["split"], record["breed"]) if p))
+    return os.path.join(out_dir, os.path.splitext(record["name"])[0] + ".jpg")
+
+
+def write_kept(kept, target_dir, settings):
+    for r in kept:
+        out_path = output_path(r, target_dir)
+        if r.get("cached"):
+            if os.path.exists(out_path):
+                continue  # output already written by an earlier run
+            # Newly kept (e.g. after a threshold change): decode it just for the output
+            r["jpeg"] = analyze((r["path"], r["split"], r["breed"]), settings)["jpeg"]
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        if r["jpeg"] is not None:
+            with open(out_path, "wb") as f:
+                f.write(r["jpeg"])
+        else:
+            shutil.copyfile(r["path"], out_path)
+        r["jpeg"] = None
+
+
+def remove_dropped(records, kept, target_dir):
+    """Delete outputs left by earlier runs for images that are no longer kept."""
+    kept_paths = {output_path(r, target_dir) for r in kept}
+    for r in records:
+        out_path = output_path(r, target_dir)
+        if r["status"] != "kept" and out_path not in kept_paths and os.path.exists(out_path):
+            os.remove(out_path)
+
+
+def report_breed(split, breed, records, kept, quota):
+    reasons = Counter(r["status"] for r in records)
+    dropped = ", ".join(f"{reasons[k]} {k}" for k in ("unreadable", "too_small", "blurry", "duplicate", "over_quota")
+                        if reasons[k])
+    where = f"{breed} in {split}" if split else breed
+    if quota is not None and len(kept) < quota:
+        print(f"⚠️ Breed {where} has only {len(kept)} valid images. Needed {quota}. ({dropped or 'nothing dropped'})")
+    else:
+        print(f"✅ Breed {where}: kept {len(kept)}/{len(records)} images ({dropped or 'nothing dropped'})")
+
+# ---------------- ENGINE ----------------
+def clean(source_dir, target_dir, workers=None, settings=None, quotas=TARGET_IMAGES, manifest=None,
+          source_index=None, index_path=None):
+    """
+    Clean `source_dir` (or the images listed in `source_index`) into
+    `target_dir`; the kept images are indexed in `index_path`
+    (default <target_dir>/splits.csv).
+    """
+    settings = settings or default_settings()
+    tasks = list_index(source_index) if source_index else list_images(source_dir)
+    cached = {}
+    if manifest is not None:
+        for task in tasks:
+            record = from_manifest(task, manifest.lookup(task[0]), settings)
+            if record is not None:
+                cached[task[0]] = record
+    pending = [task for task in tasks if task[0] not in cached]
+    print(f"📂 {len(tasks)} images found in {source_index or source_dir} ({len(cached)} from manifest, {len(pending)} to decode)")
+
+    totals = Counter()
+    summary = defaultdict(dict)   # {split: {breed: kept}}
+    seen_hashes = set()
+    index_rows = []
+    start = time.perf_counter()
+
+    def finish(key, records):
+        split, breed = key
+        quota = quotas.get(split) if split else None
+        kept = select(records, seen_hashes, quota)
+        write_kept(kept, target_dir, settings)
+        remove_dropped(records, kept, target_dir)
+        if manifest is not None:
+            manifest.commit()
+        index_rows.extend((output_path(r, target_dir), breed, split or assign_split(breed, r["name"]))
+                          for r in kept)
+        totals.update(r["status"] for r in records)
+        summary[split][breed] = len(kept)
+        report_breed(split, breed, records, kept, quota)
+
+    # imap keeps task order, so merging it with the cached records keeps
+    # each breed's records contiguous
+    with Pool(workers) as pool:
+        decoded = pool.imap(partial(analyze, settings=settings), pending, chunksize=16)
+        current, batch = None, []
+        for path, _, _ in tasks:
+            record = cached.get(path)
+            if record is None:
+                record = next(decoded)
+                if manifest is not None:
+                    store_metrics(manifest, record)
+            key = (record["split"], record["breed"])
+            if key != current and batch:
+                finish(current, batch)
+                batch = []
+            current = key
+            batch.append(record)
+        if batch:
+            finish(current, batch)
+
+    index_path = index_path or os.path.join(target_dir, "splits.csv")
+    os.makedirs(target_dir, exist_ok=True)
+    write_index(index_rows, index_path)
+    elapsed = time.perf_counter() - start
+    print_summary(summary, totals, len(pending), elapsed)
+    print(f"🗂️ Cleaned dataset index: {index_path}")
+    return summary, totals
+
+
+def default_settings():
+    return {
+        "min_width": MIN_WIDTH,
+        "min_height": MIN_HEIGHT,
+        "blur_threshold": BLUR_THRESHOLD,
+        "target_size": TARGET_SIZE,
+        "jpeg_quality": JPEG_QUALITY,
+    }
+
+
+def print_summary(summary, totals, num_decoded, elapsed):
+    print("\n📊 Cleaned Dataset Summary:")
+    for split, breeds in summary.items():
+        print(f"--- {(split or 'all').upper()} (Total: {sum(breeds.values())} images) ---")
+    print("\nRemoved:")
+    for status in ("unreadable", "too_small", "blurry", "duplicate", "over_quota"):
+        print(f" - {status}: {totals[status]}")
+    print(f"✅ Kept {totals['kept']} of {sum(totals.values())} images")
+    print(f"⏱️ {elapsed:.1f}s, {num_decoded} images decoded ({num_decoded / max(elapsed, 1e-9):.1f} images/sec)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Single-pass, multi-core dataset cleaning")
+    parser.add_argument("--source", default=SOURCE_DIR)
+    parser.add_argument("--source-index", default=None, help="split index from split_index.py, read instead of --source")
+    parser.add_argument("--target", default=TARGET_DIR)
+    parser.add_argument("--index", default=None, help="index of the cleaned dataset (default: <target>/splits.csv)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--blur-threshold", type=float, default=BLUR_THRESHOLD)
+    parser.add_argument("--min-size", type=int, nargs=2, default=(MIN_WIDTH, MIN_HEIGHT), metavar=("W", "H"))
+    parser.add_argument("--target-size", type=int, nargs=2, default=TARGET_SIZE, metavar=("W", "H"))
+    parser.add_argument("--no-resize", action="store_true", help="keep original image sizes")
+    parser.add_argument("--no-quota", action="store_true", help="keep every valid image")
+    parser.add_argument("--manifest", default=MANIFEST_PATH, help="metrics database for incremental runs")
+    parser.add_argument("--no-manifest", action="store_true", help="decode everything, store nothing")
+    args = parser.parse_args()
+
+    settings = default_settings()
+    settings.update(blur_threshold=args.blur_threshold, min_width=args.min_size[0], min_height=args.min_size[1],
+                    target_size=None if args.no_resize else tuple(args.target_size))
+    quotas = {} if args.no_quota else TARGET_IMAGES
+    if args.no_manifest:
+        clean(args.source, args.target, args.workers, settings, quotas, None, args.source_index, args.index)
+    else:
+        with Manifest(args.manifest) as manifest:
+            clean(args.source, args.target, args.workers, settings, quotas, manifest, args.source_index, args.index)
@@ -5,26 +5,48 @@ from collections import defaultdict
 
 # Path to processed dataset
 PROCESSED_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\processed_dataset"
+# Split index from split_index.py; when set, counts come from it without walking folders
+INDEX_PATH = None
+# SQLite index from dataset_index.py; when set, it is refreshed incrementally
+# (only changed breed folders are re-listed) and the counts come from a query
+DATASET_INDEX_DB = None
 
 # Dictionary: {split: {breed: count}}
 image_counts = defaultdict(lambda: defaultdict(int))
 total_counts = defaultdict(int)
 breed_totals = defaultdict(int)  # total per breed across all splits
 
-for split in ["train", "val", "test"]:
-    split_dir = os.path.join(PROCESSED_DIR, split)
-    if not os.path.exists(split_dir):
-        continue
-    
-    for breed in os.listdir(split_dir):
-        breed_path = os.path.join(split_dir, breed)
-        if not os.path.isdir(breed_path):
+if INDEX_PATH:
+    from split_index import index_counts
+    for split, breeds in index_counts(INDEX_PATH).items():
+        for breed, count in breeds.items():
+            image_counts[split][breed] = count
+            total_counts[split] += count
+            breed_totals[breed] += count
+elif DATASET_INDEX_DB:
+    from dataset_index import DatasetIndex
+    with DatasetIndex(DATASET_INDEX_DB, PROCESSED_DIR) as index:
+        index.refresh()
+        for split, breeds in index.counts().items():
+            for breed, count in breeds.items():
+                image_counts[split][breed] = count
+                total_counts[split] += count
+                breed_totals[breed] += count
+else:
+    for split in ["train", "val", "test"]:
+        split_dir = os.path.join(PROCESSED_DIR, split)
+        if not os.path.exists(split_dir):
             continue
-        
-        count = len([f for f in os.listdir(breed_path) if os.path.isfile(os.path.join(breed_path, f))])
-        image_counts[split][breed] = count
-        total_counts[split] += count
-        breed_totals[breed] += count  # add to breed total
+
+        for breed in os.listdir(split_dir):
+            breed_path = os.path.join(split_dir, breed)
+            if not os.path.isdir(breed_path):
+                continue
+
+            count = len([f for f in os.listdir(breed_path) if os.path.isfile(os.path.join(breed_path, f))])
+            image_counts[split][breed] = count
+            total_counts[split] += count
+            breed_totals[breed] += count  # add to breed total
 
 # Print detailed report
 print("\n📊 Processed Dataset Image Counts (Breed-wise & Split-wise):\n")
@@ -0,0 +1,193 @@
+# code/dataset_index.py
+#
+# A small SQLite index of the dataset tree (split, breed, file, size,
+# dimensions) so scripts stop rediscovering it with os.listdir walks, which
+# are slow on network filesystems such as the Google Drive mount.
+#
+# refresh() uses os.scandir and only re-lists breed folders whose directory
+# mtime changed (adding, removing or renaming a file changes it), so a
+# refresh of an unchanged tree costs one stat per folder; use --full after
+# rewriting images in place. Image dimensions are read from the file
+# headers only, in a thread pool, for new or changed files.
+#
+#   python dataset_index.py refresh --root final_dataset --db dataset_index.db
+#   python dataset_index.py counts --db dataset_index.db
+#   python dataset_index.py classes --db dataset_index.db > breed_labels.txt
+
+import argparse
+import os
+import sqlite3
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+DATASET_ROOT = r"C:\Users\shaik\Desktop\DogBreedClassification\processed_dataset"
+INDEX_DB = r"C:\Users\shaik\Desktop\DogBreedClassification\dataset_index.db"
+SPLITS = ("train", "val", "test")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    split    TEXT NOT NULL,     -- '' for a flat <breed>/<image> layout
+    breed    TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    width    INTEGER,           -- NULL when the header cannot be read
+    height   INTEGER,
+    PRIMARY KEY (split, breed, name)
+);
+CREATE TABLE IF NOT EXISTS dirs (
+    split    TEXT NOT NULL,
+    breed    TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (split, breed)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def image_size(path):
+    try:
+        with Image.open(path) as img:   # reads the header, not the pixels
+            return img.size
+    except Exception:
+        return None, None
+
+
+class DatasetIndex:
+    def __init__(self, db_path=INDEX_DB, root=None):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.executescript(SCHEMA)
+        stored = self.conn.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+        if root is None:
+            if stored is None:
+                raise ValueError(f"{db_path} has no dataset root yet; pass root=")
+            root = stored[0]
+        elif stored is not None and os.path.abspath(root) != stored[0]:
+            # Different tree: start over rather than mixing two datasets
+            self.conn.executescript("DELETE FROM files; DELETE FROM dirs;")
+        self.root = os.path.abspath(root)
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('root', ?)", (self.root,))
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _breed_dirs(self):
+        """(split, breed, DirEntry) for every breed folder under the root."""
+        split_entries = [e for e in os.scandir(self.root) if e.is_dir() and e.name in SPLITS]
+        layout = [(e.name, e.path) for e in split_entries] or [("", self.root)]
+        for split, path in layout:
+            for entry in os.scandir(path):
+                if entry.is_dir():
+                    yield split, entry.name, entry
+
+    def refresh(self, full=False, workers=16):
+        """Bring the index up to date; `full` re-lists every folder even if its mtime is unchanged."""
+        start = time.perf_counter()
+        known_dirs = {(s, b): m for s, b, m in self.conn.execute("SELECT split, breed, mtime_ns FROM dirs")}
+        seen_dirs = set()
+        stats = defaultdict(int)
+        to_measure = []
+
+        for split, breed, entry in self._breed_dirs():
+            seen_dirs.add((split, breed))
+            mtime_ns = entry.stat().st_mtime_ns
+            if not full and known_dirs.get((split, breed)) == mtime_ns:
+                stats["dirs_unchanged"] += 1
+                continue
+            stats["dirs_scanned"] += 1
+            known = {name: (size, mtime) for name, size, mtime in self.conn.execute(
+                "SELECT name, size, mtime_ns FROM files WHERE split = ? AND breed = ?", (split, breed))}
+            present = set()
+            for f in os.scandir(entry.path):
+                if not (f.is_file() and f.name.lower().endswith(IMAGE_EXTENSIONS)):
+                    continue
+                present.add(f.name)
+                st = f.stat()
+                if known.get(f.name) != (st.st_size, st.st_mtime_ns):
+                    to_measure.append((split, breed, f.name, f.path, st.st_size, st.st_mtime_ns))
+            removed = [(split, breed, name) for name in known.keys() - present]
+            self.conn.executemany("DELETE FROM files WHERE split = ? AND breed = ? AND name = ?", removed)
+            stats["files_removed"] += len(removed)
+            self.conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?)", (split, breed, mtime_ns))
+
+        for split, breed in known_dirs.keys() - seen_dirs:
+            stats["files_removed"] += self.conn.execute(
+                "DELETE FROM files WHERE split = ? AND breed = ?", (split, breed)).rowcount
+            self.conn.execute("DELETE FROM dirs WHERE split = ? AND breed = ?", (split, breed))
+
+        with ThreadPoolExecutor(workers) as pool:
+            sizes = pool.map(image_size, [t[3] for t in to_measure])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(s, b, n, size, mtime, w, h) for (s, b, n, _, size, mtime), (w, h) in zip(to_measure, sizes)])
+        stats["files_updated"] = len(to_measure)
+        self.conn.commit()
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        return dict(stats)
+
+    # ---------------- QUERIES ----------------
+    def counts(self):
+        """{split: {breed: count}}"""
+        counts = defaultdict(dict)
+        for split, breed, n in self.conn.execute(
+                "SELECT split, breed, COUNT(*) FROM files GROUP BY split, breed ORDER BY split, breed"):
+            counts[split][breed] = n
+        return counts
+
+    def class_names(self, split="train"):
+        """Sorted breed names, the label order training and serving use.
+
+        A flat layout is indexed with split '', used when `split` has no
+        rows, as the backend's runtimes.index_labels does.
+        """
+        for candidate in (split, ""):
+            names = [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT breed FROM files WHERE split = ? ORDER BY breed", (candidate,))]
+            if names:
+                return names
+        return []
+
+    def files(self, split=None, breed=None):
+        query, params = "SELECT split, breed, name FROM files WHERE 1=1", []
+        if split is not None:
+            query, params = query + " AND split = ?", params + [split]
+        if breed is not None:
+            query, params = query + " AND breed = ?", params + [breed]
+        return [os.path.join(self.root, s, b, n) if s else os.path.join(self.root, b, n)
+                for s, b, n in self.conn.execute(query + " ORDER BY split, breed, name", params)]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SQLite index of the dataset tree")
+    parser.add_argument("command", choices=["refresh", "counts", "classes"])
+    parser.add_argument("--root", default=None, help=f"dataset folder (default: stored root or {DATASET_ROOT})")
+    parser.add_argument("--db", default=INDEX_DB)
+    parser.add_argument("--full", action="store_true", help="re-list every folder")
+    parser.add_argument("--split", default="train", help="split for 'classes'")
+    args = parser.parse_args()
+
+    root = args.root or (None if os.path.exists(args.db) else DATASET_ROOT)
+    with DatasetIndex(args.db, root) as index:
+        if args.command == "refresh":
+            print(f"✅ {index.root}: {index.refresh(full=args.full)}")
+        elif args.command == "counts":
+            start = time.perf_counter()
+            counts = index.counts()
+            for split, breeds in counts.items():
+                print(f"{split or 'all'}: {sum(breeds.values())} images, {len(breeds)} breeds")
+            print(f"⏱️ {(time.perf_counter() - start) * 1000:.1f} ms")
+        else:
+            print("\n".join(index.class_names(args.split)))
@@ -1,8 +1,13 @@
 import os
 import shutil
 import random # Needed for random selection
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
 from ultralytics import YOLO
 from tqdm import tqdm
+from manifest import MANIFEST_PATH, Manifest
 
 # --- Configuration ---
 ROOT_DATASET_PATH = 'processed_dataset'
@@ -13,9 +18,23 @@ MIN_IMAGES_PER_BREED = 80
 MAX_IMAGES_PER_BREED = 85 # NEW: The desired maximum count
 REJECTED_ROOT_FOLDER = 'rejected_train_images'
 
+MODEL_WEIGHTS = 'yolov8n.pt'
+BATCH_SIZE = 32        # images per YOLO forward pass
+DECODE_WORKERS = 8     # threads decoding the next batch while YOLO runs
+# Detection runs once with this low floor and every person box is stored in
+# the manifest, so any CONFIDENCE_THRESHOLD >= floor (and any quota) can be
+# re-applied later without running YOLO again.
+DETECTION_FLOOR = 0.25
+# SQLite index from dataset_index.py over ROOT_DATASET_PATH; when set, the
+# breed/file lists come from it instead of listing every folder
+DATASET_INDEX_DB = None
+# Index of the cleaned dataset written by clean_dataset.py; images moved to
+# REJECTED_ROOT_FOLDER are dropped from it so training never reads them
+CLEAN_INDEX_PATH = os.path.join(ROOT_DATASET_PATH, 'splits.csv')
+
 # Load a pre-trained YOLOv8 model for object detection
 try:
-    model = YOLO('yolov8n.pt')
+    model = YOLO(MODEL_WEIGHTS)
 except Exception as e:
     print(f"Error loading YOLOv8 model: {e}")
     print("Please ensure you have an internet connection to download the model weights.")
@@ -25,102 +44,173 @@ except Exception as e:
 PERSON_CLASS_ID = 0
 CONFIDENCE_THRESHOLD = 0.5
 
+# Never detect above the threshold we filter with
+detection_floor = min(DETECTION_FLOOR, CONFIDENCE_THRESHOLD)
+
+# Same random removals on every rerun
+random.seed(42)
+
 # Create the root folder for rejected images
 os.makedirs(REJECTED_ROOT_FOLDER, exist_ok=True)
 
+# Person boxes are kept in the cleaning manifest; interrupted runs resume
+# from it and unchanged images are never re-detected
+manifest = Manifest(MANIFEST_PATH)
+
 # 1. Path Check
 if not os.path.exists(DATASET_PATH):
     print(f"Error: The target path '{DATASET_PATH}' does not exist. Please check your folder structure.")
     exit()
 
-breed_folders = sorted([d for d in os.listdir(DATASET_PATH) 
-                        if os.path.isdir(os.path.join(DATASET_PATH, d))])
+breed_images = {}
+if DATASET_INDEX_DB:
+    from dataset_index import DatasetIndex
+    with DatasetIndex(DATASET_INDEX_DB, ROOT_DATASET_PATH) as index:
+        index.refresh()
+        for path in index.files(TARGET_SUBFOLDER):
+            if path.lower().endswith(('.jpg', '.jpeg', '.png')):
+                breed_images.setdefault(os.path.basename(os.path.dirname(path)), []).append(os.path.basename(path))
+    breed_folders = sorted(breed_images)
+else:
+    breed_folders = sorted([d for d in os.listdir(DATASET_PATH)
+                            if os.path.isdir(os.path.join(DATASET_PATH, d))])
+    for breed_name in breed_folders:
+        breed_path = os.path.join(DATASET_PATH, breed_name)
+        breed_images[breed_name] = sorted([f for f in os.listdir(breed_path)
+                                           if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
 print(f"Found {len(breed_folders)} breed folders in the '{TARGET_SUBFOLDER}' set to process.")
 
-# 2. Iterate through each breed
+# 2. Batched Person Detection (only images without stored results)
+def read_image(path):
+    try:
+        return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+    except Exception:
+        return None
+
+
+def detect_people(images):
+    """Person boxes [[x1, y1, x2, y2, conf], ...] for each decoded image, one YOLO call."""
+    results = model.predict(source=images, verbose=False, conf=detection_floor, classes=[PERSON_CLASS_ID])
+    boxes = []
+    for result in results:
+        found = []
+        if result.boxes is not None:
+            for xyxy, conf, cls in zip(result.boxes.xyxy.tolist(), result.boxes.conf.tolist(),
+                                       result.boxes.cls.tolist()):
+                if int(cls) == PERSON_CLASS_ID:
+                    found.append([round(v, 1) for v in xyxy] + [round(conf, 4)])
+        boxes.append(found)
+    return boxes
+
+
+to_detect = [(breed_name, os.path.join(DATASET_PATH, breed_name, f))
+             for breed_name in breed_folders for f in breed_images[breed_name]
+             if manifest.person_boxes(os.path.join(DATASET_PATH, breed_name, f), detection_floor, MODEL_WEIGHTS) is None]
+print(f"{len(to_detect)} images need person detection "
+      f"({sum(map(len, breed_images.values())) - len(to_detect)} already in the manifest).")
+
+if to_detect:
+    batches = [to_detect[i:i + BATCH_SIZE] for i in range(0, len(to_detect), BATCH_SIZE)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(DECODE_WORKERS) as pool:
+        # Decode batch n+1 while YOLO runs on batch n
+        pending = pool.map(read_image, [path for _, path in batches[0]])
+        for n, batch in enumerate(tqdm(batches, desc="Detecting people")):
+            decoded = list(pending)
+            if n + 1 < len(batches):
+                pending = pool.map(read_image, [path for _, path in batches[n + 1]])
+            readable = [(item, img) for item, img in zip(batch, decoded) if img is not None]
+            for (breed_name, image_path), img in zip(batch, decoded):
+                if img is None:
+                    print(f"\n[ERROR] Could not read image {os.path.basename(image_path)} in {breed_name}")
+            if not readable:
+                continue
+            try:
+                boxes = detect_people([img for _, img in readable])
+            except Exception as e:
+                print(f"\n[ERROR] Detection failed for a batch starting at {readable[0][0][1]}: {e}")
+                continue
+            for ((breed_name, image_path), _), found in zip(readable, boxes):
+                manifest.record_person_boxes(image_path, found, detection_floor, MODEL_WEIGHTS,
+                                             TARGET_SUBFOLDER, breed_name)
+            manifest.commit()  # checkpoint: an interrupted run resumes after this batch
+    elapsed = time.perf_counter() - start
+    print(f"⏱️ Detection: {len(to_detect)} images in {elapsed:.1f}s ({len(to_detect) / max(elapsed, 1e-9):.1f} images/sec)")
+
+# 3. Iterate through each breed and apply the rules from the stored detections
+total_errors = 0
 for breed_name in tqdm(breed_folders, desc=f"Filtering {TARGET_SUBFOLDER} Breeds (Target 80-90)"):
     breed_path = os.path.join(DATASET_PATH, breed_name)
-    all_image_files = sorted([f for f in os.listdir(breed_path) 
-                              if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-    
-    initial_count = len(all_image_files)
-    
+    all_image_files = breed_images[breed_name]
+
     # Lists for categorization
     human_images = []
     pure_dog_images = []
-    
-    # 3. Object Detection and Primary Filtering (Identify Human vs. Pure Dog)
+    error_images = []
+
+    # Identify Human vs. Pure Dog at the current CONFIDENCE_THRESHOLD
     for image_filename in all_image_files:
-        image_path = os.path.join(breed_path, image_filename)
-        
-        try:
-            results = model.predict(source=image_path, verbose=False, conf=CONFIDENCE_THRESHOLD)
-            person_detected = False
-            
-            if results and results[0].boxes is not None:
-                for box in results[0].boxes:
-                    if int(box.cls.item()) == PERSON_CLASS_ID:
-                        person_detected = True
-                        break
-            
-            if person_detected:
-                human_images.append(image_filename)
-            else:
-                pure_dog_images.append(image_filename)
-                
-        except Exception as e:
-            print(f"\n[ERROR] Could not process image {image_filename} in {breed_name}: {e}")
-            
-    
+        boxes = manifest.person_boxes(os.path.join(breed_path, image_filename), CONFIDENCE_THRESHOLD, MODEL_WEIGHTS)
+        if boxes is None:
+            error_images.append(image_filename)  # unreadable or failed detection, reported above
+        elif boxes:
+            human_images.append(image_filename)
+        else:
+            pure_dog_images.append(image_filename)
+
+    # Only checked images count towards the 80-90 range; errors stay in place, reported separately
+    initial_count = len(human_images) + len(pure_dog_images)
+    total_errors += len(error_images)
+
     # 4. Enforce Minimum (80) and Maximum (90) Limits
     images_to_delete = []
     current_total_count = len(human_images) + len(pure_dog_images)
-    
+
     # --- STEP A: Prioritize removing Human Images ---
     # Determine how many human images we MUST keep to meet the minimum 80
     required_human_to_keep = max(0, MIN_IMAGES_PER_BREED - len(pure_dog_images))
-    
+
     # The number of human images we can safely remove
     human_images_to_remove = human_images[:len(human_images) - required_human_to_keep]
     images_to_delete.extend(human_images_to_remove)
-    
+
     # Remaining human images are the ones we must keep (or are too few to care about)
     human_images_kept = human_images[len(human_images) - required_human_to_keep:]
-    
+
     # Update current total count after first wave of removals
     current_total_count = len(pure_dog_images) + len(human_images_kept)
 
     # --- STEP B: Randomly remove remaining excess images to hit MAX (90) ---
     if current_total_count > MAX_IMAGES_PER_BREED:
         excess_count = current_total_count - MAX_IMAGES_PER_BREED
-        
+
         # Combine the lists of images available for random removal
         # (It's safer to remove from the remaining human images first, then pure dogs)
         removable_images = human_images_kept + pure_dog_images
-        
+
         # Ensure we don't accidentally drop below the min threshold of 80
         # This check is mostly for safety, as the limit is MAX_IMAGES_PER_BREED=90
         if (current_total_count - excess_count) < MIN_IMAGES_PER_BREED:
              excess_count = current_total_count - MIN_IMAGES_PER_BREED
-             
+
         # Randomly select excess_count images from the removable list
         # Ensure we have enough images to remove
         if excess_count > 0 and len(removable_images) >= excess_count:
              random_removals = random.sample(removable_images, excess_count)
              images_to_delete.extend(random_removals)
-             
+
     # 5. Remove and Relocate Images
-    
+
     # Create a subfolder for rejected images of this breed
     breed_rejected_path = os.path.join(REJECTED_ROOT_FOLDER, breed_name)
     os.makedirs(breed_rejected_path, exist_ok=True)
-    
+
     final_images_deleted = []
-    
+
     for image_filename in set(images_to_delete): # Use set to handle potential duplicates in list extensions
         src_path = os.path.join(breed_path, image_filename)
         dst_path = os.path.join(breed_rejected_path, image_filename)
-        
+
         # Only move the file if it still exists (i.e., hasn't been moved by an earlier loop)
         if os.path.exists(src_path):
             try:
@@ -132,18 +222,27 @@ for breed_name in tqdm(breed_folders, desc=f"Filtering {TARGET_SUBFOLDER} Breeds
     # 6. Report
     total_removed = len(final_images_deleted)
     final_count = initial_count - total_removed
-    
-    if total_removed > 0 or final_count < MIN_IMAGES_PER_BREED or final_count > MAX_IMAGES_PER_BREED:
+
+    if (total_removed > 0 or error_images or final_count < MIN_IMAGES_PER_BREED
+            or final_count > MAX_IMAGES_PER_BREED):
         print(f"\n🐶 **Breed: {breed_name}**")
         print(f"   Initial Images: {initial_count}")
         print(f"   Images Removed: {total_removed}")
         print(f"   Final Images:   {final_count} (Target Range: 80-90)")
-        
+        if error_images:
+            print(f"   Not Checked:    {len(error_images)} (unreadable or detection failed; left in place)")
+
         if final_count < MIN_IMAGES_PER_BREED:
              print(f"   ⚠️ **WARNING:** Final count is below the minimum of {MIN_IMAGES_PER_BREED}.")
         elif final_count > MAX_IMAGES_PER_BREED:
              print(f"   ⚠️ **WARNING:** Final count is above the maximum of {MAX_IMAGES_PER_BREED}.")
 
 
+manifest.close()
+if os.path.exists(CLEAN_INDEX_PATH):
+    from split_index import prune_index
+    print(f"Removed {prune_index(CLEAN_INDEX_PATH)} rejected images from {CLEAN_INDEX_PATH}")
 print("\n--- Training Data Filtering Complete ---")
-print(f"Rejected training images moved to the '{REJECTED_ROOT_FOLDER}' folder for review.")
\ No newline at end of file
+if total_errors:
+    print(f"⚠️ {total_errors} images could not be checked for people and were left in place.")
+print(f"Rejected training images moved to the '{REJECTED_ROOT_FOLDER}' folder for review.")
@@ -0,0 +1,192 @@
+# code/manifest.py
+#
+# Persistent per-image metrics shared by the cleaning scripts, stored in
+# SQLite and keyed on (path, size, mtime). A row is "fresh" while the file
+# on disk still has the recorded size and mtime, so re-runs only decode new
+# or changed images, and threshold changes (BLUR_THRESHOLD, minimum size)
+# are re-evaluated from the stored numbers.
+#
+#   python manifest.py summary                     # rows, measured, person results
+#   python manifest.py rescore --blur-threshold 120 --min-size 150 150
+#   python manifest.py prune                       # forget files that no longer exist
+
+import argparse
+import json
+import os
+import sqlite3
+import time
+from collections import defaultdict
+
+MANIFEST_PATH = r"C:\Users\shaik\Desktop\DogBreedClassification\cleaning_manifest.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    split       TEXT,
+    breed       TEXT,
+    readable    INTEGER,            -- 1 decoded, 0 unreadable, NULL = not measured yet
+    width       INTEGER,
+    height      INTEGER,
+    blur        REAL,               -- Laplacian variance
+    hash        TEXT,               -- MD5 of the decoded pixels
+    metrics_size TEXT,              -- scale blur/hashes were taken at ("224x224" or "original")
+    phash       TEXT,               -- 64-bit perceptual hashes (hex), see near_duplicates.py
+    dhash       TEXT,
+    person_boxes TEXT,              -- delete_humans.py: JSON [[x1, y1, x2, y2, conf], ...], NULL = not run
+    person_conf  REAL,              -- highest person confidence (NULL = none found)
+    person_floor REAL,              -- confidence floor the detector ran with
+    person_model TEXT,
+    updated     REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_breed ON images (split, breed);
+CREATE INDEX IF NOT EXISTS images_hash ON images (hash);
+"""
+
+METRIC_COLUMNS = ("split", "breed", "readable", "width", "height", "blur", "hash", "phash", "dhash",
+                  "metrics_size")
+
+
+def file_key(path):
+    """(absolute path, size, mtime_ns) as stored in the manifest."""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+class Manifest:
+    def __init__(self, db_path=MANIFEST_PATH):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._add_missing_columns()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _add_missing_columns(self):
+        # Manifests written by older versions get new metric columns as NULL,
+        # which makes those rows look unmeasured for the new metric
+        have = {row["name"] for row in self.conn.execute("PRAGMA table_info(images)")}
+        for column, kind in (("phash", "TEXT"), ("dhash", "TEXT"), ("metrics_size", "TEXT"), ("person_boxes", "TEXT"),
+                             ("person_conf", "REAL"), ("person_floor", "REAL"), ("person_model", "TEXT")):
+            if column not in have:
+                self.conn.execute(f"ALTER TABLE images ADD COLUMN {column} {kind}")
+
+    def lookup(self, path):
+        """Stored row for `path` if the file is unchanged since it was measured, else None."""
+        abs_path, size, mtime_ns = file_key(path)
+        row = self.conn.execute("SELECT * FROM images WHERE path = ?", (abs_path,)).fetchone()
+        if row is None or row["size"] != size or row["mtime_ns"] != mtime_ns:
+            return None
+        return row
+
+    def _forget_if_changed(self, abs_path, size, mtime_ns):
+        # Anything measured on an older version of the file no longer applies
+        self.conn.execute("DELETE FROM images WHERE path = ? AND (size != ? OR mtime_ns != ?)",
+                          (abs_path, size, mtime_ns))
+
+    def record_metrics(self, path, metrics):
+        """Store decode metrics (see METRIC_COLUMNS) for the current version of `path`."""
+        abs_path, size, mtime_ns = file_key(path)
+        self._forget_if_changed(abs_path, size, mtime_ns)
+        values = [metrics.get(c) for c in METRIC_COLUMNS]
+        self.conn.execute(
+            f"""INSERT INTO images (path, size, mtime_ns, {', '.join(METRIC_COLUMNS)}, updated)
+                VALUES (?, ?, ?, {', '.join('?' * len(METRIC_COLUMNS))}, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    {', '.join(f'{c} = excluded.{c}' for c in METRIC_COLUMNS)},
+                    updated = excluded.updated""",
+            (abs_path, size, mtime_ns, *values, time.time()))
+
+    def person_boxes(self, path, threshold, model):
+        """
+        Person boxes with confidence >= threshold from an earlier
+        delete_humans.py run, or None if the image has to be run through
+        `model` again (changed file, other model, or stored floor above threshold).
+        """
+        row = self.lookup(path)
+        if (row is None or row["person_boxes"] is None or row["person_model"] != model
+                or row["person_floor"] > threshold):
+            return None
+        return [box for box in json.loads(row["person_boxes"]) if box[4] >= threshold]
+
+    def record_person_boxes(self, path, boxes, floor, model, split=None, breed=None):
+        abs_path, size, mtime_ns = file_key(path)
+        self._forget_if_changed(abs_path, size, mtime_ns)
+        best = max((box[4] for box in boxes), default=None)
+        self.conn.execute(
+            """INSERT INTO images (path, size, mtime_ns, split, breed, person_boxes, person_conf,
+                                   person_floor, person_model, updated)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(path) DO UPDATE SET
+                   person_boxes = excluded.person_boxes, person_conf = excluded.person_conf,
+                   person_floor = excluded.person_floor, person_model = excluded.person_model,
+                   updated = excluded.updated""",
+            (abs_path, size, mtime_ns, split, breed, json.dumps(boxes), best, floor, model, time.time()))
+
+    def prune(self):
+        """Delete rows for files that no longer exist; returns how many were removed."""
+        gone = [(row["path"],) for row in self.conn.execute("SELECT path FROM images")
+                if not os.path.exists(row["path"])]
+        self.conn.executemany("DELETE FROM images WHERE path = ?", gone)
+        self.commit()
+        return len(gone)
+
+    def rescore(self, blur_threshold, min_width, min_height):
+        """Per (split, breed) counts under the given thresholds, from stored metrics only."""
+        rows = self.conn.execute(
+            """SELECT split, breed, COUNT(*) AS total,
+                      SUM(readable = 0) AS unreadable,
+                      SUM(readable = 1 AND (width < :w OR height < :h)) AS too_small,
+                      SUM(readable = 1 AND width >= :w AND height >= :h AND blur < :blur) AS blurry,
+                      SUM(readable = 1 AND width >= :w AND height >= :h AND blur >= :blur) AS passing
+               FROM images WHERE readable IS NOT NULL
+               GROUP BY split, breed ORDER BY split, breed""",
+            {"w": min_width, "h": min_height, "blur": blur_threshold}).fetchall()
+        return [dict(row) for row in rows]
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect the cleaning metrics manifest")
+    parser.add_argument("command", choices=["summary", "rescore", "prune"])
+    parser.add_argument("--db", default=MANIFEST_PATH)
+    parser.add_argument("--blur-threshold", type=float, default=100.0)
+    parser.add_argument("--min-size", type=int, nargs=2, default=(100, 100), metavar=("W", "H"))
+    args = parser.parse_args()
+
+    with Manifest(args.db) as manifest:
+        if args.command == "prune":
+            print(f"🗑️ Removed {manifest.prune()} rows for missing files")
+        elif args.command == "summary":
+            row = manifest.conn.execute(
+                """SELECT COUNT(*) AS total, SUM(readable IS NOT NULL) AS measured,
+                          SUM(person_boxes IS NOT NULL) AS person_checked,
+                          SUM(person_conf >= 0.5) AS with_person_conf_0_5
+                   FROM images""").fetchone()
+            print("\n📊 Manifest Summary:")
+            for key in row.keys():
+                print(f" - {key}: {row[key] or 0}")
+        else:
+            totals = defaultdict(int)
+            print(f"\n📊 Rescore (blur >= {args.blur_threshold}, size >= {args.min_size[0]}x{args.min_size[1]}):\n")
+            for r in manifest.rescore(args.blur_threshold, *args.min_size):
+                print(f"{r['split'] or '-'}/{r['breed']}: {r['passing']}/{r['total']} pass "
+                      f"({r['blurry']} blurry, {r['too_small']} too small, {r['unreadable']} unreadable)")
+                for key in ("total", "passing", "blurry", "too_small", "unreadable"):
+                    totals[key] += r[key] or 0
+            print(f"\n✅ {totals['passing']} of {totals['total']} images pass "
+                  f"({totals['blurry']} blurry, {totals['too_small']} too small, {totals['unreadable']} unreadable)")
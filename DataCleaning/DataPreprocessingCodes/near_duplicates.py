@@ -0,0 +1,215 @@
+# code/near_duplicates.py
+#
+# Finds near-duplicate images (resized, recompressed or lightly edited
+# copies) across all splits using 64-bit perceptual hashes and a BK-tree,
+# so only a small part of the dataset is compared against each image
+# instead of every pair. Reports:
+#   - cross-split leaks: near-identical images in different splits
+#   - clusters of near-duplicates, with the keeper chosen for each
+#     (largest resolution, then sharpest, then first path)
+#
+# Hashes come from the manifest when the file is unchanged (clean_dataset.py
+# stores them during its single pass); the rest are computed in a process pool.
+#
+#   python near_duplicates.py --dataset processed_dataset --max-distance 8 -o near_duplicates.json
+
+import argparse
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from multiprocessing import Pool
+
+from clean_dataset import TARGET_SIZE, decode, list_images, measure, metrics_size
+from manifest import MANIFEST_PATH, Manifest
+
+# ---------------- CONFIG ----------------
+DATASET_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\processed_dataset"
+MAX_DISTANCE = 8     # differing bits out of 64 that still count as the same picture
+HASH_TYPE = "phash"  # or "dhash"
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Metric tree over Hamming distance. A query at radius r only descends
+    into children whose edge distance is within [d - r, d + r] of the
+    node distance d (triangle inequality), which prunes most of the tree.
+    """
+
+    def __init__(self):
+        self.root = None   # node: [hash, [items], {distance: child}]
+
+    def add(self, h, item):
+        if self.root is None:
+            self.root = [h, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [item], {}]
+                return
+            node = child
+
+    def query(self, h, radius):
+        """(distance, item) for every stored hash within `radius` of h."""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= radius:
+                found.extend((d, item) for item in node[1])
+            for edge, child in node[2].items():
+                if d - radius <= edge <= d + radius:
+                    stack.append(child)
+        return found
+
+# ---------------- HASHES ----------------
+def _measure(task):
+    # Same scale as clean_dataset.py, so the rows it stores stay valid there
+    return measure(decode(task[0]), TARGET_SIZE)[0]
+
+
+def collect_images(tasks, manifest=None, workers=None):
+    """One dict per readable image with its split, breed, size, sharpness and hashes."""
+    images, pending = [], []
+    size = metrics_size(TARGET_SIZE)
+    for task in tasks:
+        row = manifest.lookup(task[0]) if manifest is not None else None
+        if row is not None and row["readable"] == 0:
+            continue  # known unreadable
+        # Hashes taken at another scale are not comparable, so those are redone
+        if row is not None and row["phash"] is not None and row["metrics_size"] == size:
+            images.append({"path": task[0], "split": task[1], "breed": task[2],
+                           **{key: row[key] for key in ("width", "height", "blur", "phash", "dhash")}})
+        else:
+            pending.append(task)
+
+    print(f"📂 {len(tasks)} images ({len(tasks) - len(pending)} hashes from manifest, {len(pending)} to decode)")
+    with Pool(workers) as pool:
+        for (path, split, breed), metrics in zip(pending, pool.imap(_measure, pending, chunksize=16)):
+            if manifest is not None:
+                manifest.record_metrics(path, dict(metrics, split=split, breed=breed,
+                                                   readable=int(metrics["width"] is not None)))
+            if metrics["width"] is not None:
+                images.append({"path": path, "split": split, "breed": breed,
+                               **{key: metrics[key] for key in ("width", "height", "blur", "phash", "dhash")}})
+    if manifest is not None:
+        manifest.commit()
+    return images
+
+# ---------------- SEARCH ----------------
+def find_pairs(images, max_distance, hash_type=HASH_TYPE):
+    """All (i, j, distance) with i < j and Hamming distance <= max_distance."""
+    tree = BKTree()
+    pairs = []
+    for j, img in enumerate(images):
+        h = int(img[hash_type], 16)
+        pairs.extend((i, j, d) for d, i in tree.query(h, max_distance))
+        tree.add(h, j)
+    return pairs
+
+
+def clusters_from_pairs(n, pairs):
+    parent = list(range(n))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for i, j, _ in pairs:
+        parent[find(i)] = find(j)
+    groups = defaultdict(list)
+    for i in range(n):
+        groups[find(i)].append(i)
+    return [sorted(g) for g in groups.values() if len(g) > 1]
+
+
+def pick_keeper(members, images):
+    return min(members, key=lambda i: (-images[i]["width"] * images[i]["height"], -(images[i]["blur"] or 0.0),
+                                       images[i]["path"]))
+
+
+def build_report(images, pairs, max_distance, hash_type):
+    leaks = []
+    for i, j, d in pairs:
+        if images[i]["split"] != images[j]["split"]:
+            leaks.append({"distance": d,
+                          "a": {"path": images[i]["path"], "split": images[i]["split"], "breed": images[i]["breed"]},
+                          "b": {"path": images[j]["path"], "split": images[j]["split"], "breed": images[j]["breed"]}})
+
+    clusters = []
+    for members in clusters_from_pairs(len(images), pairs):
+        keeper = pick_keeper(members, images)
+        breeds = sorted({images[i]["breed"] for i in members})
+        splits = sorted({str(images[i]["split"]) for i in members})
+        clusters.append({
+            "keeper": images[keeper]["path"],
+            "duplicates": [images[i]["path"] for i in members if i != keeper],
+            "breeds": breeds,
+            "splits": splits,
+            "within_breed": len(breeds) == 1,
+            "cross_split": len(splits) > 1,
+        })
+    return {"hash": hash_type, "max_distance": max_distance, "images": len(images),
+            "pairs": len(pairs), "cross_split_leaks": leaks, "clusters": clusters}
+
+
+def print_report(report, elapsed):
+    leak_kinds = Counter(" ↔ ".join(sorted((l["a"]["split"] or "-", l["b"]["split"] or "-")))
+                         for l in report["cross_split_leaks"])
+    clusters = report["clusters"]
+    print(f"\n📊 Near-Duplicate Report ({report['hash']}, distance <= {report['max_distance']}):")
+    print(f" - images checked: {report['images']}")
+    print(f" - near-duplicate pairs: {report['pairs']}")
+    print(f" - cross-split leaks: {len(report['cross_split_leaks'])}")
+    for kind, count in sorted(leak_kinds.items()):
+        print(f"     {kind}: {count}")
+    print(f" - clusters: {len(clusters)} ({sum(c['within_breed'] for c in clusters)} within one breed, "
+          f"{sum(not c['within_breed'] for c in clusters)} spanning breeds)")
+    print(f" - images to drop (all but keepers): {sum(len(c['duplicates']) for c in clusters)}")
+
+    per_breed = Counter(c["breeds"][0] for c in clusters if c["within_breed"])
+    if per_breed:
+        print("\nBreeds with the most clusters:")
+        for breed, count in per_breed.most_common(10):
+            print(f" - {breed}: {count}")
+    print(f"⏱️ {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perceptual near-duplicate and split-leak detection")
+    parser.add_argument("--dataset", default=DATASET_DIR)
+    parser.add_argument("--max-distance", type=int, default=MAX_DISTANCE)
+    parser.add_argument("--hash", choices=["phash", "dhash"], default=HASH_TYPE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    parser.add_argument("--no-manifest", action="store_true")
+    parser.add_argument("-o", "--output", default="near_duplicates.json")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tasks = list_images(args.dataset)
+    if args.no_manifest:
+        images = collect_images(tasks, workers=args.workers)
+    else:
+        with Manifest(args.manifest) as manifest:
+            images = collect_images(tasks, manifest, args.workers)
+    pairs = find_pairs(images, args.max_distance, args.hash)
+    report = build_report(images, pairs, args.max_distance, args.hash)
+    print_report(report, time.perf_counter() - start)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Report written to {os.path.abspath(args.output)}")
@@ -1,45 +1,32 @@
-import os
-import shutil
-import random
+from split_index import build_index, index_counts, materialize
 
 SOURCE_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\images"
-TRAIN_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\dataset\train"
-VAL_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\dataset\val"
-TEST_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\dataset\test"
+DATASET_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\dataset"
+INDEX_PATH = r"C:\Users\shaik\Desktop\DogBreedClassification\splits.csv"
 
 train_ratio = 0.7
 val_ratio = 0.15
 test_ratio = 0.15
 
-for folder in [TRAIN_DIR, VAL_DIR, TEST_DIR]:
-    os.makedirs(folder, exist_ok=True)
+# Splits are assigned by a stable hash of breed + file name (see split_index.py),
+# so re-running after adding images never moves existing images between splits.
+# The folder tree is made of hardlinks to SOURCE_DIR instead of copies; set
+# LINK_MODE = None to only write the index and run
+# `clean_dataset.py --source-index` on it directly.
+#
+# This index covers the raw images. Training and evaluation must read the
+# index of the cleaned dataset instead (processed_dataset/splits.csv, written
+# by clean_dataset.py and pruned by delete_humans.py).
+LINK_MODE = "hardlink"   # "hardlink", "symlink", "copy" or None
 
-random.seed(42)
+build_index(SOURCE_DIR, INDEX_PATH, (("train", train_ratio), ("val", val_ratio), ("test", test_ratio)))
 
-for breed in os.listdir(SOURCE_DIR):
-    breed_path = os.path.join(SOURCE_DIR, breed)
-    if not os.path.isdir(breed_path):
-        continue
-    
-    # Only images
-    images = [f for f in os.listdir(breed_path) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    if len(images) == 0:
-        continue
-    
-    random.shuffle(images)
-    
-    n_total = len(images)
-    n_train = max(int(train_ratio * n_total), 1)
-    n_val = max(int(val_ratio * n_total), 1)
-    n_test = max(n_total - n_train - n_val, 1)
-    
-    for folder, n in zip([TRAIN_DIR, VAL_DIR, TEST_DIR], [n_train, n_val, n_test]):
-        target_breed_dir = os.path.join(folder, breed)
-        os.makedirs(target_breed_dir, exist_ok=True)
-        for img in images[:n]:
-            shutil.copy(os.path.join(breed_path, img), target_breed_dir)
-        images = images[n:]
-    
-    print(f"{breed}: train={n_train}, val={n_val}, test={n_test}")
+counts = index_counts(INDEX_PATH)
+for breed in sorted(set().union(*counts.values())):
+    print(f"{breed}: train={counts['train'][breed]}, val={counts['val'][breed]}, test={counts['test'][breed]}")
 
-print("Dataset split completed successfully!")
+if LINK_MODE:
+    results = materialize(INDEX_PATH, DATASET_DIR, LINK_MODE)
+    print(f"Materialized {sum(results.values())} files into {DATASET_DIR} ({dict(results)})")
+
+print(f"Dataset split completed successfully! Index: {INDEX_PATH}")
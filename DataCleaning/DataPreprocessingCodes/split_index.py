@@ -0,0 +1,197 @@
+# code/split_index.py
+#
+# Dataset splits as an index file instead of physical copies. Each image is
+# assigned to train/val/test by a hash of "<salt>/<breed>/<filename>", so
+# the assignment is deterministic and adding images never moves existing
+# ones to another split. The index is a CSV (path,breed,split) with paths
+# relative to the index file, readable directly by count.py, train.py and
+# the backend evaluators.
+#
+# A folder tree is only materialized on request, with hardlinks (or
+# symlinks) created in parallel, so it costs no extra disk space.
+#
+# The index built here over the raw images only fixes which split each
+# image belongs to. clean_dataset.py reads it (--source-index) and writes
+# the index of the cleaned dataset next to its output
+# (processed_dataset/splits.csv); delete_humans.py drops the images it
+# rejects from that index. Training and evaluation read the cleaned index.
+#
+#   python split_index.py build images --index splits.csv
+#   python split_index.py tree processed_dataset          # index an existing <split>/<breed>/ tree
+#   python split_index.py prune processed_dataset/splits.csv
+#   python split_index.py materialize splits.csv dataset --mode hardlink
+#   python split_index.py counts splits.csv
+
+import argparse
+import csv
+import hashlib
+import os
+import shutil
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+SOURCE_DIR = r"C:\Users\shaik\Desktop\DogBreedClassification\images"
+INDEX_PATH = r"C:\Users\shaik\Desktop\DogBreedClassification\splits.csv"
+SPLIT_RATIOS = (("train", 0.7), ("val", 0.15), ("test", 0.15))
+SALT = "dogbreed-split-v1"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def assign_split(breed, filename, ratios=SPLIT_RATIOS, salt=SALT):
+    """Split for one image, from a stable hash of its breed and file name."""
+    digest = hashlib.sha1(f"{salt}/{breed}/{filename}".encode("utf-8")).digest()
+    u = int.from_bytes(digest[:8], "big") / 2 ** 64
+    cumulative = 0.0
+    for split, ratio in ratios:
+        cumulative += ratio
+        if u < cumulative:
+            return split
+    return ratios[-1][0]
+
+# ---------------- BUILD / READ ----------------
+def write_index(rows, index_path):
+    """Write (path, breed, split) rows atomically, paths relative to the index; returns {split: count}."""
+    base = os.path.dirname(os.path.abspath(index_path))
+    tmp = index_path + ".tmp"
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path", "breed", "split"])
+        for path, breed, split in rows:
+            writer.writerow([os.path.relpath(os.path.abspath(path), base).replace(os.sep, "/"), breed, split])
+    os.replace(tmp, index_path)
+    return Counter(split for _, _, split in rows)
+
+
+def _breed_images(breed_dir):
+    return [entry for entry in sorted(os.scandir(breed_dir), key=lambda e: e.name)
+            if entry.is_file() and entry.name.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def build_index(source_dir, index_path, ratios=SPLIT_RATIOS, salt=SALT):
+    """Index every <source_dir>/<breed>/<image>; returns {split: count}."""
+    rows = []
+    for breed in sorted(os.listdir(source_dir)):
+        breed_path = os.path.join(source_dir, breed)
+        if not os.path.isdir(breed_path):
+            continue
+        for entry in _breed_images(breed_path):
+            rows.append((entry.path, breed, assign_split(breed, entry.name, ratios, salt)))
+    return write_index(rows, index_path)
+
+
+def index_tree(tree_dir, index_path, splits=("train", "val", "test")):
+    """Index an existing <tree_dir>/<split>/<breed>/<image> tree, keeping its splits."""
+    rows = []
+    for split in splits:
+        split_dir = os.path.join(tree_dir, split)
+        if not os.path.isdir(split_dir):
+            continue
+        for breed in sorted(os.listdir(split_dir)):
+            breed_path = os.path.join(split_dir, breed)
+            if os.path.isdir(breed_path):
+                rows += [(entry.path, breed, split) for entry in _breed_images(breed_path)]
+    return write_index(rows, index_path)
+
+
+def prune_index(index_path):
+    """Drop rows whose file no longer exists (e.g. moved away by delete_humans.py); returns how many."""
+    rows = read_index(index_path)
+    present = [row for row in rows if os.path.exists(row[0])]
+    if len(present) != len(rows):
+        write_index(present, index_path)
+    return len(rows) - len(present)
+
+
+def read_index(index_path, split=None):
+    """[(absolute path, breed, split)], optionally for one split only."""
+    base = os.path.dirname(os.path.abspath(index_path))
+    with open(index_path, newline="", encoding="utf-8") as f:
+        return [(os.path.normpath(os.path.join(base, row["path"])), row["breed"], row["split"])
+                for row in csv.DictReader(f) if split is None or row["split"] == split]
+
+
+def index_counts(index_path):
+    """{split: {breed: count}} straight from the index."""
+    counts = defaultdict(Counter)
+    for _, breed, split in read_index(index_path):
+        counts[split][breed] += 1
+    return counts
+
+# ---------------- MATERIALIZE ----------------
+def _link(src, dst, mode):
+    if os.path.exists(dst):
+        return "exists"
+    try:
+        if mode == "hardlink":
+            os.link(src, dst)
+        elif mode == "symlink":
+            os.symlink(src, dst)
+        else:
+            shutil.copy2(src, dst)
+        return mode
+    except OSError:
+        # Different drive or no link permission: fall back to a copy
+        shutil.copy2(src, dst)
+        return "copy"
+
+
+def materialize(index_path, out_dir, mode="hardlink", splits=None, workers=16):
+    """Create out_dir/<split>/<breed>/<file> links for the indexed images."""
+    entries = [e for e in read_index(index_path) if splits is None or e[2] in splits]
+    for breed, split in {(breed, split) for _, breed, split in entries}:
+        os.makedirs(os.path.join(out_dir, split, breed), exist_ok=True)
+
+    jobs = [(path, os.path.join(out_dir, split, breed, os.path.basename(path))) for path, breed, split in entries]
+    with ThreadPoolExecutor(workers) as pool:
+        results = Counter(pool.map(lambda job: _link(*job, mode), jobs))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hash-based split index and zero-copy materialization")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="assign every image to a split and write the index")
+    build.add_argument("source", nargs="?", default=SOURCE_DIR, help="folder of <breed>/<image>")
+    build.add_argument("--index", default=INDEX_PATH)
+    build.add_argument("--ratios", type=float, nargs=3, default=[r for _, r in SPLIT_RATIOS],
+                       metavar=("TRAIN", "VAL", "TEST"))
+    build.add_argument("--salt", default=SALT, help="changing it reshuffles everything")
+
+    mat = sub.add_parser("materialize", help="create a <split>/<breed>/ tree of links")
+    mat.add_argument("index")
+    mat.add_argument("out_dir")
+    mat.add_argument("--mode", choices=["hardlink", "symlink", "copy"], default="hardlink")
+    mat.add_argument("--splits", nargs="+", default=None)
+    mat.add_argument("--workers", type=int, default=16)
+
+    cnt = sub.add_parser("counts", help="per-split image counts from the index")
+    cnt.add_argument("index")
+
+    tree = sub.add_parser("tree", help="index an existing <split>/<breed>/ tree as it is")
+    tree.add_argument("tree_dir")
+    tree.add_argument("--index", default=None, help="default: <tree_dir>/splits.csv")
+
+    prune = sub.add_parser("prune", help="drop index rows whose files are gone")
+    prune.add_argument("index")
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if args.command == "build":
+        ratios = tuple(zip(("train", "val", "test"), args.ratios))
+        counts = build_index(args.source, args.index, ratios, args.salt)
+        print(f"✅ Index written to {args.index}: " + ", ".join(f"{s}={counts[s]}" for s, _ in ratios))
+    elif args.command == "tree":
+        index_path = args.index or os.path.join(args.tree_dir, "splits.csv")
+        counts = index_tree(args.tree_dir, index_path)
+        print(f"✅ Index written to {index_path}: " + ", ".join(f"{s}={n}" for s, n in sorted(counts.items())))
+    elif args.command == "prune":
+        print(f"✅ Removed {prune_index(args.index)} missing images from {args.index}")
+    elif args.command == "materialize":
+        results = materialize(args.index, args.out_dir, args.mode, args.splits, args.workers)
+        print(f"✅ {args.out_dir}: " + ", ".join(f"{k}={v}" for k, v in sorted(results.items())))
+    else:
+        for split, breeds in sorted(index_counts(args.index).items()):
+            print(f"{split}: {sum(breeds.values())} images, {len(breeds)} breeds")
+    print(f"⏱️ {time.perf_counter() - start:.2f}s")
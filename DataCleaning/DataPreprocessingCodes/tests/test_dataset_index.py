@@ -0,0 +1,100 @@
+import os
+import shutil
+
+import pytest
+from PIL import Image
+
+from dataset_index import DatasetIndex
+
+
+def add_image(path, size=(8, 6)):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", size).save(path, "JPEG")
+
+
+@pytest.fixture
+def tree(tmp_path):
+    root = tmp_path / "dataset"
+    for split in ("train", "val"):
+        for breed in ("akita", "pug"):
+            for i in range(3):
+                add_image(str(root / split / breed / f"{i}.jpg"))
+    (root / "train" / "pug" / "notes.txt").write_text("not an image")
+    return root
+
+
+@pytest.fixture
+def index(tree, tmp_path):
+    with DatasetIndex(str(tmp_path / "index.db"), str(tree)) as index:
+        yield index
+
+
+def scanned(stats):
+    return stats.get("dirs_scanned", 0), stats.get("files_updated", 0), stats.get("files_removed", 0)
+
+
+def test_first_refresh_indexes_everything(index):
+    assert scanned(index.refresh()) == (4, 12, 0)
+    assert index.counts() == {"train": {"akita": 3, "pug": 3}, "val": {"akita": 3, "pug": 3}}
+    assert index.class_names() == ["akita", "pug"]
+    width, height = index.conn.execute("SELECT width, height FROM files LIMIT 1").fetchone()
+    assert (width, height) == (8, 6)
+
+
+def test_unchanged_tree_lists_no_folder(index):
+    index.refresh()
+    stats = index.refresh()
+    assert scanned(stats) == (0, 0, 0) and stats["dirs_unchanged"] == 4
+
+
+def test_only_changed_folders_are_relisted(index, tree):
+    index.refresh()
+    add_image(str(tree / "train" / "pug" / "new.jpg"))
+    os.remove(tree / "val" / "akita" / "0.jpg")
+    stats = index.refresh()
+    assert scanned(stats) == (2, 1, 1) and stats["dirs_unchanged"] == 2
+    assert index.counts()["train"]["pug"] == 4 and index.counts()["val"]["akita"] == 2
+    assert str(tree / "train" / "pug" / "new.jpg") in index.files("train", "pug")
+
+
+def test_removed_breed_folder_drops_its_files(index, tree):
+    index.refresh()
+    shutil.rmtree(tree / "val" / "pug")
+    assert scanned(index.refresh())[2] == 3
+    assert index.counts()["val"] == {"akita": 3}
+
+
+def test_in_place_rewrite_needs_a_full_refresh(index, tree):
+    index.refresh()
+    dir_mtime = os.stat(tree / "train" / "akita").st_mtime_ns
+    add_image(str(tree / "train" / "akita" / "1.jpg"), size=(20, 10))
+    os.utime(tree / "train" / "akita", ns=(dir_mtime, dir_mtime))   # rewriting a file keeps the folder mtime
+
+    assert scanned(index.refresh()) == (0, 0, 0)
+    assert scanned(index.refresh(full=True)) == (4, 1, 0)
+    row = index.conn.execute(
+        "SELECT width, height FROM files WHERE split = 'train' AND breed = 'akita' AND name = '1.jpg'").fetchone()
+    assert row == (20, 10)
+
+
+def test_flat_layout_uses_an_empty_split(tmp_path):
+    root = tmp_path / "flat"
+    add_image(str(root / "pug" / "a.jpg"))
+    add_image(str(root / "akita" / "b.jpg"))
+    with DatasetIndex(str(tmp_path / "flat.db"), str(root)) as index:
+        index.refresh()
+        assert index.counts() == {"": {"akita": 1, "pug": 1}}
+        assert index.files() == [str(root / "akita" / "b.jpg"), str(root / "pug" / "a.jpg")]
+        assert index.class_names() == index.class_names("val") == ["akita", "pug"]
+
+
+def test_new_root_starts_over(tree, tmp_path):
+    db = str(tmp_path / "index.db")
+    with DatasetIndex(db, str(tree)) as index:
+        index.refresh()
+    other = tmp_path / "other"
+    add_image(str(other / "train" / "beagle" / "x.jpg"))
+    with DatasetIndex(db, str(other)) as index:
+        assert index.counts() == {}
+        index.refresh()
+        assert index.counts() == {"train": {"beagle": 1}}
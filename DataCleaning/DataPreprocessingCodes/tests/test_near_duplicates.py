@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+pytest.importorskip("cv2")   # near_duplicates shares clean_dataset's image code
+
+import near_duplicates
+from clean_dataset import TARGET_SIZE, metrics_size
+from near_duplicates import BKTree, collect_images, hamming
+
+
+def brute_force(items, h, radius):
+    return sorted((hamming(h, stored), item) for stored, item in items if hamming(h, stored) <= radius)
+
+
+def flip_bits(h, count, rng):
+    for bit in rng.sample(range(64), count):
+        h ^= 1 << bit
+    return h
+
+
+@pytest.fixture
+def hashes():
+    rng = random.Random(1234)
+    base = [rng.getrandbits(64) for _ in range(300)]
+    # Clusters of near copies around some hashes, plus exact duplicates
+    near = [flip_bits(h, rng.randint(1, 10), rng) for h in base[:100] for _ in range(2)]
+    return [(h, f"img{i}") for i, h in enumerate(base + near + base[:20])]
+
+
+def test_hamming():
+    assert hamming(0b1011, 0b1011) == 0
+    assert hamming(0b1011, 0b0010) == 2
+    assert hamming(0, (1 << 64) - 1) == 64
+
+
+@pytest.mark.parametrize("radius", [0, 1, 4, 8, 12])
+def test_query_matches_brute_force(hashes, radius):
+    tree = BKTree()
+    for h, item in hashes:
+        tree.add(h, item)
+    rng = random.Random(radius)
+    queries = [h for h, _ in rng.sample(hashes, 50)] + [rng.getrandbits(64) for _ in range(20)]
+    for q in queries:
+        assert sorted(tree.query(q, radius)) == brute_force(hashes, q, radius)
+
+
+def test_identical_hashes_share_a_node():
+    tree = BKTree()
+    for item in ("a", "b", "c"):
+        tree.add(0xFFFF, item)
+    assert tree.root[1] == ["a", "b", "c"] and tree.root[2] == {}
+    assert sorted(tree.query(0xFFFF, 0)) == [(0, "a"), (0, "b"), (0, "c")]
+
+
+def test_empty_tree():
+    assert BKTree().query(123, 64) == []
+
+
+class InlinePool:
+    """Pool stand-in that runs in this process, so monkeypatches apply."""
+
+    def __init__(self, workers=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def imap(self, fn, items, chunksize=1):
+        return map(fn, items)
+
+
+class StoredRows:
+    """Manifest stand-in that returns fixed rows and records new measurements."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.recorded = {}
+
+    def lookup(self, path):
+        return self.rows.get(path)
+
+    def record_metrics(self, path, metrics):
+        self.recorded[path] = metrics
+
+    def commit(self):
+        pass
+
+
+def stored(phash, size):
+    return {"readable": 1, "width": 10, "height": 10, "blur": 50.0, "phash": phash, "dhash": 0,
+            "metrics_size": size}
+
+
+def test_manifest_hashes_from_another_scale_are_recomputed(monkeypatch):
+    fresh = {"width": 10, "height": 10, "blur": 50.0, "hash": "x", "phash": 7, "dhash": 7,
+             "metrics_size": metrics_size(TARGET_SIZE)}
+    monkeypatch.setattr(near_duplicates, "Pool", InlinePool)
+    monkeypatch.setattr(near_duplicates, "decode", lambda path: path)
+    monkeypatch.setattr(near_duplicates, "measure", lambda img, size: (fresh, img))
+    manifest = StoredRows({"same.jpg": stored(1, metrics_size(TARGET_SIZE)),
+                           "other.jpg": stored(2, metrics_size((64, 64)))})
+    images = collect_images([("same.jpg", "train", "pug"), ("other.jpg", "train", "pug")], manifest)
+    phashes = {image["path"]: image["phash"] for image in images}
+    assert phashes == {"same.jpg": 1, "other.jpg": 7}
+    assert list(manifest.recorded) == ["other.jpg"]
@@ -0,0 +1,68 @@
+import os
+from collections import Counter
+
+import pytest
+
+from split_index import SPLIT_RATIOS, assign_split, build_index, read_index
+
+
+@pytest.mark.parametrize("breed, filename, split", [
+    ("n02085620-Chihuahua", "n02085620_10000.jpg", "train"),
+    ("n02085620-Chihuahua", "n02085620_10003.jpg", "test"),
+    ("n02085620-Chihuahua", "n02085620_10006.jpg", "val"),
+    ("n02113978-Mexican_hairless", "n02113978_1325.jpg", "test"),
+])
+def test_assignment_is_pinned(breed, filename, split):
+    # Changing the hash, salt or ratios silently reshuffles every dataset
+    assert assign_split(breed, filename) == split
+
+
+def test_assignment_is_deterministic():
+    names = [f"img_{i}.jpg" for i in range(200)]
+    assert [assign_split("pug", n) for n in names] == [assign_split("pug", n) for n in names]
+
+
+def test_ratios_are_respected():
+    counts = Counter(assign_split("beagle", f"img_{i}.jpg") for i in range(20000))
+    for split, ratio in SPLIT_RATIOS:
+        assert abs(counts[split] / 20000 - ratio) < 0.015
+
+
+def test_salt_and_breed_change_the_assignment():
+    names = [f"img_{i}.jpg" for i in range(200)]
+    base = [assign_split("pug", n) for n in names]
+    assert base != [assign_split("pug", n, salt="other") for n in names]
+    assert base != [assign_split("akita", n) for n in names]
+
+
+def make_tree(root, files):
+    for breed, name in files:
+        os.makedirs(root / breed, exist_ok=True)
+        (root / breed / name).write_bytes(b"")
+
+
+def test_adding_images_never_moves_existing_ones(tmp_path):
+    source, index = tmp_path / "images", str(tmp_path / "splits.csv")
+    make_tree(source, [(breed, f"{i}.jpg") for breed in ("pug", "akita") for i in range(50)])
+    build_index(str(source), index)
+    before = {path: split for path, _, split in read_index(index)}
+
+    make_tree(source, [("pug", f"new_{i}.jpg") for i in range(30)] + [("beagle", "0.jpg")])
+    os.remove(source / "akita" / "0.jpg")
+    build_index(str(source), index)
+    after = {path: split for path, _, split in read_index(index)}
+
+    assert len(after) == len(before) + 30
+    assert all(after[path] == split for path, split in before.items() if path in after)
+
+
+def test_index_paths_are_relative_and_round_trip(tmp_path):
+    source, index = tmp_path / "images", str(tmp_path / "splits.csv")
+    make_tree(source, [("pug", "a.jpg"), ("pug", "notes.txt")])
+    counts = build_index(str(source), index)
+    assert sum(counts.values()) == 1
+    with open(index, encoding="utf-8") as f:
+        assert f.read().splitlines()[1].startswith("images/pug/a.jpg,pug,")
+    [(path, breed, split)] = read_index(index)
+    assert path == str(source / "pug" / "a.jpg") and breed == "pug"
+    assert read_index(index, split) == [(path, breed, split)]
@@ -6,7 +6,6 @@ import multer from "multer";
 import cors from "cors";
 import { spawn } from "child_process";
 import path from "path";
-import fs from "fs";
 import { fileURLToPath } from "url";
 
 const __filename = fileURLToPath(import.meta.url);
@@ -18,37 +17,210 @@ const PORT = 5000;
 app.use(cors());
 app.use(express.json());
 
-// Configure multer for image uploads
-const upload = multer({ dest: "uploads/" });
+// Uploads stay in memory and are framed straight into a worker's stdin,
+// so a request never touches disk
+const MAX_UPLOAD_BYTES = Number(process.env.MAX_UPLOAD_BYTES || 10 * 1024 * 1024);
+const upload = multer({ storage: multer.memoryStorage(), limits: { fileSize: MAX_UPLOAD_BYTES } });
 
 // ------------------------------------------------------------
-// ✅ Prediction Endpoint
+// ✅ Warm Predictor Workers
 // ------------------------------------------------------------
-app.post("/predict", upload.single("file"), (req, res) => {
-  const imagePath = req.file.path;
+// Each worker is a long-lived `python predictor.py --worker` process that
+// loads the model once and answers line-delimited JSON requests.
+// With PREDICTOR_POOL=1 a single worker_pool.py supervisor is spawned instead;
+// it runs core-pinned predictor workers (sized by PREDICTOR_POOL_CONFIG from
+// `worker_pool.py autotune`) behind the same protocol.
+// With PREDICTOR_URL set no worker is spawned: uploads are proxied to a
+// running `python http_server.py`, which applies its own admission control,
+// and its 503/504 answers are passed through to the client.
+const PREDICTOR_URL = process.env.PREDICTOR_URL;
+const USE_POOL = process.env.PREDICTOR_POOL === "1";
+const WORKER_COUNT = PREDICTOR_URL ? 0 : USE_POOL ? 1 : Number(process.env.PREDICTOR_WORKERS || 2);
+const WORKER_ARGS = USE_POOL
+  ? ["worker_pool.py", "serve", ...(process.env.PREDICTOR_POOL_CONFIG ? ["--config", process.env.PREDICTOR_POOL_CONFIG] : [])]
+  : ["predictor.py", "--worker"];
+const RESTART_DELAY_MS = 1000;
+// A request without an answer by then fails with 504; a worker that times
+// out this many requests in a row is assumed hung and is killed (the exit
+// handler restarts it)
+const REQUEST_TIMEOUT_MS = Number(process.env.PREDICT_TIMEOUT_MS || 30000);
+const MAX_CONSECUTIVE_TIMEOUTS = 3;
 
-  // Call Python script for prediction
-  const pythonProcess = spawn("python", ["predictor.py", imagePath]);
+const workers = [];
+let nextRequestId = 1;
+let shuttingDown = false;
 
-  let result = "";
+function startWorker(slot) {
+  const proc = spawn("python", WORKER_ARGS, { cwd: __dirname });
+  const worker = { proc, pending: new Map(), buffer: "", ready: false, timeouts: 0 };
 
-  pythonProcess.stdout.on("data", (data) => {
-    result += data.toString();
+  proc.stdout.on("data", (data) => {
+    worker.buffer += data.toString();
+    let newline;
+    while ((newline = worker.buffer.indexOf("\n")) >= 0) {
+      const line = worker.buffer.slice(0, newline).trim();
+      worker.buffer = worker.buffer.slice(newline + 1);
+      if (line) handleWorkerLine(worker, line);
+    }
   });
 
-  pythonProcess.stderr.on("data", (data) => {
+  proc.stderr.on("data", (data) => {
     console.error("🐍 Python error:", data.toString());
   });
 
-  pythonProcess.on("close", () => {
+  proc.on("exit", (code, signal) => {
+    for (const { reject, timer } of worker.pending.values()) {
+      clearTimeout(timer);
+      reject(new Error(`Predictor worker exited with code ${code ?? signal}`));
+    }
+    worker.pending.clear();
+    if (!shuttingDown) {
+      console.error(`⚠️ Predictor worker ${slot} exited (${code ?? signal}), restarting...`);
+      setTimeout(() => (workers[slot] = startWorker(slot)), RESTART_DELAY_MS);
+    }
+  });
+
+  return worker;
+}
+
+function handleWorkerLine(worker, line) {
+  let message;
+  try {
+    message = JSON.parse(line);
+  } catch (err) {
+    console.error("Unparseable worker output:", line);
+    return;
+  }
+  if (message.ready) {
+    worker.ready = true;
+    return;
+  }
+  const pending = worker.pending.get(message.id);
+  if (!pending) return;
+  worker.pending.delete(message.id);
+  clearTimeout(pending.timer);
+  worker.timeouts = 0;
+  if (message.error) pending.reject(new Error(message.error));
+  else pending.resolve(message.prediction);
+}
+
+function pickWorker() {
+  // Least outstanding requests among live workers, preferring ready ones
+  const live = workers.filter((w) => w && w.proc.exitCode === null && !w.proc.killed);
+  if (live.length === 0) return null;
+  const ready = live.filter((w) => w.ready);
+  const candidates = ready.length > 0 ? ready : live;
+  return candidates.reduce((a, b) => (b.pending.size < a.pending.size ? b : a));
+}
+
+function predict(imageBuffer) {
+  return new Promise((resolve, reject) => {
+    const worker = pickWorker();
+    if (!worker) {
+      reject(new Error("No predictor worker available"));
+      return;
+    }
+    const id = nextRequestId++;
+    const timer = setTimeout(() => onTimeout(worker, id), REQUEST_TIMEOUT_MS);
+    worker.pending.set(id, { resolve, reject, timer });
+    // Framed request: a JSON header line, then exactly image_size raw bytes
+    worker.proc.stdin.write(JSON.stringify({ id, image_size: imageBuffer.length }) + "\n");
+    worker.proc.stdin.write(imageBuffer);
+  });
+}
+
+function onTimeout(worker, id) {
+  const pending = worker.pending.get(id);
+  if (!pending) return;
+  worker.pending.delete(id);
+  const err = new Error(`Prediction timed out after ${REQUEST_TIMEOUT_MS} ms`);
+  err.code = "ETIMEDOUT";
+  pending.reject(err);
+  // A late answer for this id is ignored by handleWorkerLine
+  worker.timeouts += 1;
+  if (worker.timeouts >= MAX_CONSECUTIVE_TIMEOUTS && !worker.proc.killed) {
+    console.error(`⚠️ Predictor worker timed out ${worker.timeouts} requests in a row, killing it`);
+    worker.proc.kill("SIGKILL");
+  }
+}
+
+async function proxyPredict(file) {
+  const form = new FormData();
+  form.append("file", new Blob([file.buffer], { type: file.mimetype }), file.originalname || "upload");
+  const upstream = await fetch(`${PREDICTOR_URL}/predict`, {
+    method: "POST",
+    body: form,
+    signal: AbortSignal.timeout(REQUEST_TIMEOUT_MS),
+  });
+  return { status: upstream.status, retryAfter: upstream.headers.get("retry-after"), body: await upstream.json() };
+}
+
+for (let slot = 0; slot < WORKER_COUNT; slot++) {
+  workers[slot] = startWorker(slot);
+}
+
+function stopWorkers() {
+  shuttingDown = true;
+  for (const worker of workers) {
+    if (worker && worker.proc.exitCode === null) {
+      worker.proc.stdin.end(JSON.stringify({ id: 0, cmd: "shutdown" }) + "\n");
+    }
+  }
+}
+
+process.on("SIGINT", () => {
+  stopWorkers();
+  process.exit(0);
+});
+process.on("SIGTERM", () => {
+  stopWorkers();
+  process.exit(0);
+});
+
+// ------------------------------------------------------------
+// ✅ Prediction Endpoint
+// ------------------------------------------------------------
+function receiveUpload(req, res, next) {
+  upload.single("file")(req, res, (err) => {
+    if (err) {
+      const status = err.code === "LIMIT_FILE_SIZE" ? 413 : 400;
+      res.status(status).json({ error: err.message });
+      return;
+    }
+    next();
+  });
+}
+
+app.post("/predict", receiveUpload, async (req, res) => {
+  if (!req.file) {
+    res.status(400).json({ error: "No image uploaded (expected form field 'file')" });
+    return;
+  }
+
+  if (PREDICTOR_URL) {
     try {
-      fs.unlinkSync(imagePath); // cleanup temp file
-      res.json({ prediction: JSON.parse(result.trim()) });
+      const { status, retryAfter, body } = await proxyPredict(req.file);
+      if (retryAfter) res.set("Retry-After", retryAfter);
+      res.status(status).json(body);
     } catch (err) {
-      console.error("Error parsing prediction:", err);
-      res.status(500).json({ error: "Prediction failed" });
+      if (err.name === "TimeoutError") {
+        res.status(504).json({ error: "Prediction timed out" });
+        return;
+      }
+      console.error("Predictor server unreachable:", err);
+      res.status(502).json({ error: "Prediction failed" });
     }
-  });
+    return;
+  }
+
+  try {
+    const prediction = await predict(req.file.buffer);
+    res.json({ prediction });
+  } catch (err) {
+    console.error("Error during prediction:", err);
+    if (err.code === "ETIMEDOUT") res.status(504).json({ error: "Prediction timed out" });
+    else res.status(500).json({ error: "Prediction failed" });
+  }
 });
 
 // ------------------------------------------------------------
@@ -0,0 +1,183 @@
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Dynamic Micro-Batching Scheduler
+# ============================================================
+#
+# Coalesces concurrent single-image requests into one model call.
+# A batch is flushed as soon as it holds `max_batch_size` images or
+# `max_wait_ms` has passed since its first image arrived, whichever
+# comes first. Each caller gets back its own row of the output.
+#
+# With a `buffer` (preprocessing.BatchBuffer) callers submit decoded uint8
+# images and each is written once into the reused float32 batch, instead
+# of being converted per request and copied again by np.stack.
+
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+import numpy as np
+
+_STOP = object()
+
+
+class MicroBatcher:
+    def __init__(self, predict_fn, max_batch_size=16, max_wait_ms=5.0, buffer=None):
+        """predict_fn takes an (N, H, W, C) array and returns N output rows.
+
+        `buffer`, if given, has put(index, item) and batch(count); items are
+        written into it and predict_fn gets buffer.batch(N).
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if buffer is not None and buffer.capacity < max_batch_size:
+            raise ValueError(f"buffer holds {buffer.capacity} images, max_batch_size is {max_batch_size}")
+        self.predict_fn = predict_fn
+        self.buffer = buffer
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_total = 0.0
+        self._predict_total = 0.0
+
+    # ------------------------------------------------------------
+    # ✅ Lifecycle
+    # ------------------------------------------------------------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Finish everything already queued, then stop the scheduler thread."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------
+    # ✅ Request Side
+    # ------------------------------------------------------------
+    def submit(self, item):
+        """Queue one image (decoded if there is a buffer); the Future resolves to its output row."""
+        if self._thread is None:
+            raise RuntimeError("MicroBatcher is not running")
+        future = Future()
+        with self._stats_lock:
+            self._submitted += 1
+        self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def predict(self, item, timeout=None):
+        return self.submit(item).result(timeout)
+
+    # ------------------------------------------------------------
+    # ✅ Scheduler Loop
+    # ------------------------------------------------------------
+    def _collect(self):
+        """Block for the first request, then gather more until full or timed out."""
+        first = self._queue.get()
+        if first is _STOP:
+            return None, True
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        stopping = False
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                stopping = True
+                break
+            batch.append(entry)
+        return batch, stopping
+
+    def _run(self):
+        while True:
+            batch, stopping = self._collect()
+            if batch:
+                self._run_batch(batch)
+            if stopping:
+                # Drain anything that raced in behind the stop marker
+                leftovers = []
+                while True:
+                    try:
+                        entry = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if entry is not _STOP:
+                        leftovers.append(entry)
+                for start in range(0, len(leftovers), self.max_batch_size):
+                    self._run_batch(leftovers[start:start + self.max_batch_size])
+                return
+
+    def _run_batch(self, batch):
+        # Callers may have cancelled while queued
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        started = time.perf_counter()
+        try:
+            outputs = self.predict_fn(self._inputs([item for item, _, _ in batch]))
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            failed = len(batch)
+        else:
+            for row, (_, future, _) in zip(outputs, batch):
+                future.set_result(row)
+            failed = 0
+        finished = time.perf_counter()
+
+        with self._stats_lock:
+            self._batch_sizes[len(batch)] += 1
+            self._completed += len(batch) - failed
+            self._failed += failed
+            self._wait_total += sum(started - queued for _, _, queued in batch)
+            self._predict_total += finished - started
+
+    def _inputs(self, items):
+        # Only the scheduler thread touches the buffer, one batch at a time
+        if self.buffer is None:
+            return np.stack(items)
+        for index, item in enumerate(items):
+            self.buffer.put(index, item)
+        return self.buffer.batch(len(items))
+
+    # ------------------------------------------------------------
+    # ✅ Statistics
+    # ------------------------------------------------------------
+    def stats(self):
+        """Snapshot of queue depth and achieved batch sizes for tuning."""
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            items = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "batches": batches,
+                "mean_batch_size": items / batches if batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in sorted(self._batch_sizes.items())},
+                "mean_queue_wait_ms": 1000.0 * self._wait_total / items if items else 0.0,
+                "mean_batch_predict_ms": 1000.0 * self._predict_total / batches if batches else 0.0,
+            }
@@ -0,0 +1,178 @@
+# pyright: reportMissingImports=false
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Predictor Latency/Throughput Benchmark
+# ============================================================
+#
+# Usage:
+#   python bench_predictor.py --data final_dataset/test -o bench_results.json
+#   python bench_predictor.py --batch-sizes 1 8 16 32 --threads 1 2 4 8
+#   PREDICTOR_RUNTIME=tflite PREDICTOR_MODEL=efficientnetb3_int8.tflite python bench_predictor.py
+#
+# Measures, each in a fresh process so runs do not disturb each other:
+#   cold start     spawn → predictor.load() done (imports, model load,
+#                  compile and warm-up), plus the per-phase breakdown
+#   warm latency   predict_breed() p50/p95/p99 on single images
+#   throughput     images/sec of run_model() for every batch size × thread count
+#   peak RSS       per measuring process
+# Results go to a JSON file tagged with the git commit and host so runs on
+# different commits or machines can be diffed.
+
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from compare_runtimes import format_mb, labelled_images, peak_rss_mb
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def list_images(data_dir, limit):
+    if data_dir.endswith(".csv"):
+        return [path for path, _ in labelled_images(data_dir, limit)]
+    paths = []
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        paths += [os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXTENSIONS)]
+    return paths[:limit]
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    return {f"p{p}": float(np.percentile(samples, p)) for p in (50, 95, 99)} | {"mean": float(np.mean(samples))}
+
+
+def child(mode, args):
+    """Run one measurement in this (fresh) process and print it as JSON."""
+    if args.threads_value:
+        os.environ["PREDICTOR_THREADS"] = str(args.threads_value)
+    start = time.perf_counter()
+    import predictor
+    predictor.load()
+    import_seconds = time.perf_counter() - start
+    paths = list_images(args.data, args.limit)
+
+    if mode == "latency":
+        for path in paths[:args.warmup]:
+            predictor.predict_breed(path)
+        samples = []
+        for path in paths:
+            t0 = time.perf_counter()
+            predictor.predict_breed(path)
+            samples.append((time.perf_counter() - t0) * 1000.0)
+        return {"import_seconds": import_seconds, "latency_ms": percentiles(samples),
+                "samples": len(samples), "peak_rss_mb": peak_rss_mb()}
+
+    # Throughput: decode once up front so only inference is timed
+    inputs = np.stack([predictor.load_image(p) for p in paths])
+    results = []
+    for batch_size in args.batch_sizes:
+        batches = [inputs[i:i + batch_size] for i in range(0, len(inputs) - batch_size + 1, batch_size)]
+        if not batches:
+            continue
+        predictor.run_model(batches[0])  # warm-up for this batch shape
+        images = 0
+        t0 = time.perf_counter()
+        while True:
+            for batch in batches:
+                predictor.run_model(batch)
+                images += len(batch)
+            if time.perf_counter() - t0 >= args.min_seconds:
+                break
+        elapsed = time.perf_counter() - t0
+        results.append({"batch_size": batch_size, "images": images, "seconds": elapsed,
+                        "images_per_sec": images / elapsed})
+    return {"threads": args.threads_value, "import_seconds": import_seconds,
+            "throughput": results, "peak_rss_mb": peak_rss_mb()}
+
+
+def run_child(mode, args, threads=None):
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", mode, "--data", os.path.abspath(args.data),
+           "--limit", str(args.limit), "--warmup", str(args.warmup),
+           "--min-seconds", str(args.min_seconds), "--batch-sizes", *map(str, args.batch_sizes)]
+    if threads:
+        cmd += ["--threads-value", str(threads)]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=HERE)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{proc.stderr.strip()}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def cold_start(repeats):
+    code = "import json, predictor; print(json.dumps(predictor.load()))"
+    samples, phases = [], None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code], check=True, cwd=HERE, capture_output=True, text=True)
+        samples.append(time.perf_counter() - t0)
+        phases = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {"seconds": percentiles(samples) | {"min": min(samples)}, "repeats": repeats, "last_phases": phases}
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=HERE).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "git_commit": commit or None,
+        "host": socket.gethostname(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "runtime": os.environ.get("PREDICTOR_RUNTIME", "keras"),
+        "model": os.environ.get("PREDICTOR_MODEL"),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark predictor latency and throughput")
+    parser.add_argument("--data", default="final_dataset/test", help="image folder or split index .csv (test split)")
+    parser.add_argument("--limit", type=int, default=256, help="images used per measurement")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--cold-repeats", type=int, default=3)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 16, 32])
+    parser.add_argument("--threads", type=int, nargs="+", default=[0],
+                        help="inference thread counts to try (0 = runtime default)")
+    parser.add_argument("--min-seconds", type=float, default=5.0, help="minimum timed run per batch size")
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--child", choices=["latency", "throughput"], help=argparse.SUPPRESS)
+    parser.add_argument("--threads-value", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.child, args)))
+        sys.exit(0)
+
+    report = {"environment": environment()}
+    print("⏱️  Cold start...")
+    report["cold_start"] = cold_start(args.cold_repeats)
+    print("⏱️  Warm single-image latency...")
+    report["latency"] = run_child("latency", args)
+    report["throughput"] = []
+    for threads in args.threads:
+        print(f"⏱️  Throughput with threads={threads or 'default'}...")
+        report["throughput"].append(run_child("throughput", args, threads))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    cold = report["cold_start"]["seconds"]
+    lat = report["latency"]["latency_ms"]
+    rss = format_mb(report["latency"]["peak_rss_mb"], 0)
+    print(f"\n📊 Cold start p50 {cold['p50']:.2f}s | latency p50 {lat['p50']:.1f} ms, "
+          f"p95 {lat['p95']:.1f} ms, p99 {lat['p99']:.1f} ms | RSS {rss} MB")
+    for run in report["throughput"]:
+        for r in run["throughput"]:
+            print(f"   threads={run['threads'] or 'default':<7} batch={r['batch_size']:<3} "
+                  f"{r['images_per_sec']:8.1f} images/sec")
+    print(f"✅ Results written to {args.output}")
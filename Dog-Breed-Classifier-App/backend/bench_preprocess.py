@@ -0,0 +1,104 @@
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Preprocessing Microbenchmark
+# ============================================================
+#
+# Usage:
+#   python bench_preprocess.py final_dataset/test --limit 200 --batch-size 16
+#
+# Compares the original predict_breed preprocessing with preprocessing.py:
+#   per-image time (mean / p50 / p95) from a run without tracing, and
+#   peak memory per image: the highest tracemalloc reading (which sees
+#   NumPy buffers) above the starting point during one call, in KB and
+#   as a multiple of one 300x300x3 float32 input. This is peak bytes
+#   held at once, not a count of allocations.
+# The batched path writes into a preallocated BatchBuffer, so its peak is
+# just the decoded uint8 array plus PIL's working memory.
+
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image
+
+import preprocessing
+
+SIZE = (300, 300)
+INPUT_BYTES = SIZE[0] * SIZE[1] * 3 * 4
+
+
+def legacy_load_image(path):
+    """The pre-preprocessing.py predictor path, kept for comparison."""
+    img = Image.open(path).convert("L")
+    img = img.resize(SIZE)
+    img_array = np.array(img, dtype=np.float32)
+    img_array = np.expand_dims(img_array, axis=-1)
+    img_array = np.repeat(img_array, 3, axis=-1)
+    img_array = np.expand_dims(img_array, axis=0)
+    return img_array  # EfficientNet preprocess_input is a pass-through
+
+
+def make_variants(batch_size):
+    buffer = preprocessing.BatchBuffer(batch_size, SIZE)
+    slot = [0]
+
+    def batched(path):
+        buffer.put(slot[0] % batch_size, preprocessing.decode(path, SIZE))
+        slot[0] += 1
+
+    return {
+        "legacy": legacy_load_image,
+        "fast": lambda path: preprocessing.preprocess(path, SIZE),
+        "fast_draft": lambda path: preprocessing.preprocess(path, SIZE, draft=True),
+        "fast_batch_buffer": batched,
+    }
+
+
+def time_variant(fn, paths, repeats):
+    times = []
+    for _ in range(repeats):
+        for path in paths:
+            t0 = time.perf_counter()
+            fn(path)
+            times.append((time.perf_counter() - t0) * 1000.0)
+    return times
+
+
+def peak_bytes_variant(fn, paths):
+    peaks = []
+    tracemalloc.start()
+    try:
+        for path in paths:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            result = fn(path)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+            del result
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image preprocessing paths")
+    parser.add_argument("data", nargs="?", default="final_dataset/test")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.data, "**", "*.jp*g"), recursive=True))[:args.limit]
+    if not paths:
+        raise SystemExit(f"No images found under {args.data}")
+
+    print(f"📊 {len(paths)} images × {args.repeats} repeats\n")
+    print(f"{'variant':<18} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'peak KB':>9} {'peak/input':>11}")
+    for name, fn in make_variants(args.batch_size).items():
+        fn(paths[0])  # warm PIL / NumPy code paths
+        times = time_variant(fn, paths, args.repeats)
+        peaks = peak_bytes_variant(fn, paths)
+        peak = float(np.mean(peaks))
+        print(f"{name:<18} {np.mean(times):>8.2f} {np.percentile(times, 50):>8.2f} "
+              f"{np.percentile(times, 95):>8.2f} {peak / 1024:>9.0f} {peak / INPUT_BYTES:>11.2f}")
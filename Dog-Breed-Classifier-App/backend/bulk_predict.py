@@ -0,0 +1,223 @@
+# pyright: reportMissingImports=false
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Streaming Bulk Classification
+# ============================================================
+#
+# Usage:
+#   python bulk_predict.py final_dataset/test -o test_scores.jsonl
+#   python bulk_predict.py "archive/**/*.jpg" --format csv -o scores.csv
+#   python bulk_predict.py @file_list.txt --batch-size 32 --workers 8
+#
+# Inputs may be directories (walked recursively), glob patterns, single
+# files or @lists (one path per line). Paths are streamed, decoded to
+# small uint8 arrays in a thread pool behind a bounded prefetch queue,
+# written into one reused float32 batch buffer, classified in batches and
+# written out as soon as each batch finishes, so memory stays flat no
+# matter how many images are processed.
+
+import argparse
+import csv
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import predictor
+from preprocessing import BatchBuffer
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+_DONE = object()
+
+# ------------------------------------------------------------
+# ✅ Input Discovery
+# ------------------------------------------------------------
+def iter_image_paths(inputs):
+    """Yield image paths lazily from directories, globs, files and @lists."""
+    for item in inputs:
+        if item.startswith("@"):
+            with open(item[1:], encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        yield line
+        elif os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif glob.has_magic(item):
+            for path in glob.iglob(item, recursive=True):
+                if os.path.isfile(path):
+                    yield path
+        else:
+            yield item
+
+# ------------------------------------------------------------
+# ✅ Parallel Decode with Bounded Prefetch
+# ------------------------------------------------------------
+def _decode(path):
+    try:
+        return path, predictor.decode_image(path), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def prefetch_decoded(paths, workers, max_pending):
+    """Decode images in parallel, yielding (path, array, error) as they finish.
+
+    At most `max_pending` images are decoded or waiting at any time, which
+    bounds memory regardless of how many paths there are.
+    """
+    results = queue.Queue()
+    slots = threading.BoundedSemaphore(max_pending)
+    stop = threading.Event()
+
+    def producer(executor):
+        try:
+            for path in paths:
+                slots.acquire()
+                if stop.is_set():
+                    return
+                executor.submit(_decode, path).add_done_callback(lambda f: results.put(f.result()))
+        finally:
+            executor.shutdown(wait=True)
+            results.put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode")
+    thread = threading.Thread(target=producer, args=(executor,), daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = results.get()
+            if item is _DONE:
+                return
+            slots.release()
+            yield item
+    finally:
+        stop.set()
+        # Unblock the producer if it is waiting for a slot
+        try:
+            slots.release()
+        except ValueError:
+            pass
+
+# ------------------------------------------------------------
+# ✅ Output Writers
+# ------------------------------------------------------------
+class JsonlWriter:
+    def __init__(self, stream, top_k):
+        self.stream = stream
+
+    def write(self, path, results, error):
+        record = {"path": path}
+        if error is None:
+            record["prediction"] = predictor.format_prediction(results)
+        else:
+            record["error"] = error
+        self.stream.write(json.dumps(record) + "\n")
+
+    def flush(self):
+        self.stream.flush()
+
+
+class CsvWriter:
+    def __init__(self, stream, top_k):
+        self.stream = stream
+        self.top_k = top_k
+        self.writer = csv.writer(stream)
+        header = ["path"]
+        for rank in range(1, top_k + 1):
+            header += [f"breed_{rank}", f"confidence_{rank}"]
+        self.writer.writerow(header + ["error"])
+
+    def write(self, path, results, error):
+        row = [path]
+        for rank in range(self.top_k):
+            if error is None and rank < len(results):
+                breed, confidence = results[rank]
+                row += [breed, f"{confidence:.4f}"]
+            else:
+                row += ["", ""]
+        self.writer.writerow(row + [error or ""])
+
+    def flush(self):
+        self.stream.flush()
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter}
+
+# ------------------------------------------------------------
+# ✅ Batched Inference Loop
+# ------------------------------------------------------------
+def classify_stream(paths, writer, batch_size=32, workers=None, prefetch_batches=4, top_k=predictor.TOP_K):
+    """Classify every path, writing each batch as it completes. Returns counters."""
+    workers = workers or os.cpu_count() or 1
+    counts = {"images": 0, "errors": 0}
+    buffer = BatchBuffer(batch_size, predictor.IMG_SIZE, predictor.PREPROCESSING)
+    batch_paths = []
+
+    def flush_batch():
+        probs = predictor.run_model(buffer.batch(len(batch_paths)))
+        for path, row in zip(batch_paths, probs):
+            writer.write(path, predictor.top_predictions(row, top_k), None)
+        counts["images"] += len(batch_paths)
+        writer.flush()
+        batch_paths.clear()
+
+    decoded = prefetch_decoded(paths, workers, max_pending=prefetch_batches * batch_size)
+    for path, decoded_image, error in decoded:
+        if error is not None:
+            writer.write(path, None, error)
+            counts["errors"] += 1
+            continue
+        buffer.put(len(batch_paths), decoded_image)
+        batch_paths.append(path)
+        if len(batch_paths) == batch_size:
+            flush_batch()
+    if batch_paths:
+        flush_batch()
+    writer.flush()
+    return counts
+
+# ------------------------------------------------------------
+# ✅ Entry Point
+# ------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify many images in batches")
+    parser.add_argument("inputs", nargs="+", help="directories, glob patterns, files or @file_list.txt")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=None, help="decode threads (default: CPU count)")
+    parser.add_argument("--prefetch", type=int, default=4, help="decoded batches buffered ahead of the model")
+    parser.add_argument("--top-k", type=int, default=predictor.TOP_K)
+    args = parser.parse_args()
+
+    predictor.load()
+    try:
+        predictor.check_top_k(args.top_k)
+    except ValueError as e:
+        # Before -o truncates the output file or a header is written
+        parser.error(str(e))
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        writer = WRITERS[args.format](out, args.top_k)
+        start = time.perf_counter()
+        counts = classify_stream(
+            iter_image_paths(args.inputs), writer,
+            batch_size=args.batch_size, workers=args.workers,
+            prefetch_batches=args.prefetch, top_k=args.top_k,
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    rate = counts["images"] / elapsed if elapsed > 0 else 0.0
+    print(f"\n📊 Classified {counts['images']} images ({counts['errors']} errors) "
+          f"in {elapsed:.1f}s → {rate:.1f} images/sec", file=sys.stderr)
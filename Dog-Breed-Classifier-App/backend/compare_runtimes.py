@@ -0,0 +1,196 @@
+# pyright: reportMissingImports=false
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Runtime Accuracy / Speed Report
+# ============================================================
+#
+# Usage:
+#   python compare_runtimes.py keras:efficientnetb3_bundle.h5 \
+#       tflite:efficientnetb3_fp16.tflite tflite:efficientnetb3_int8.tflite \
+#       onnx:efficientnetb3.onnx --data final_dataset/test -o runtime_report.json
+#
+# Each backend is measured in its own process so load time and peak RSS
+# are not polluted by the others. The first backend is the accuracy
+# baseline; the report marks the fastest backend whose top-1 accuracy is
+# within --max-top1-drop points of it.
+
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where it cannot be read."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kB on Linux but in bytes on macOS
+        return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    # peak_wset is the Windows peak working set; elsewhere only the current RSS is known
+    return getattr(info, "peak_wset", info.rss) / (1024.0 * 1024.0)
+
+
+def format_mb(value, width=8):
+    return f"{value:>{width}.0f}" if value is not None else f"{'-':>{width}}"
+
+
+def format_ms(value, width=8):
+    return f"{value:>{width}.1f}" if value is not None else f"{'-':>{width}}"
+
+
+def labelled_images(data_dir, limit=None, split="test"):
+    """(path, breed) pairs from a <breed>/<image> folder or a split index CSV."""
+    if data_dir.endswith(".csv"):
+        # Index from DataCleaning/.../split_index.py: path,breed,split (paths relative to the CSV)
+        base = os.path.dirname(os.path.abspath(data_dir))
+        with open(data_dir, newline="", encoding="utf-8") as f:
+            items = [(os.path.normpath(os.path.join(base, row["path"])), row["breed"])
+                     for row in csv.DictReader(f) if row["split"] == split]
+        return items[:limit] if limit else items
+    items = []
+    for breed in sorted(os.listdir(data_dir)):
+        breed_dir = os.path.join(data_dir, breed)
+        if not os.path.isdir(breed_dir):
+            continue
+        for name in sorted(os.listdir(breed_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((os.path.join(breed_dir, name), breed))
+    return items[:limit] if limit else items
+
+# ------------------------------------------------------------
+# ✅ Single-Backend Measurement (runs in a child process)
+# ------------------------------------------------------------
+def measure(spec, data_dir, batch_size, latency_samples, limit, split="test"):
+    name, model_path = spec.split(":", 1)
+    os.environ["PREDICTOR_RUNTIME"] = name
+    os.environ["PREDICTOR_MODEL"] = model_path
+
+    start = time.perf_counter()
+    import predictor
+    predictor.load()
+    load_seconds = time.perf_counter() - start
+
+    items = labelled_images(data_dir, limit, split)
+    label_index = {label: i for i, label in enumerate(predictor.class_labels)}
+    unknown = sorted({breed for _, breed in items if breed not in label_index})
+    known = [(path, breed) for path, breed in items if breed in label_index]
+    skipped, items = len(items) - len(known), known
+    top1 = top3 = total = 0
+    infer_seconds = 0.0
+    for offset in range(0, len(items), batch_size):
+        chunk = items[offset:offset + batch_size]
+        batch = np.stack([predictor.load_image(path) for path, _ in chunk])
+        t0 = time.perf_counter()
+        probs = predictor.run_model(batch)
+        infer_seconds += time.perf_counter() - t0
+        for row, (_, breed) in zip(probs, chunk):
+            ranked = np.argsort(row)[::-1]
+            truth = label_index[breed]
+            top1 += int(ranked[0] == truth)
+            top3 += int(truth in ranked[:3])
+            total += 1
+
+    # Single-image latency, the shape the web request path sees
+    latencies = []
+    for path, _ in items[:latency_samples]:
+        batch = predictor.load_image(path)[None, ...]
+        t0 = time.perf_counter()
+        predictor.run_model(batch)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+
+    return {
+        "runtime": name,
+        "model": model_path,
+        "model_mb": round(os.path.getsize(model_path) / 1e6, 2),
+        "images": total,
+        "unknown_breeds": unknown,
+        "skipped_images": skipped,
+        "top1": top1 / total if total else 0.0,
+        "top3": top3 / total if total else 0.0,
+        "load_seconds": round(load_seconds, 3),
+        "batch_size": batch_size,
+        "images_per_sec": total / infer_seconds if infer_seconds else 0.0,
+        "latency_ms_p50": float(np.percentile(latencies, 50)) if latencies else None,
+        "latency_ms_p95": float(np.percentile(latencies, 95)) if latencies else None,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+# ------------------------------------------------------------
+# ✅ Report
+# ------------------------------------------------------------
+def pick_fastest(results, max_top1_drop):
+    baseline = results[0]["top1"]
+    eligible = [r for r in results if baseline - r["top1"] <= max_top1_drop / 100.0]
+    return min(eligible, key=lambda r: r["latency_ms_p50"] or float("inf")) if eligible else None
+
+
+def print_table(results, best):
+    print(f"\n{'runtime':<8} {'model':<34} {'MB':>7} {'top1':>7} {'top3':>7} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'img/s':>8} {'RSS MB':>8}")
+    for r in results:
+        mark = " ⭐" if best is r else ""
+        print(f"{r['runtime']:<8} {os.path.basename(r['model']):<34} {r['model_mb']:>7.1f} "
+              f"{r['top1'] * 100:>6.2f}% {r['top3'] * 100:>6.2f}% {format_ms(r['latency_ms_p50'])} "
+              f"{format_ms(r['latency_ms_p95'])} {r['images_per_sec']:>8.1f} {format_mb(r['peak_rss_mb'])}{mark}")
+    for r in results:
+        if r.get("unknown_breeds"):
+            print(f"⚠️ {r['runtime']}: skipped {r['skipped_images']} images of breeds the model does not know: "
+                  f"{', '.join(r['unknown_breeds'])}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare inference backends on a labelled split")
+    parser.add_argument("specs", nargs="+", help="runtime:model_path, e.g. tflite:efficientnetb3_int8.tflite")
+    parser.add_argument("--data", default="final_dataset/test", help="image folder or split index .csv")
+    parser.add_argument("--split", default="test", help="split to use when --data is an index")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--latency-samples", type=int, default=100)
+    parser.add_argument("--limit", type=int, default=None, help="only use the first N images")
+    parser.add_argument("--max-top1-drop", type=float, default=1.0,
+                        help="accuracy budget in percentage points vs the first backend")
+    parser.add_argument("-o", "--output", default="runtime_report.json")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(measure(args.specs[0], args.data, args.batch_size, args.latency_samples,
+                                 args.limit, args.split)))
+        sys.exit(0)
+
+    results = []
+    for spec in args.specs:
+        print(f"⏱️  Measuring {spec} ...")
+        cmd = [sys.executable, __file__, spec, "--single", "--data", args.data, "--split", args.split,
+               "--batch-size", str(args.batch_size), "--latency-samples", str(args.latency_samples)]
+        if args.limit:
+            cmd += ["--limit", str(args.limit)]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"❌ {spec} failed:\n{proc.stderr.strip()}")
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if not results:
+        sys.exit("No backend could be measured.")
+    best = pick_fastest(results, args.max_top1_drop)
+    print_table(results, best)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"baseline": results[0]["runtime"], "max_top1_drop": args.max_top1_drop,
+                   "recommended": best and best["model"], "results": results}, f, indent=2)
+    print(f"\n✅ Report written to {args.output}")
@@ -0,0 +1,271 @@
+# pyright: reportMissingImports=false
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Offline Evaluation
+# ============================================================
+#
+# Usage:
+#   python evaluate.py final_dataset/test -o eval_report.json
+#   python evaluate.py splits.csv --split val --variants served v1 v2
+#   python evaluate.py final_dataset/test --variants rgb:efficientnet grayscale:efficientnet --workers 8
+#
+# Runs the served model (predictor.load(), so the same bundle, runtime and
+# metadata as the web app) over a labelled split and reports, in one pass:
+#   top-1 / top-3 / top-5 accuracy
+#   per-breed accuracy (worst breeds printed, all in the report)
+#   the full confusion matrix (N x N, in class_labels order)
+#   decode and model throughput plus per-batch model latency
+#
+# Images are decoded in a process pool, a few batches ahead of the model.
+# Each image is decoded once per colour mode and then fed to every
+# preprocessing variant, so variants are compared on identical pixels and
+# the model is loaded only once.
+#
+# Variants are "color_mode:preprocessing" or one of:
+#   served  whatever the model metadata says (what predict_breed uses)
+#   v1      debug_predict.py preprocess_v1: RGB, divide by 255
+#   v2      debug_predict.py preprocess_v2: RGB, EfficientNet preprocess_input
+
+import argparse
+import json
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import preprocessing
+
+VARIANT_ALIASES = {"v1": ("rgb", "scale_255"), "v2": ("rgb", "efficientnet")}
+TOP_KS = (1, 3, 5)
+
+# ------------------------------------------------------------
+# ✅ Parallel Decode (runs in worker processes)
+# ------------------------------------------------------------
+def decode_batch(paths, size, color_modes, draft):
+    """{color_mode: [uint8 array or None]} for a list of paths, plus error strings."""
+    decoded = {mode: [] for mode in color_modes}
+    errors = []
+    for path in paths:
+        try:
+            arrays = [preprocessing.decode(path, size, mode, draft) for mode in color_modes]
+            errors.append(None)
+        except Exception as e:
+            arrays = [None] * len(color_modes)
+            errors.append(f"{type(e).__name__}: {e}")
+        for mode, array in zip(color_modes, arrays):
+            decoded[mode].append(array)
+    return decoded, errors
+
+
+def decoded_batches(items, batch_size, size, color_modes, draft, workers, prefetch):
+    """Yield (items, decoded, errors) per batch, keeping `prefetch` batches in flight."""
+    chunks = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    # spawn, not fork: the parent already holds the model runtime's threads
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, pool.submit(decode_batch, [p for p, _ in chunk], size, color_modes, draft)))
+            if len(pending) > prefetch:
+                chunk, future = pending.popleft()
+                yield (chunk, *future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield (chunk, *future.result())
+
+# ------------------------------------------------------------
+# ✅ Metrics
+# ------------------------------------------------------------
+class VariantResult:
+    def __init__(self, name, color_mode, preprocessing_name, num_classes):
+        self.name = name
+        self.color_mode = color_mode
+        self.preprocessing = preprocessing_name
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.hits = dict.fromkeys(TOP_KS, 0)
+        self.total = 0
+        self.batch_ms = []
+        self.model_seconds = 0.0
+
+    def add(self, probs, truth, seconds):
+        ranked = np.argsort(-probs, axis=1)[:, :max(TOP_KS)]
+        for k in TOP_KS:
+            self.hits[k] += int((ranked[:, :k] == truth[:, None]).any(axis=1).sum())
+        np.add.at(self.confusion, (truth, ranked[:, 0]), 1)
+        self.total += len(truth)
+        self.model_seconds += seconds
+        self.batch_ms.append(seconds * 1000.0)
+
+    def per_breed(self, labels):
+        support = self.confusion.sum(axis=1)
+        correct = np.diag(self.confusion)
+        rows = []
+        for i, label in enumerate(labels):
+            if support[i]:
+                row = self.confusion[i].copy()
+                row[i] = 0
+                rows.append({"breed": label, "images": int(support[i]), "accuracy": correct[i] / support[i],
+                             "most_confused_with": labels[int(row.argmax())] if row.any() else None})
+        return rows
+
+    def summary(self, batch_size):
+        return {
+            "variant": self.name,
+            "color_mode": self.color_mode,
+            "preprocessing": self.preprocessing,
+            "images": self.total,
+            **{f"top{k}": self.hits[k] / self.total if self.total else 0.0 for k in TOP_KS},
+            "batch_size": batch_size,
+            "model_images_per_sec": self.total / self.model_seconds if self.model_seconds else 0.0,
+            "batch_ms_p50": float(np.percentile(self.batch_ms, 50)) if self.batch_ms else None,
+            "batch_ms_p95": float(np.percentile(self.batch_ms, 95)) if self.batch_ms else None,
+            "model_ms_per_image": self.model_seconds * 1000.0 / self.total if self.total else None,
+        }
+
+# ------------------------------------------------------------
+# ✅ Evaluation
+# ------------------------------------------------------------
+def parse_variants(specs, served):
+    variants = []
+    for spec in specs:
+        if spec == "served":
+            color_mode, preprocessing_name = served
+        elif spec in VARIANT_ALIASES:
+            color_mode, preprocessing_name = VARIANT_ALIASES[spec]
+        else:
+            color_mode, _, preprocessing_name = spec.partition(":")
+        if color_mode not in preprocessing.COLOR_MODES or preprocessing_name not in preprocessing.PREPROCESSING:
+            raise ValueError(f"unknown variant '{spec}' (expected color_mode:preprocessing, served, v1 or v2)")
+        variants.append((spec, color_mode, preprocessing_name))
+    return variants
+
+
+def evaluate(items, variant_specs=("served",), batch_size=32, workers=None, prefetch=4, draft=None):
+    import predictor
+
+    load_start = time.perf_counter()
+    predictor.load()
+    load_seconds = time.perf_counter() - load_start
+
+    labels = predictor.class_labels
+    label_index = {label: i for i, label in enumerate(labels)}
+    unknown = sorted({breed for _, breed in items if breed not in label_index})
+    items = [(path, breed) for path, breed in items if breed in label_index]
+    draft = predictor.FAST_DECODE if draft is None else draft
+
+    variants = parse_variants(variant_specs, (predictor.COLOR_MODE, predictor.PREPROCESSING))
+    results = [VariantResult(name, mode, prep, len(labels)) for name, mode, prep in variants]
+    buffers = {prep: preprocessing.BatchBuffer(batch_size, predictor.IMG_SIZE, prep) for _, _, prep in variants}
+    color_modes = sorted({mode for _, mode, _ in variants})
+
+    failed = []
+    wall_start = time.perf_counter()
+    wait_seconds = 0.0
+    batches = decoded_batches(items, batch_size, predictor.IMG_SIZE, color_modes, draft, workers, prefetch)
+    while True:
+        t0 = time.perf_counter()
+        batch = next(batches, None)
+        wait_seconds += time.perf_counter() - t0
+        if batch is None:
+            break
+        chunk, decoded, errors = batch
+        ok = [i for i, err in enumerate(errors) if err is None]
+        failed += [{"path": chunk[i][0], "error": err} for i, err in enumerate(errors) if err is not None]
+        if not ok:
+            continue
+        truth = np.array([label_index[chunk[i][1]] for i in ok])
+        for result in results:
+            buffer = buffers[result.preprocessing]
+            for slot, i in enumerate(ok):
+                buffer.put(slot, decoded[result.color_mode][i])
+            t0 = time.perf_counter()
+            probs = predictor.run_model(buffer.batch(len(ok)))
+            result.add(np.asarray(probs), truth, time.perf_counter() - t0)
+    wall_seconds = time.perf_counter() - wall_start
+
+    evaluated = results[0].total if results else 0
+    return {
+        "model": predictor.MODEL_FILE,
+        "runtime": predictor.RUNTIME,
+        "input_size": list(predictor.IMG_SIZE),
+        "load_seconds": round(load_seconds, 3),
+        "images": evaluated,
+        "failed": failed,
+        "unknown_breeds": unknown,
+        "wall_seconds": round(wall_seconds, 3),
+        "images_per_sec": evaluated / wall_seconds if wall_seconds else 0.0,
+        "decode_wait_seconds": round(wait_seconds, 3),
+        "labels": labels,
+        "variants": [{**r.summary(batch_size), "per_breed": r.per_breed(labels),
+                      "confusion_matrix": r.confusion.tolist()} for r in results],
+    }
+
+# ------------------------------------------------------------
+# ✅ Report
+# ------------------------------------------------------------
+def print_report(report, worst):
+    print(f"\n📊 {report['images']} images, {len(report['labels'])} classes, "
+          f"{report['images_per_sec']:.1f} img/s end to end "
+          f"(waited {report['decode_wait_seconds']:.1f}s of {report['wall_seconds']:.1f}s on decode)")
+    if report["failed"]:
+        print(f"⚠️ {len(report['failed'])} images could not be decoded")
+    if report["unknown_breeds"]:
+        print(f"⚠️ Skipped breeds the model does not know: {', '.join(report['unknown_breeds'])}")
+
+    print(f"\n{'variant':<34} {'top1':>7} {'top3':>7} {'top5':>7} {'model img/s':>12} "
+          f"{'batch p50 ms':>13} {'batch p95 ms':>13}")
+    for v in report["variants"]:
+        name = f"{v['variant']} ({v['color_mode']}/{v['preprocessing']})"
+        print(f"{name:<34} {v['top1'] * 100:>6.2f}% {v['top3'] * 100:>6.2f}% {v['top5'] * 100:>6.2f}% "
+              f"{v['model_images_per_sec']:>12.1f} {v['batch_ms_p50']:>13.1f} {v['batch_ms_p95']:>13.1f}")
+
+    for v in report["variants"]:
+        rows = sorted(v["per_breed"], key=lambda r: r["accuracy"])[:worst]
+        print(f"\n🐾 Worst {len(rows)} breeds for {v['variant']}:")
+        for r in rows:
+            confused = f"  (often → {r['most_confused_with']})" if r["most_confused_with"] else ""
+            print(f"  {r['breed']:<32} {r['accuracy'] * 100:>6.1f}%  n={r['images']}{confused}")
+
+
+def write_confusion_csv(report, path_prefix):
+    labels = report["labels"]
+    for v in report["variants"]:
+        path = f"{path_prefix}_{v['variant'].replace(':', '_')}.csv"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("true\\predicted," + ",".join(labels) + "\n")
+            for label, row in zip(labels, v["confusion_matrix"]):
+                f.write(label + "," + ",".join(map(str, row)) + "\n")
+        print(f"✅ Confusion matrix written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the served model on a labelled split")
+    parser.add_argument("data", nargs="?", default="final_dataset/test", help="<breed>/<image> folder or split index .csv")
+    parser.add_argument("--split", default="test", help="split to use when data is an index")
+    parser.add_argument("--variants", nargs="+", default=["served"],
+                        help="served, v1, v2 or color_mode:preprocessing (e.g. rgb:scale_255)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=None, help="decode processes (default: CPU count)")
+    parser.add_argument("--prefetch", type=int, default=4, help="decoded batches kept ahead of the model")
+    parser.add_argument("--limit", type=int, default=None, help="only use the first N images")
+    parser.add_argument("--draft", action="store_true", help="JPEG draft decoding (faster, not bit-exact)")
+    parser.add_argument("--worst", type=int, default=10, help="breeds to print per variant")
+    parser.add_argument("--confusion-csv", metavar="PREFIX", help="also write <PREFIX>_<variant>.csv matrices")
+    parser.add_argument("-o", "--output", default="eval_report.json")
+    args = parser.parse_args()
+
+    # Imported here, not at module level: the spawned decode workers re-import
+    # this module and need nothing beyond preprocessing
+    from compare_runtimes import labelled_images
+    items = labelled_images(args.data, args.limit, args.split)
+    if not items:
+        raise SystemExit(f"No labelled images found in {args.data}")
+
+    report = evaluate(items, args.variants, args.batch_size, args.workers, args.prefetch,
+                      draft=True if args.draft else None)
+    print_report(report, args.worst)
+    if args.confusion_csv:
+        write_confusion_csv(report, args.confusion_csv)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f)
+    print(f"\n✅ Report written to {args.output}")
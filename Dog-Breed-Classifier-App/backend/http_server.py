@@ -0,0 +1,470 @@
+# pyright: reportMissingImports=false
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Asyncio HTTP Inference Server
+# ============================================================
+#
+# Usage:
+#   python http_server.py --port 8000
+#   PREDICTOR_RUNTIME=tflite PREDICTOR_MODEL=efficientnetb3_int8.tflite python http_server.py --max-pending 64
+#
+# Serves the same contract as the Express backend, from one process that
+# holds the model:
+#
+#   POST /predict      multipart/form-data, image in the "file" field (?top_k=N optional)
+#                      <- 200 {"prediction": [{"breed": "...", "confidence": 97.1}, ...]}
+#   GET  /healthz      <- 200 {"ready": true, "pending": 3, ...}
+#   GET  /metrics      Prometheus text (same registry as predictor.py)
+#
+# Admission control: at most --max-pending requests are admitted at once
+# (uploading, queued or running). Anything beyond that gets an immediate
+# 503 with Retry-After, decided from the request headers alone, so a burst
+# costs neither an upload nor memory. Clients that send
+# "Expect: 100-continue" are refused before they send the body.
+#
+# Deadlines: every admitted request must finish within --deadline-ms (a
+# client may ask for less with "X-Request-Timeout-Ms"); otherwise it gets
+# 504. A request whose deadline passes while it is still queued is
+# dropped before decode, so the model never works for a client that
+# already gave up.
+#
+# The multipart body is parsed as it arrives: only the bytes of the
+# "file" part are kept (capped at --max-upload-bytes, else 413), other
+# fields are discarded, and the image goes to predictor.predict_bytes
+# without touching disk. Decode and inference run on --concurrency
+# threads and concurrent images share model calls through the
+# predictor's MicroBatcher, exactly as in `predictor.py --worker`.
+#
+# app.js can proxy to this server instead of spawning workers
+# (PREDICTOR_URL=http://127.0.0.1:8000).
+
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from PIL import UnidentifiedImageError
+
+import predictor
+from metrics import REGISTRY
+from prediction_cache import DISK_MAX_ENTRIES, PredictionCache
+
+MAX_HEADER_BYTES = 16 * 1024
+MAX_PART_HEADER_BYTES = 8 * 1024
+READ_CHUNK = 64 * 1024
+KEEPALIVE_TIMEOUT = 15.0
+LINGER_SECONDS = 2.0
+SHUTDOWN_GRACE = 10.0
+
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "HTTP responses sent", ("status",))
+HTTP_REJECTED = REGISTRY.counter("http_rejected_total", "Requests refused with 503 because the queue was full")
+HTTP_DEADLINE = REGISTRY.counter("http_deadline_exceeded_total", "Requests that missed their deadline")
+HTTP_SECONDS = REGISTRY.histogram("http_request_seconds", "Time from request headers to response")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None, close=False):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+        self.close = close
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+# ------------------------------------------------------------
+# ✅ HTTP/1.1 Framing
+# ------------------------------------------------------------
+async def read_head(reader):
+    """(method, target, version, headers) of the next request, or None at EOF."""
+    try:
+        raw = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise HTTPError(400, "Incomplete request head", close=True)
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, "Request head too large", close=True)
+    lines = raw.decode("latin-1").split("\r\n")
+    try:
+        method, target, version = lines[0].split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line", close=True)
+    headers = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(":")
+        if not sep:
+            raise HTTPError(400, "Malformed header", close=True)
+        headers[name.strip().lower()] = value.strip()
+    return method, target, version, headers
+
+
+def _header_params(value):
+    """'multipart/form-data; boundary=x' -> ('multipart/form-data', {'boundary': 'x'})."""
+    parts = value.split(";")
+    params = {}
+    for part in parts[1:]:
+        key, _, val = part.strip().partition("=")
+        params[key.lower()] = val.strip().strip('"')
+    return parts[0].strip().lower(), params
+
+
+def encode_response(status, body, content_type="application/json", headers=None, close=False):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode("utf-8")
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+             f"Content-Type: {content_type}",
+             f"Content-Length: {len(body)}",
+             "Access-Control-Allow-Origin: *",
+             f"Connection: {'close' if close else 'keep-alive'}"]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+# ------------------------------------------------------------
+# ✅ Streaming Multipart Parser
+# ------------------------------------------------------------
+class MultipartReader:
+    """Reads a multipart/form-data body of known length straight off the socket.
+
+    Only the part named `field` is kept; everything else is read and
+    dropped, so memory stays bounded by `max_bytes` whatever is sent.
+    """
+
+    def __init__(self, reader, boundary, length):
+        self.reader = reader
+        self.remaining = length
+        # A leading CRLF lets the first boundary match like every later one
+        self.buffer = bytearray(b"\r\n")
+        self.delimiter = b"\r\n--" + boundary.encode("latin-1")
+
+    async def _fill(self):
+        if self.remaining <= 0:
+            raise HTTPError(400, "Multipart body ended early", close=True)
+        chunk = await self.reader.read(min(READ_CHUNK, self.remaining))
+        if not chunk:
+            raise HTTPError(400, "Connection closed during upload", close=True)
+        self.remaining -= len(chunk)
+        self.buffer += chunk
+
+    async def _skip_to_delimiter(self, sink=None):
+        """Move bytes up to the next delimiter into `sink` (or drop them); consume the delimiter."""
+        while True:
+            index = self.buffer.find(self.delimiter)
+            if index >= 0:
+                if sink is not None:
+                    sink(self.buffer[:index])
+                del self.buffer[:index + len(self.delimiter)]
+                return
+            # Keep a tail that could be the start of a split delimiter
+            keep = len(self.delimiter) - 1
+            if len(self.buffer) > keep:
+                if sink is not None:
+                    sink(self.buffer[:-keep])
+                del self.buffer[:-keep]
+            await self._fill()
+
+    async def _read_until(self, marker, limit):
+        while True:
+            # Only the first limit + marker bytes can hold an acceptable match,
+            # however much of the body one read happened to buffer
+            index = self.buffer.find(marker, 0, limit + len(marker))
+            if index >= 0:
+                data = bytes(self.buffer[:index])
+                del self.buffer[:index + len(marker)]
+                return data
+            if len(self.buffer) >= limit + len(marker):
+                raise HTTPError(400, "Multipart part headers too large", close=True)
+            await self._fill()
+
+    async def drain(self):
+        while self.remaining > 0:
+            chunk = await self.reader.read(min(READ_CHUNK, self.remaining))
+            if not chunk:
+                break
+            self.remaining -= len(chunk)
+
+    async def read_field(self, field, max_bytes):
+        """Bytes of the first part named `field`, or None when there is none."""
+        found = None
+        await self._skip_to_delimiter()          # preamble
+        while True:
+            while len(self.buffer) < 2:
+                await self._fill()
+            if self.buffer[:2] == b"--":         # closing delimiter
+                break
+            head = await self._read_until(b"\r\n\r\n", MAX_PART_HEADER_BYTES)
+            disposition = {}
+            for line in head.decode("utf-8", "replace").split("\r\n"):
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "content-disposition":
+                    disposition = _header_params(value)[1]
+            if found is None and disposition.get("name") == field:
+                data = bytearray()
+
+                def keep(chunk):
+                    if len(data) + len(chunk) > max_bytes:
+                        raise HTTPError(413, f"Image larger than {max_bytes} bytes", close=True)
+                    data.extend(chunk)
+
+                await self._skip_to_delimiter(keep)
+                found = data
+            else:
+                await self._skip_to_delimiter()
+        await self.drain()                        # epilogue
+        return found
+
+# ------------------------------------------------------------
+# ✅ Server
+# ------------------------------------------------------------
+class InferenceServer:
+    def __init__(self, executor, max_pending=32, deadline_ms=10000.0, max_upload_bytes=10 * 1024 * 1024):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.deadline = deadline_ms / 1000.0
+        self.max_upload_bytes = max_upload_bytes
+        self.pending = 0
+        self.loop = None
+        self.server = None
+        self.idle = None
+
+    # ---- admission -------------------------------------------------
+    def _admit(self):
+        if self.pending >= self.max_pending:
+            HTTP_REJECTED.inc()
+            raise HTTPError(503, "Server busy, retry later", {"Retry-After": "1"}, close=True)
+        self.pending += 1
+        self.idle.clear()
+
+    def _release(self):
+        self.pending -= 1
+        if self.pending == 0:
+            self.idle.set()
+
+    def _release_threadsafe(self, _job):
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._release)
+
+    def _deadline_for(self, headers):
+        seconds = self.deadline
+        requested = headers.get("x-request-timeout-ms")
+        if requested:
+            try:
+                seconds = min(seconds, max(0.0, float(requested)) / 1000.0)
+            except ValueError:
+                # Checked before the upload is read, so the connection cannot be reused
+                raise HTTPError(400, "X-Request-Timeout-Ms must be a number", close=True)
+        return time.monotonic() + seconds
+
+    # ---- /predict --------------------------------------------------
+    @staticmethod
+    def _predict(data, top_k, deadline):
+        # Runs on the executor; the request may have expired while queued
+        if time.monotonic() >= deadline:
+            raise DeadlineExceeded()
+        predictor.REQUESTS.inc()
+        try:
+            return predictor.format_prediction(predictor.predict_bytes(data, top_k))
+        except Exception:
+            predictor.ERRORS.inc()
+            raise
+
+    async def predict(self, reader, writer, target, headers):
+        content_type, params = _header_params(headers.get("content-type", ""))
+        if content_type != "multipart/form-data" or not params.get("boundary"):
+            raise HTTPError(400, "Expected multipart/form-data with the image in field 'file'", close=True)
+        if "content-length" not in headers:
+            raise HTTPError(411, "Content-Length required", close=True)
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length", close=True)
+        if length > self.max_upload_bytes + MAX_HEADER_BYTES:
+            raise HTTPError(413, f"Image larger than {self.max_upload_bytes} bytes", close=True)
+        query = parse_qs(urlsplit(target).query)
+        try:
+            top_k = predictor.check_top_k(int(query.get("top_k", [predictor.TOP_K])[0]))
+        except ValueError:
+            # The upload is still unread, so the connection cannot be reused
+            raise HTTPError(400, f"top_k must be an integer between 1 and {len(predictor.class_labels)}",
+                            close=True)
+        deadline = self._deadline_for(headers)
+
+        self._admit()
+        handed_off = False
+        try:
+            if headers.get("expect", "").lower() == "100-continue":
+                writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+            body = MultipartReader(reader, params["boundary"], length)
+            try:
+                data = await asyncio.wait_for(body.read_field("file", self.max_upload_bytes),
+                                              deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded()
+            if data is None:
+                raise HTTPError(400, "No image uploaded (expected form field 'file')")
+
+            # The slot is held until the executor job is really finished (or
+            # cancelled while still queued), not just until we stop waiting
+            job = self.executor.submit(self._predict, memoryview(data), top_k, deadline)
+            job.add_done_callback(self._release_threadsafe)
+            handed_off = True
+            try:
+                prediction = await asyncio.wait_for(asyncio.wrap_future(job), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded()
+        finally:
+            if not handed_off:
+                self._release()
+        return {"prediction": prediction}
+
+    # ---- connection loop ------------------------------------------
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(read_head(reader), KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                except HTTPError as e:
+                    writer.write(encode_response(e.status, {"error": e.message}, close=True))
+                    HTTP_REQUESTS.labels(status=e.status).inc()
+                    break
+                if head is None:
+                    break
+                started = time.perf_counter()
+                status, body, content_type, extra, close = await self.route(reader, writer, *head)
+                close = close or head[3].get("connection", "").lower() == "close" or head[2] == "HTTP/1.0"
+                writer.write(encode_response(status, body, content_type, extra, close))
+                await writer.drain()
+                HTTP_REQUESTS.labels(status=status).inc()
+                HTTP_SECONDS.observe(time.perf_counter() - started)
+                if close:
+                    break
+            await self.linger(reader, writer)
+        except (ConnectionResetError, BrokenPipeError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def linger(reader, writer):
+        """Half-close, then discard what the client still sends for a moment.
+
+        A 503/413/504 goes out before the upload is read; closing outright
+        would reset the connection under a client that is still writing,
+        and it would see a broken pipe instead of the response.
+        """
+        if writer.can_write_eof():
+            writer.write_eof()
+        stop_at = time.monotonic() + LINGER_SECONDS
+        try:
+            while await asyncio.wait_for(reader.read(READ_CHUNK), stop_at - time.monotonic()):
+                pass
+        except asyncio.TimeoutError:
+            pass
+
+    async def route(self, reader, writer, method, target, version, headers):
+        """(status, body, content type, extra headers, close connection)."""
+        path = urlsplit(target).path
+        try:
+            if method == "OPTIONS":
+                return 204, b"", "text/plain", {
+                    "Access-Control-Allow-Methods": "GET, POST, OPTIONS",
+                    "Access-Control-Allow-Headers": headers.get("access-control-request-headers", "*"),
+                }, False
+            if path == "/predict" and method == "POST":
+                return 200, await self.predict(reader, writer, target, headers), "application/json", None, False
+            if path == "/healthz" and method == "GET":
+                return 200, self.health(), "application/json", None, False
+            if path == "/metrics" and method == "GET":
+                return 200, REGISTRY.render_prometheus().encode(), "text/plain; version=0.0.4", None, False
+            # An unread body would be parsed as the next request
+            try:
+                close = int(headers.get("content-length", 0) or 0) > 0
+            except ValueError:
+                raise HTTPError(400, "Invalid Content-Length", close=True)
+            raise HTTPError(404 if path not in ("/predict", "/healthz", "/metrics") else 405,
+                            f"{method} {path} not found", close=close)
+        except HTTPError as e:
+            return e.status, {"error": e.message}, "application/json", e.headers, e.close
+        except DeadlineExceeded:
+            HTTP_DEADLINE.inc()
+            # The rest of the upload may still be in flight
+            return 504, {"error": "Prediction deadline exceeded"}, "application/json", None, True
+        except UnidentifiedImageError:
+            return 400, {"error": "Unsupported or corrupt image"}, "application/json", None, False
+        except Exception as e:
+            print(f"❌ Prediction failed: {type(e).__name__}: {e}", file=sys.stderr)
+            return 500, {"error": "Prediction failed"}, "application/json", None, False
+
+    def health(self):
+        return {"ready": predictor.runtime is not None, "runtime": predictor.RUNTIME,
+                "pending": self.pending, "max_pending": self.max_pending,
+                "batcher": predictor.batcher.stats() if predictor.batcher is not None else None,
+                "cache": predictor.cache.stats() if predictor.cache is not None else None}
+
+    # ---- lifecycle -------------------------------------------------
+    async def serve(self, host, port):
+        self.loop = asyncio.get_running_loop()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        REGISTRY.gauge("http_pending_requests", "Requests admitted and not yet answered", lambda: self.pending)
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, stop.set)
+        print(json.dumps({**predictor.ready_message(), "http": f"http://{host}:{port}"}), flush=True)
+        await stop.wait()
+
+        # Stop accepting, let admitted requests finish
+        self.server.close()
+        try:
+            await asyncio.wait_for(self.idle.wait(), SHUTDOWN_GRACE)
+        except asyncio.TimeoutError:
+            print(f"⚠️ {self.pending} requests still pending at shutdown", file=sys.stderr)
+
+# ------------------------------------------------------------
+# ✅ Entry Point
+# ------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Asyncio HTTP server for the dog breed predictor")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-pending", type=int, default=32,
+                        help="requests admitted at once; more are refused with 503")
+    parser.add_argument("--deadline-ms", type=float, default=10000.0, help="per-request deadline (504 after)")
+    parser.add_argument("--max-upload-bytes", type=int, default=10 * 1024 * 1024)
+    parser.add_argument("--max-batch-size", type=int, default=predictor.MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=predictor.MAX_WAIT_MS)
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="decode/inference threads (default: 2 x max batch size)")
+    parser.add_argument("--cache-size", type=int, default=predictor.CACHE_SIZE)
+    parser.add_argument("--cache-db", help="SQLite file for a persistent cache tier")
+    parser.add_argument("--cache-db-max-entries", type=int, default=DISK_MAX_ENTRIES,
+                        help="rows kept in --cache-db; least recently used are pruned")
+    parser.add_argument("--no-warmup", action="store_true")
+    args = parser.parse_args()
+
+    predictor.load(warmup=not args.no_warmup)
+    predictor.start_batcher(args.max_batch_size, args.max_wait_ms)
+    if args.cache_size > 0 or args.cache_db:
+        predictor.cache = PredictionCache(predictor.cache_version(), args.cache_size, args.cache_db,
+                                          args.cache_db_max_entries)
+    executor = ThreadPoolExecutor(max_workers=args.concurrency or 2 * args.max_batch_size,
+                                  thread_name_prefix="predict")
+    server = InferenceServer(executor, args.max_pending, args.deadline_ms, args.max_upload_bytes)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+        predictor.batcher.stop(timeout=5)
+        if predictor.cache is not None:
+            predictor.cache.close()
@@ -0,0 +1,119 @@
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Per-Process Memory Report
+# ============================================================
+#
+# Usage:
+#   python memory_report.py 4242 4243 4244                  any predictor pids
+#   python memory_report.py 4242 --model efficientnetb3_fp32.tflite
+#
+# RSS counts every resident page a process can see, including pages other
+# processes map too, so summing RSS over N workers overstates what they
+# really cost. Linux splits it in /proc/<pid>/smaps_rollup:
+#
+#   unique   Private_Clean + Private_Dirty   freed if this process exits
+#   shared   Shared_Clean + Shared_Dirty     also mapped by another process
+#   pss      RSS with every shared page divided by its number of mappers;
+#            summing PSS over the workers gives their real total
+#
+# With --model the pages of that file's mappings are reported separately
+# (from /proc/<pid>/smaps), which shows whether a memory-mapped model is
+# actually shared or was copied into private memory. Linux only.
+
+import argparse
+import json
+import os
+import sys
+
+ROLLUP_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty", "Swap")
+
+
+def _kb(line):
+    # "Pss:                1234 kB"
+    return int(line.split()[1])
+
+
+def smaps_rollup(pid):
+    """{field: kB} for the whole process."""
+    values = dict.fromkeys(ROLLUP_FIELDS, 0)
+    with open(f"/proc/{pid}/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            name = line.split(":", 1)[0]
+            if name in values:
+                values[name] = _kb(line)
+    return values
+
+
+def file_mappings(pid, path):
+    """{field: kB} summed over the mappings of `path` in the process."""
+    target = os.path.realpath(path)
+    values = dict.fromkeys(ROLLUP_FIELDS, 0)
+    mapped = False
+    with open(f"/proc/{pid}/smaps", encoding="utf-8") as f:
+        for line in f:
+            head = line.split(None, 5)
+            if len(head) >= 5 and "-" in head[0] and ":" not in head[0]:
+                # Mapping header: address perms offset dev inode [path]
+                mapped = len(head) == 6 and head[5].strip() == target
+                continue
+            if mapped:
+                name = line.split(":", 1)[0]
+                if name in values:
+                    values[name] += _kb(line)
+    return values
+
+
+def _summary(values):
+    return {
+        "rss_mb": values["Rss"] / 1024.0,
+        "pss_mb": values["Pss"] / 1024.0,
+        "unique_mb": (values["Private_Clean"] + values["Private_Dirty"]) / 1024.0,
+        "shared_mb": (values["Shared_Clean"] + values["Shared_Dirty"]) / 1024.0,
+        "swap_mb": values["Swap"] / 1024.0,
+    }
+
+
+def process_memory(pid, model_path=None):
+    """Unique/shared/PSS breakdown of one process, plus its model file mappings when given."""
+    report = {"pid": pid, **_summary(smaps_rollup(pid))}
+    if model_path:
+        report["model_file"] = _summary(file_mappings(pid, model_path))
+    return report
+
+
+def totals(reports):
+    """Real footprint of a group of processes next to what summing RSS suggests."""
+    return {
+        "processes": len(reports),
+        "rss_sum_mb": sum(r["rss_mb"] for r in reports),
+        "pss_sum_mb": sum(r["pss_mb"] for r in reports),
+        "unique_sum_mb": sum(r["unique_mb"] for r in reports),
+    }
+
+
+def print_report(reports, out=sys.stdout):
+    print(f"{'pid':>8} {'rss MB':>9} {'pss MB':>9} {'unique MB':>10} {'shared MB':>10} {'model MB':>9} "
+          f"{'model shared':>13}", file=out)
+    for r in reports:
+        model = r.get("model_file")
+        model_cols = (f"{model['rss_mb']:>9.1f} {model['shared_mb']:>13.1f}" if model
+                      else f"{'-':>9} {'-':>13}")
+        print(f"{r['pid']:>8} {r['rss_mb']:>9.1f} {r['pss_mb']:>9.1f} {r['unique_mb']:>10.1f} "
+              f"{r['shared_mb']:>10.1f} {model_cols}", file=out)
+    total = totals(reports)
+    print(f"   {total['processes']} processes: {total['pss_sum_mb']:.1f} MB real (sum of PSS) "
+          f"vs {total['rss_sum_mb']:.1f} MB sum of RSS; {total['unique_sum_mb']:.1f} MB unique", file=out)
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Unique vs shared memory of running processes")
+    parser.add_argument("pids", type=int, nargs="+")
+    parser.add_argument("--model", default=None, help="also break out the mappings of this model file")
+    parser.add_argument("-o", "--output", default=None, help="optional JSON report")
+    args = parser.parse_args()
+
+    reports = [process_memory(pid, args.model) for pid in args.pids]
+    total = print_report(reports)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"processes": reports, "totals": total}, f, indent=2)
@@ -0,0 +1,219 @@
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Lightweight Metrics
+# ============================================================
+#
+# Counters, gauges and fixed-bucket histograms cheap enough to leave on
+# in production (a perf_counter pair, a bisect and a lock per sample).
+# Exposed as Prometheus text (render_prometheus / start_http_server) or
+# as JSON (snapshot / start_json_dumper).
+#
+#   STAGE_SECONDS = REGISTRY.histogram("predictor_stage_seconds", "...", labelnames=("stage",))
+#   with STAGE_SECONDS.labels(stage="decode").time():
+#       ...
+
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; covers sub-millisecond stages up to multi-second model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+# ------------------------------------------------------------
+# ✅ Metric Types
+# ------------------------------------------------------------
+class Counter:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def samples(self, name, labels):
+        yield name, labels, self._value
+
+
+class Gauge:
+    def __init__(self, fn=None):
+        self._value = 0.0
+        self._fn = fn
+
+    def set(self, value):
+        self._value = value
+
+    @property
+    def value(self):
+        return self._fn() if self._fn is not None else self._value
+
+    def samples(self, name, labels):
+        yield name, labels, self.value
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self):
+        return sum(self._counts)
+
+    def samples(self, name, labels):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            yield f"{name}_bucket", labels + (("le", le),), cumulative
+        yield f"{name}_sum", labels, total
+        yield f"{name}_count", labels, cumulative
+
+
+class Family:
+    """A metric name with zero or more label dimensions."""
+
+    def __init__(self, name, help_text, kind, labelnames, factory):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = factory()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._factory())
+        return child
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield from child.samples(self.name, tuple(zip(self.labelnames, key)))
+
+# ------------------------------------------------------------
+# ✅ Registry
+# ------------------------------------------------------------
+class Registry:
+    def __init__(self):
+        self._families = {}
+        self._lock = threading.Lock()
+
+    def _register(self, name, help_text, kind, labelnames, factory):
+        """Return the family, or its only metric when it has no labels."""
+        with self._lock:
+            if name not in self._families:
+                self._families[name] = Family(name, help_text, kind, labelnames, factory)
+            family = self._families[name]
+        return family if family.labelnames else family.labels()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(name, help_text, "counter", labelnames, Counter)
+
+    def gauge(self, name, help_text, fn=None):
+        """A gauge; with `fn` its value is read from the callback at scrape time."""
+        return self._register(name, help_text, "gauge", (), lambda: Gauge(fn))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(name, help_text, "histogram", labelnames, lambda: Histogram(buckets))
+
+    def render_prometheus(self):
+        lines = []
+        for family in list(self._families.values()):
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.kind}")
+            for name, labels, value in family.samples():
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-friendly view: {metric: {label string: value}}."""
+        data = {}
+        for family in list(self._families.values()):
+            for name, labels, value in family.samples():
+                data.setdefault(name, {})[_format_labels(labels) or "_"] = value
+        return data
+
+
+REGISTRY = Registry()
+
+# ------------------------------------------------------------
+# ✅ Exporters
+# ------------------------------------------------------------
+def start_http_server(port, registry=REGISTRY, host="127.0.0.1"):
+    """Serve /metrics (Prometheus text) and /metrics.json from a daemon thread."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith("/metrics.json"):
+                body, ctype = json.dumps(registry.snapshot()).encode(), "application/json"
+            elif self.path.startswith("/metrics"):
+                body, ctype = registry.render_prometheus().encode(), "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def start_json_dumper(path, interval=30.0, registry=REGISTRY):
+    """Atomically rewrite `path` with a snapshot every `interval` seconds."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"time": time.time(), "metrics": registry.snapshot()}, f)
+            os.replace(tmp, path)
+
+    threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+    return stop
@@ -0,0 +1,190 @@
+# pyright: reportMissingImports=false
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Self-Contained Model Bundle
+# ============================================================
+#
+# A bundle is the Keras .h5 model with everything the predictor needs
+# stored as a JSON attribute on the HDF5 root: the ordered label table,
+# input size, colour mode, preprocessing name and a SHA-256 of the
+# weights. Serving no longer needs final_dataset/train to map output
+# indices to breed names.
+#
+# h5py is imported inside the functions that open a file, so importing
+# this module (runtimes.py does) costs nothing on the serving path.
+#
+# Usage:
+#   python model_bundle.py build efficientnetb3_clean_rgb.h5 \
+#       --labels ../../TrainingModel/breed_labels.txt -o efficientnetb3_bundle.h5
+#   python model_bundle.py inspect efficientnetb3_bundle.h5
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+BUNDLE_ATTR = "dog_breed_bundle"
+BUNDLE_FORMAT_VERSION = 1
+
+
+class BundleError(Exception):
+    pass
+
+
+class ModelBundle:
+    def __init__(self, model, labels, input_size, color_mode, preprocessing, checksum, path):
+        self.model = model
+        self.labels = labels
+        self.input_size = input_size
+        self.color_mode = color_mode
+        self.preprocessing = preprocessing
+        self.checksum = checksum
+        self.path = path
+
+    @property
+    def version(self):
+        """Short identifier for the weights, e.g. for cache keys and logs."""
+        return self.checksum[:16]
+
+# ------------------------------------------------------------
+# ✅ Helpers
+# ------------------------------------------------------------
+def read_labels(labels_path):
+    with open(labels_path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def weights_checksum(h5file):
+    """SHA-256 over every weight array (name + bytes) in a stable order."""
+    import h5py
+
+    root = h5file["model_weights"] if "model_weights" in h5file else h5file
+    names = []
+    root.visititems(lambda name, obj: names.append(name) if isinstance(obj, h5py.Dataset) else None)
+    digest = hashlib.sha256()
+    for name in sorted(names):
+        digest.update(name.encode("utf-8"))
+        digest.update(root[name][()].tobytes())
+    return digest.hexdigest()
+
+
+def bundle_metadata(h5file):
+    """Metadata of an already open bundle, so callers need not reopen the file."""
+    if BUNDLE_ATTR not in h5file.attrs:
+        raise BundleError(f"{h5file.filename} is not a model bundle (missing '{BUNDLE_ATTR}')")
+    meta = json.loads(h5file.attrs[BUNDLE_ATTR])
+    if meta.get("format_version") != BUNDLE_FORMAT_VERSION:
+        raise BundleError(f"unsupported bundle format {meta.get('format_version')}")
+    return meta
+
+
+def read_metadata(path):
+    import h5py
+
+    with h5py.File(path, "r") as f:
+        return bundle_metadata(f)
+
+
+def _validate(model, meta):
+    num_outputs = model.output_shape[-1]
+    if len(meta["labels"]) != num_outputs:
+        raise BundleError(f"bundle has {len(meta['labels'])} labels but the model outputs {num_outputs} classes")
+    # input_size is (width, height) like PIL; Keras shapes are (height, width)
+    expected = tuple(meta["input_size"])
+    actual = tuple(model.input_shape[2:0:-1])
+    if None not in actual and actual != expected:
+        raise BundleError(f"bundle input_size {expected} does not match model input {actual}")
+
+# ------------------------------------------------------------
+# ✅ Build / Load
+# ------------------------------------------------------------
+def build_bundle(model_path, labels, out_path, input_size=(300, 300),
+                 color_mode="grayscale", preprocessing="efficientnet"):
+    """Copy `model_path` to `out_path` and attach labels and serving metadata."""
+    import h5py
+    import tensorflow as tf
+
+    if isinstance(labels, str):
+        labels = read_labels(labels)
+    meta = {
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "labels": list(labels),
+        "input_size": list(input_size),
+        "color_mode": color_mode,
+        "preprocessing": preprocessing,
+        "source": os.path.basename(model_path),
+    }
+    _validate(tf.keras.models.load_model(model_path, compile=False), meta)
+
+    if os.path.abspath(model_path) != os.path.abspath(out_path):
+        shutil.copyfile(model_path, out_path)
+    with h5py.File(out_path, "a") as f:
+        meta["weights_sha256"] = weights_checksum(f)
+        f.attrs[BUNDLE_ATTR] = json.dumps(meta)
+    return meta
+
+
+def load_bundle(path, verify=False, meta=None):
+    """Load model and metadata from one bundle file, checking it is consistent.
+
+    verify=True re-hashes every weight array against the stored checksum,
+    which reads the whole file once more; `model_bundle.py inspect` does
+    that, the serving path does not. Pass `meta` when it has already been
+    read (runtimes.resolve_metadata) so the HDF5 is not opened again just
+    for the attribute.
+    """
+    import h5py
+    import tensorflow as tf
+
+    if meta is None or verify:
+        with h5py.File(path, "r") as f:
+            meta = bundle_metadata(f)
+            if verify and weights_checksum(f) != meta["weights_sha256"]:
+                raise BundleError(f"weights checksum mismatch in {path}")
+
+    model = tf.keras.models.load_model(path, compile=False)
+    _validate(model, meta)
+    return ModelBundle(
+        model=model,
+        labels=meta["labels"],
+        input_size=tuple(meta["input_size"]),
+        color_mode=meta["color_mode"],
+        preprocessing=meta["preprocessing"],
+        checksum=meta["weights_sha256"],
+        path=path,
+    )
+
+# ------------------------------------------------------------
+# ✅ Entry Point
+# ------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect a model bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="package a Keras .h5 model with its labels")
+    build.add_argument("model_path")
+    build.add_argument("--labels", required=True, help="ordered label file, one breed per line")
+    build.add_argument("-o", "--output", required=True)
+    build.add_argument("--input-size", type=int, nargs=2, default=(300, 300), metavar=("W", "H"))
+    build.add_argument("--color-mode", choices=["grayscale", "rgb"], default="grayscale")
+    build.add_argument("--preprocessing", default="efficientnet")
+
+    inspect = sub.add_parser("inspect", help="print bundle metadata and verify the checksum")
+    inspect.add_argument("bundle_path")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        meta = build_bundle(args.model_path, args.labels, args.output, tuple(args.input_size),
+                            args.color_mode, args.preprocessing)
+        print(f"✅ Bundle written to {args.output} ({len(meta['labels'])} labels, "
+              f"sha256 {meta['weights_sha256'][:16]}...)")
+    else:
+        import h5py
+
+        with h5py.File(args.bundle_path, "r") as f:
+            meta = bundle_metadata(f)
+            ok = weights_checksum(f) == meta["weights_sha256"]
+        summary = {k: v for k, v in meta.items() if k != "labels"}
+        summary["num_labels"] = len(meta["labels"])
+        summary["checksum_ok"] = ok
+        print(json.dumps(summary, indent=2))
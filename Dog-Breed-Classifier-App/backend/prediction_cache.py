@@ -0,0 +1,182 @@
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Content-Addressed Prediction Cache
+# ============================================================
+#
+# Predictions are keyed on SHA-256(model version + image bytes), so the
+# same photo uploaded twice (or retried by the frontend) skips decode and
+# the forward pass, and a new model never serves stale results. The
+# predictor's version string also names its decode and preprocessing
+# settings (predictor.cache_version), which change the model input too.
+#
+#   memory tier  bounded LRU of probability vectors
+#   disk tier    optional SQLite file that survives restarts, also LRU:
+#                rows carry a last-used time and the oldest are deleted
+#                once the table grows past disk_max_entries (checked in
+#                batches, so it briefly holds up to ~10% more)
+#
+# Concurrent requests for the same key are coalesced: the first caller
+# computes, the others wait for its result.
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+DISK_MAX_ENTRIES = 100_000   # ~60 MB with 120 float32 probabilities plus key per row
+PRUNE_SLACK = 0.1            # prune once the table is this fraction over the cap
+
+
+class PredictionCache:
+    def __init__(self, model_version, max_entries=1024, disk_path=None, disk_max_entries=DISK_MAX_ENTRIES):
+        self.model_version = model_version
+        self.max_entries = max_entries
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "errors": 0,
+                          "disk_evictions": 0}
+        self._db = None
+        self._disk_rows = 0
+        self._db_lock = threading.Lock()
+        if disk_path:
+            self._open_disk(disk_path)
+
+    # ------------------------------------------------------------
+    # ✅ Keys
+    # ------------------------------------------------------------
+    def key(self, image_bytes):
+        digest = hashlib.sha256(self.model_version.encode("utf-8"))
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    # ------------------------------------------------------------
+    # ✅ Lookup / Compute
+    # ------------------------------------------------------------
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, running `compute()` at most once."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return value
+            future = self._in_flight.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+                owner = False
+            else:
+                future = self._in_flight[key] = Future()
+                owner = True
+        if not owner:
+            return future.result()
+
+        try:
+            value = self._disk_get(key)
+            if value is not None:
+                with self._lock:
+                    self._counters["disk_hits"] += 1
+            else:
+                with self._lock:
+                    self._counters["misses"] += 1
+                value = np.asarray(compute(), dtype=np.float32)
+                self._disk_put(key, value)
+        except BaseException as e:
+            with self._lock:
+                self._counters["errors"] += 1
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._store(key, value)
+            del self._in_flight[key]
+        future.set_result(value)
+        return value
+
+    def _store(self, key, value):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    # ------------------------------------------------------------
+    # ✅ Disk Tier
+    # ------------------------------------------------------------
+    def _open_disk(self, path):
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, version TEXT, probs BLOB, last_used REAL)")
+        # Files written before the size cap have no last_used column; their
+        # rows count as least recently used
+        have = {row[1] for row in self._db.execute("PRAGMA table_info(predictions)")}
+        if "last_used" not in have:
+            self._db.execute("ALTER TABLE predictions ADD COLUMN last_used REAL NOT NULL DEFAULT 0")
+        self._db.execute("CREATE INDEX IF NOT EXISTS predictions_last_used ON predictions (last_used)")
+        # Entries from other model versions can never be hit again
+        self._db.execute("DELETE FROM predictions WHERE version != ?", (self.model_version,))
+        with self._db_lock:
+            self._prune_disk()
+
+    def _disk_get(self, key):
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute("SELECT probs FROM predictions WHERE key = ?", (key,)).fetchone()
+            if row:
+                self._db.execute("UPDATE predictions SET last_used = ? WHERE key = ?", (time.time(), key))
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+    def _disk_put(self, key, value):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute("INSERT OR REPLACE INTO predictions (key, version, probs, last_used) VALUES (?, ?, ?, ?)",
+                             (key, self.model_version, value.tobytes(), time.time()))
+            # Counts replacements too, which only makes the next prune come early
+            self._disk_rows += 1
+            if self._disk_rows > self.disk_max_entries * (1 + PRUNE_SLACK):
+                self._prune_disk()
+
+    def _prune_disk(self):
+        """Delete the least recently used rows beyond disk_max_entries; call with _db_lock held."""
+        self._disk_rows = self._db.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        excess = self._disk_rows - max(self.disk_max_entries, 0)
+        if excess > 0:
+            self._db.execute(
+                "DELETE FROM predictions WHERE key IN (SELECT key FROM predictions ORDER BY last_used LIMIT ?)",
+                (excess,))
+            self._disk_rows -= excess
+            with self._lock:
+                self._counters["disk_evictions"] += excess
+
+    def close(self):
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+            self._db = None
+
+    # ------------------------------------------------------------
+    # ✅ Statistics
+    # ------------------------------------------------------------
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+            stats["in_flight"] = len(self._in_flight)
+        stats["max_entries"] = self.max_entries
+        if self._db is not None:
+            stats["disk_entries"] = self._disk_rows
+            stats["disk_max_entries"] = self.disk_max_entries
+        stats["model_version"] = self.model_version
+        lookups = stats["hits"] + stats["disk_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (lookups - stats["misses"]) / lookups if lookups else 0.0
+        return stats
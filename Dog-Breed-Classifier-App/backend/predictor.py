@@ -2,50 +2,510 @@
 # ============================================================
 # 🐶 DOG BREED CLASSIFIER - TensorFlow Predictor (Final)
 # ============================================================
+#
+# Usage:
+#   python predictor.py <image_path>          one-shot, prints JSON
+#   python predictor.py --worker              warm worker on stdin/stdout
+#   python predictor.py --worker --socket S   warm worker on a Unix socket
+#
+# The inference backend is chosen at startup (see runtimes.py):
+#   PREDICTOR_RUNTIME=tflite PREDICTOR_MODEL=efficientnetb3_int8.tflite python predictor.py ...
+# PREDICTOR_SHARED_WEIGHTS=1 (tflite only) serves the weights from the shared
+# mapping of the model file, so workers on one host share a single copy.
+#
+# In-process API (after load()): predict_breed(path), predict_bytes(bytes or
+# memoryview), predict_array(uint8 ndarray, single or batched) and
+# predict_batch([paths / bytes / arrays]) all return [(breed, confidence), ...].
+#
+# Worker protocol (one JSON object per line, in both directions):
+#   -> {"id": 1, "image_path": "uploads/abc", "top_k": 3}
+#   -> {"id": 1, "image_b64": "<base64 image>", "top_k": 3}
+#   -> {"id": 1, "image_size": 48213}\n<48213 raw image bytes>    (framed, no encoding)
+#   <- {"id": 1, "prediction": [{"breed": "...", "confidence": 97.1}, ...]}
+#   <- {"id": 1, "error": "..."}                  (worker keeps running; a bad
+#                                                  image_size ends the stream)
+#   -> {"id": 2, "cmd": "ping"}      <- {"id": 2, "ok": true}
+#   -> {"id": 4, "cmd": "stats"}     <- {"id": 4, "stats": {"batcher": {...}, "cache": {...}}}
+#   -> {"id": 5, "cmd": "metrics"}   <- {"id": 5, "metrics": {...per-stage histograms...}}
+#   -> {"id": 3, "cmd": "shutdown"}  <- {"id": 3, "ok": true}, then exit
+# The worker prints {"ready": true, "startup": {...phase seconds...}} once the
+# model is loaded, compiled and warmed up.
+# Requests are answered concurrently (responses may come back out of order)
+# and concurrent images are coalesced into one model.predict by batcher.py.
+#
+# Startup is kept short: TensorFlow (or the TFLite/ONNX backend) is only
+# imported inside load(), the Keras model is wrapped in a tf.function with
+# a fixed (None, 300, 300, 3) signature so it is traced exactly once, and a
+# warm-up batch runs before readiness is reported.
+
+import time
+_T0 = time.perf_counter()
 
 import sys
+import base64
 import json
-import tensorflow as tf
+import argparse
+import signal
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
-from tensorflow.keras.applications.efficientnet import preprocess_input
-from PIL import Image
 import os
 
+import preprocessing
+from batcher import MicroBatcher
+from metrics import REGISTRY, start_http_server, start_json_dumper
+from prediction_cache import DISK_MAX_ENTRIES, PredictionCache
+from runtimes import RUNTIMES, load_runtime
+
 # Suppress TensorFlow logs
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
 
 # ------------------------------------------------------------
 # ✅ Model and Label Setup
 # ------------------------------------------------------------
-MODEL_PATH = "efficientnetb3_clean_rgb.h5"
-TRAIN_DIR = "final_dataset/train"
+MODEL_BUNDLE_PATH = "efficientnetb3_bundle.h5"  # built with model_bundle.py
+MODEL_PATH = "efficientnetb3_clean_rgb.h5"          # legacy fallback
+TRAIN_DIR = "final_dataset/train"                   # legacy label source
+DATASET_INDEX_DB = "dataset_index.db"               # dataset_index.py, preferred over TRAIN_DIR
+TOP_K = 3
+IMG_SIZE = (300, 300)
+COLOR_MODE = "grayscale"
+FAST_DECODE = os.environ.get("PREDICTOR_FAST_DECODE", "0") == "1"  # opt-in JPEG draft decoding, not bit-exact
+MAX_BATCH_SIZE = 16
+MAX_WAIT_MS = 5.0
+CACHE_SIZE = 1024
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_BYTES", 10 * 1024 * 1024))  # same variable as app.js
 
-# Load model once
-model = tf.keras.models.load_model(MODEL_PATH, compile=False)
-class_labels = sorted(os.listdir(TRAIN_DIR))
+RUNTIME = os.environ.get("PREDICTOR_RUNTIME", "keras")
+MODEL_FILE = os.environ.get("PREDICTOR_MODEL") or (
+    MODEL_BUNDLE_PATH if os.path.exists(MODEL_BUNDLE_PATH) else MODEL_PATH
+)
+LABELS_SOURCE = DATASET_INDEX_DB if os.path.exists(DATASET_INDEX_DB) else TRAIN_DIR
+NUM_THREADS = int(os.environ["PREDICTOR_THREADS"]) if os.environ.get("PREDICTOR_THREADS") else None
+SHARED_WEIGHTS = os.environ.get("PREDICTOR_SHARED_WEIGHTS") == "1"
+
+# ------------------------------------------------------------
+# ✅ Metrics
+# ------------------------------------------------------------
+STAGES = ("read", "decode", "resize", "preprocess", "predict", "serialize")
+STAGE_SECONDS = REGISTRY.histogram("predictor_stage_seconds", "Time spent in each prediction stage", ("stage",))
+_stage_histograms = {stage: STAGE_SECONDS.labels(stage=stage) for stage in STAGES}
+REQUESTS = REGISTRY.counter("predictor_requests_total", "Prediction requests received")
+ERRORS = REGISTRY.counter("predictor_request_errors_total", "Prediction requests that failed")
+BATCH_SIZE = REGISTRY.histogram("predictor_batch_size", "Images per model call", buckets=(1, 2, 4, 8, 16, 32, 64))
+MODEL_LOAD_SECONDS = REGISTRY.gauge("predictor_model_load_seconds", "Time taken to load the model")
+
+
+def stage_timer(stage):
+    return _stage_histograms[stage].time()
+
+_IMPORTS_DONE = time.perf_counter()
+
+# ------------------------------------------------------------
+# ✅ Model Loading
+# ------------------------------------------------------------
+runtime = None
+class_labels = None
+PREPROCESSING = "efficientnet"
+startup_phases = {}
+
+
+def load(warmup=True):
+    """Load the model once; returns seconds spent in each startup phase.
+
+    Labels and input settings travel with the model file.
+    """
+    global runtime, class_labels, IMG_SIZE, COLOR_MODE, PREPROCESSING
+    if runtime is not None:
+        return startup_phases
+    phases = startup_phases
+    phases["imports"] = _IMPORTS_DONE - _T0
+
+    t = time.perf_counter()
+    if RUNTIME in RUNTIMES:
+        RUNTIMES[RUNTIME].import_backend()
+    phases["backend_import"] = time.perf_counter() - t
+
+    t = time.perf_counter()
+    loaded = load_runtime(RUNTIME, MODEL_FILE, labels_dir=LABELS_SOURCE, num_threads=NUM_THREADS,
+                          shared_weights=SHARED_WEIGHTS)
+    phases["model_load"] = time.perf_counter() - t
+    MODEL_LOAD_SECONDS.set(phases["backend_import"] + phases["model_load"])
+
+    t = time.perf_counter()
+    loaded.compile()
+    phases["compile"] = time.perf_counter() - t
+
+    class_labels = loaded.labels
+    IMG_SIZE = loaded.input_size
+    COLOR_MODE = loaded.color_mode
+    PREPROCESSING = loaded.preprocessing
+
+    if warmup:
+        # First call initialises kernels and memory pools off the request path
+        t = time.perf_counter()
+        loaded.predict(np.zeros((1, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32))
+        phases["warmup"] = time.perf_counter() - t
+
+    runtime = loaded
+    phases["time_to_ready"] = time.perf_counter() - _T0
+    return phases
+
+# Runtimes are not safe to call from several threads at once
+predict_lock = threading.Lock()
+
+# Set in worker mode; coalesces concurrent requests into batches
+batcher = None
+# Per-thread BatchBuffer for predictions that bypass the batcher
+_local = threading.local()
+# Set in worker mode; skips repeat uploads of the same image bytes
+cache = None
 
 # ------------------------------------------------------------
 # ✅ Prediction Function
 # ------------------------------------------------------------
-def predict_breed(image_path):
-    img = Image.open(image_path).convert("L")  # convert grayscale
-    img = img.resize((300, 300))
-    img_array = np.array(img, dtype=np.float32)
-    img_array = np.expand_dims(img_array, axis=-1)
-    img_array = np.repeat(img_array, 3, axis=-1)
-    img_array = np.expand_dims(img_array, axis=0)
-    img_array = preprocess_input(img_array)
+def decode_image(image_source):
+    """Decode a path, file-like object, encoded bytes/buffer or uint8 array into a resized uint8 array."""
+    if isinstance(image_source, np.ndarray):
+        with stage_timer("resize"):
+            return preprocessing.from_array(image_source, IMG_SIZE, COLOR_MODE)
+    if isinstance(image_source, (bytes, bytearray, memoryview)):
+        image_source = preprocessing.open_buffer(image_source)
+    return preprocessing.decode(image_source, IMG_SIZE, COLOR_MODE, draft=FAST_DECODE, timer=stage_timer)
+
+
+def load_image(image_source, out=None):
+    """Decode one image into a (300, 300, 3) float32 model input."""
+    decoded = decode_image(image_source)
+    with stage_timer("preprocess"):
+        return preprocessing.to_model_input(decoded, out, PREPROCESSING)
+
+
+def batch_buffer(max_batch):
+    """Reusable float32 model input for up to `max_batch` images at the loaded size."""
+    return preprocessing.BatchBuffer(max_batch, IMG_SIZE, PREPROCESSING, timer=stage_timer)
+
+
+def start_batcher(max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+    """Coalesce concurrent predictions; decoded images are written straight into its batch buffer."""
+    global batcher
+    batcher = MicroBatcher(run_model, max_batch_size, max_wait_ms, buffer=batch_buffer(max_batch_size)).start()
+    return batcher
+
+
+def _thread_buffer():
+    buffer = getattr(_local, "buffer", None)
+    if buffer is None:
+        buffer = _local.buffer = batch_buffer(MAX_BATCH_SIZE)
+    return buffer
+
+
+def cache_version():
+    """PredictionCache version: the served weights plus every setting that changes the model input."""
+    return (f"{runtime.version}/{IMG_SIZE[0]}x{IMG_SIZE[1]}/{COLOR_MODE}/{PREPROCESSING}"
+            f"/{'draft' if FAST_DECODE else 'full'}")
+
+
+def run_model(img_batch):
+    """Single forward pass over an (N, 300, 300, 3) batch."""
+    BATCH_SIZE.observe(len(img_batch))
+    with predict_lock, stage_timer("predict"):
+        return runtime.predict(img_batch)
+
+
+def check_top_k(top_k):
+    """Reject a top_k outside 1..number of breeds (argsort slicing would not)."""
+    if not 1 <= top_k <= len(class_labels):
+        raise ValueError(f"top_k must be between 1 and {len(class_labels)}, got {top_k}")
+    return top_k
+
+
+def top_predictions(probs, top_k=TOP_K):
+    check_top_k(top_k)
+    top_indices = np.argsort(probs)[-top_k:][::-1]
+    return [(class_labels[i], float(probs[i]) * 100) for i in top_indices]
+
+
+def _infer(image_source):
+    decoded = decode_image(image_source)
+    if batcher is not None:
+        return batcher.predict(decoded)
+    buffer = _thread_buffer()
+    buffer.put(0, decoded)
+    return run_model(buffer.batch(1))[0]
+
 
-    preds = model.predict(img_array, verbose=0)
-    top_indices = np.argsort(preds[0])[-3:][::-1]
-    top_breeds = [(class_labels[i], float(preds[0][i]) * 100) for i in top_indices]
-    return top_breeds
+def predict_breed(image_path, top_k=TOP_K):
+    with stage_timer("read"):
+        with open(image_path, "rb") as f:
+            data = f.read()
+    return predict_bytes(data, top_k)
+
+
+def predict_bytes(data, top_k=TOP_K):
+    """Classify one encoded image held in memory (bytes, bytearray or memoryview)."""
+    if cache is None:
+        probs = _infer(data)
+    else:
+        probs = cache.get_or_compute(cache.key(data), lambda: _infer(data))
+    return top_predictions(probs, top_k)
+
+
+def predict_array(array, top_k=TOP_K):
+    """Classify decoded uint8 pixels: one image ((H, W) or (H, W, 3|4)) or a batch.
+
+    A 4-D array, or a 3-D array whose last axis is not 1/3/4 channels, is
+    treated as a batch and returns one result list per image.
+    """
+    array = np.asarray(array)
+    if array.ndim == 4 or (array.ndim == 3 and array.shape[2] not in (1, 3, 4)):
+        return predict_batch(array, top_k)
+    return top_predictions(_infer(array), top_k)
+
+
+def predict_batch(sources, top_k=TOP_K):
+    """Classify many images with as few model calls as possible.
+
+    `sources` is a sequence of paths, encoded bytes/buffers or uint8
+    arrays (mixed is fine), or one batched uint8 array.
+    """
+    buffer = _thread_buffer()
+    results = []
+    for offset in range(0, len(sources), buffer.capacity):
+        chunk = sources[offset:offset + buffer.capacity]
+        for i, source in enumerate(chunk):
+            buffer.put(i, decode_image(source))
+        results += [top_predictions(probs, top_k) for probs in run_model(buffer.batch(len(chunk)))]
+    return results
+
+
+def format_prediction(results):
+    return [{"breed": b, "confidence": c} for b, c in results]
+
+# ------------------------------------------------------------
+# ✅ Worker Mode
+# ------------------------------------------------------------
+class ShutdownRequested(Exception):
+    pass
+
+
+def handle_request(request, payload=None):
+    """Answer one protocol message. Errors are returned, never raised.
+
+    `payload` holds the raw image bytes of a framed request.
+    """
+    if not isinstance(request, dict):
+        return {"error": "request must be a JSON object"}
+    response = {"id": request.get("id")}
+    cmd = request.get("cmd", "predict")
+    try:
+        if cmd == "ping":
+            response["ok"] = True
+        elif cmd == "stats":
+            response["stats"] = {
+                "batcher": batcher.stats() if batcher is not None else None,
+                "cache": cache.stats() if cache is not None else None,
+            }
+        elif cmd == "metrics":
+            response["metrics"] = REGISTRY.snapshot()
+        elif cmd == "shutdown":
+            response["ok"] = True
+        elif cmd == "predict":
+            REQUESTS.inc()
+            top_k = check_top_k(int(request.get("top_k", TOP_K)))
+            if payload is not None:
+                results = predict_bytes(payload, top_k)
+            elif request.get("image_b64"):
+                results = predict_bytes(base64.b64decode(request["image_b64"]), top_k)
+            elif request.get("image_path"):
+                results = predict_breed(request["image_path"], top_k)
+            else:
+                raise ValueError("missing 'image_path', 'image_b64' or 'image_size'")
+            response["prediction"] = format_prediction(results)
+        else:
+            raise ValueError(f"unknown cmd '{cmd}'")
+    except Exception as e:
+        ERRORS.inc()
+        response["error"] = f"{type(e).__name__}: {e}"
+    return response
+
+
+def framed_size(request):
+    """Byte count announced by a framed request's "image_size".
+
+    Anything but an integer in 0..MAX_UPLOAD_BYTES raises ValueError; the
+    bytes that follow cannot be located then, so the stream is unusable.
+    """
+    size = request["image_size"]
+    if isinstance(size, bool) or not isinstance(size, int) or not 0 <= size <= MAX_UPLOAD_BYTES:
+        raise ValueError(f"image_size must be an integer between 0 and {MAX_UPLOAD_BYTES}, got {size!r}")
+    return size
+
+
+def serve_stream(reader, writer, executor):
+    """Serve line-delimited JSON requests until EOF or a shutdown command.
+
+    `reader` is a binary stream: a request with "image_size": N is followed
+    by exactly N raw image bytes, read here before the next request line.
+    Requests run on `executor` so concurrent predictions can share a batch;
+    a shutdown command waits for in-flight requests before returning.
+    """
+    write_lock = threading.Lock()
+    in_flight = []
+
+    def respond(response):
+        with stage_timer("serialize"):
+            line = json.dumps(response) + "\n"
+        with write_lock:
+            writer.write(line)
+            writer.flush()
+
+    for line in iter(reader.readline, b""):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            respond({"id": None, "error": f"invalid JSON: {e}"})
+            continue
+        payload = None
+        if isinstance(request, dict) and "image_size" in request:
+            try:
+                size = framed_size(request)
+            except ValueError as e:
+                respond({"id": request.get("id"), "error": str(e)})
+                break
+            with stage_timer("read"):
+                payload = reader.read(size)
+            if len(payload) < size:
+                respond({"id": request.get("id"), "error": f"stream ended after {len(payload)} of {size} image bytes"})
+                break
+        if isinstance(request, dict) and request.get("cmd") == "shutdown":
+            for future in in_flight:
+                future.result()
+            respond(handle_request(request))
+            raise ShutdownRequested()
+        in_flight = [f for f in in_flight if not f.done()]
+        in_flight.append(executor.submit(lambda r=request, p=payload: respond(handle_request(r, p))))
+
+    for future in in_flight:
+        future.result()
+
+
+def ready_message():
+    return {"ready": True, "pid": os.getpid(), "runtime": RUNTIME, "model": os.path.abspath(MODEL_FILE),
+            "shared_weights": SHARED_WEIGHTS, "labels": len(class_labels),
+            "startup": {phase: round(seconds, 4) for phase, seconds in startup_phases.items()}}
+
+
+def serve_stdio(executor):
+    print(json.dumps(ready_message()), flush=True)
+    try:
+        serve_stream(sys.stdin.buffer, sys.stdout, executor)
+    except ShutdownRequested:
+        pass
+
+
+class _SocketHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        writer = _TextWriter(self.wfile)
+        try:
+            serve_stream(self.rfile, writer, self.server.executor)
+        except ShutdownRequested:
+            # shutdown() blocks until serve_forever returns, so call it elsewhere
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class _TextWriter:
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text):
+        self.wfile.write(text.encode("utf-8"))
+
+    def flush(self):
+        self.wfile.flush()
+
+
+def serve_unix(socket_path, executor):
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socketserver.ThreadingUnixStreamServer(socket_path, _SocketHandler)
+    server.daemon_threads = True
+    server.executor = executor
+    print(json.dumps({**ready_message(), "socket": socket_path}), flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def _exit_on_signal(signum, frame):
+    # Raised in the main thread so serve loops unwind and clean up
+    raise KeyboardInterrupt()
 
 # ------------------------------------------------------------
 # ✅ Entry Point
 # ------------------------------------------------------------
 if __name__ == "__main__":
-    image_path = sys.argv[1]
-    results = predict_breed(image_path)
-    output = [{"breed": b, "confidence": c} for b, c in results]
-    print(json.dumps(output))  # Output clean JSON only
+    parser = argparse.ArgumentParser(description="Dog breed predictor")
+    parser.add_argument("image_path", nargs="?", help="image to classify (one-shot mode)")
+    parser.add_argument("--worker", action="store_true", help="serve requests until shutdown")
+    parser.add_argument("--socket", help="Unix socket path for worker mode (default: stdin/stdout)")
+    parser.add_argument("--max-batch-size", type=int, default=MAX_BATCH_SIZE,
+                        help="largest batch handed to model.predict in worker mode")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="how long a batch waits for more requests before running")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="requests handled at once (default: 2 x max batch size)")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE,
+                        help="predictions kept in the in-memory LRU (0 disables caching)")
+    parser.add_argument("--cache-db", help="SQLite file for a persistent cache tier")
+    parser.add_argument("--cache-db-max-entries", type=int, default=DISK_MAX_ENTRIES,
+                        help="rows kept in --cache-db; least recently used are pruned")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus metrics on 127.0.0.1:PORT/metrics")
+    parser.add_argument("--metrics-json", help="periodically dump metrics as JSON to this file")
+    parser.add_argument("--metrics-interval", type=float, default=30.0, help="seconds between JSON dumps")
+    parser.add_argument("--no-warmup", action="store_true", help="skip the warm-up batch before serving")
+    args = parser.parse_args()
+
+    if args.worker:
+        load(warmup=not args.no_warmup)
+        signal.signal(signal.SIGTERM, _exit_on_signal)
+        start_batcher(args.max_batch_size, args.max_wait_ms)
+        REGISTRY.gauge("predictor_queue_depth", "Images waiting for a batch",
+                       lambda: batcher.stats()["queue_depth"])
+        if args.cache_size > 0 or args.cache_db:
+            cache = PredictionCache(cache_version(), args.cache_size, args.cache_db, args.cache_db_max_entries)
+            for counter in ("hits", "disk_hits", "misses", "coalesced", "evictions"):
+                REGISTRY.gauge(f"predictor_cache_{counter}", f"Prediction cache {counter.replace('_', ' ')}",
+                               lambda counter=counter: cache.stats()[counter])
+        if args.metrics_port:
+            start_http_server(args.metrics_port)
+        if args.metrics_json:
+            start_json_dumper(args.metrics_json, args.metrics_interval)
+        executor = ThreadPoolExecutor(max_workers=args.concurrency or 2 * args.max_batch_size)
+        try:
+            if args.socket:
+                serve_unix(args.socket, executor)
+            else:
+                serve_stdio(executor)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            batcher.stop(timeout=5)
+            if cache is not None:
+                cache.close()
+    elif args.image_path:
+        load(warmup=False)
+        results = predict_breed(args.image_path)
+        print(json.dumps(format_prediction(results)))  # Output clean JSON only
+    else:
+        parser.error("an image path or --worker is required")
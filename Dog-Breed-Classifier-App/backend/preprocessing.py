@@ -0,0 +1,179 @@
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Fast Image Decode & Preprocessing
+# ============================================================
+#
+# The original predictor path was:
+#   PIL decode → convert("L") → resize → float32 copy → expand_dims →
+#   np.repeat to 3 channels → expand_dims → preprocess_input
+# which allocates several full-size float32 arrays per image. Here:
+#
+#   decode()          PIL decode + convert + resize; returns a small uint8
+#                     array. With draft=True (opt-in) a JPEG much larger than
+#                     the target is decoded at reduced resolution (DCT
+#                     scaling via Image.draft): faster, but pixels differ
+#                     from the full decode by a few levels.
+#   to_model_input()  one write of that uint8 array into a float32 slot, in
+#                     place (no intermediate float32 copy), filling the 3
+#                     channels from grayscale without np.repeat.
+#   BatchBuffer       preallocated (N, H, W, 3) float32 batch reused per call.
+#
+# colour modes (selectable, same pixels as before):
+#   "grayscale"  convert("L") replicated to 3 channels (current predictor)
+#   "rgb"        convert("RGB")
+#
+# preprocessing names:
+#   "efficientnet"  Keras EfficientNet preprocess_input, which is a pass-through
+#                   because the model rescales/normalises inside the graph
+#   "scale_255"     divide by 255 (debug_predict.py preprocess_v1)
+
+import io
+from contextlib import nullcontext
+
+import numpy as np
+from PIL import Image
+
+COLOR_MODES = {"grayscale": "L", "rgb": "RGB"}
+PREPROCESSING = ("efficientnet", "scale_255")
+
+# Only use reduced-resolution decoding when the source is at least this
+# many times larger than the target on both sides.
+DRAFT_FACTOR = 2
+
+# ------------------------------------------------------------
+# ✅ In-Memory Sources
+# ------------------------------------------------------------
+class BufferReader(io.RawIOBase):
+    """Seekable read-only file over any buffer (memoryview, bytearray, mmap...)
+
+    PIL reads through it in small chunks, so the encoded image is never
+    copied as a whole the way io.BytesIO(memoryview) would copy it.
+    """
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, b):
+        chunk = self._view[self._pos:self._pos + len(b)]
+        b[:len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+def open_buffer(data):
+    """File object over encoded image bytes without copying them."""
+    if isinstance(data, bytes):
+        return io.BytesIO(data)   # shares the bytes object until written to
+    return BufferReader(data)
+
+
+def from_array(array, size=(300, 300), color_mode="grayscale"):
+    """Bring a decoded uint8 image ((H, W), (H, W, 3) or (H, W, 4)) to what decode() returns.
+
+    An array that already has the target size and channel layout is
+    returned as is, without a copy.
+    """
+    array = np.asarray(array)
+    if array.dtype != np.uint8:
+        raise ValueError(f"expected a uint8 image array, got {array.dtype}")
+    if array.ndim not in (2, 3) or (array.ndim == 3 and array.shape[2] not in (1, 3, 4)):
+        raise ValueError(f"expected (H, W), (H, W, 3) or (H, W, 4), got {array.shape}")
+    if array.ndim == 3 and array.shape[2] == 1:
+        array = array[:, :, 0]
+    target_ndim = 2 if color_mode == "grayscale" else 3
+    if array.shape[:2] == (size[1], size[0]) and array.ndim == target_ndim and (target_ndim == 2 or array.shape[2] == 3):
+        return array
+    img = Image.fromarray(array).convert(COLOR_MODES[color_mode])
+    if img.size != tuple(size):
+        img = img.resize(size)
+    return np.asarray(img, dtype=np.uint8)
+
+# ------------------------------------------------------------
+# ✅ Decode
+# ------------------------------------------------------------
+def decode(source, size=(300, 300), color_mode="grayscale", draft=False, timer=None):
+    """Decode a path or file-like object into a resized uint8 array.
+
+    Grayscale gives (H, W); RGB gives (H, W, 3). `size` is (width, height)
+    as PIL expects, which is the same for the square 300x300 input.
+    `timer(stage)`, if given, returns a context manager wrapped around the
+    "decode" and "resize" stages.
+    """
+    pil_mode = COLOR_MODES[color_mode]
+    with timer("decode") if timer else nullcontext():
+        img = Image.open(source)
+        if draft and img.format == "JPEG":
+            width, height = img.size
+            if width >= DRAFT_FACTOR * size[0] and height >= DRAFT_FACTOR * size[1]:
+                # Let libjpeg drop DCT coefficients; result stays >= the target size
+                img.draft(pil_mode, size)
+        img = img.convert(pil_mode)
+    with timer("resize") if timer else nullcontext():
+        img = img.resize(size)
+        return np.asarray(img, dtype=np.uint8)
+
+
+def to_model_input(decoded, out=None, preprocessing="efficientnet"):
+    """Write a decoded uint8 image into a float32 (H, W, 3) array in one pass."""
+    height, width = decoded.shape[:2]
+    if out is None:
+        out = np.empty((height, width, 3), dtype=np.float32)
+    if preprocessing not in ("efficientnet", "scale_255"):
+        raise ValueError(f"unknown preprocessing '{preprocessing}'")
+    if decoded.ndim == 2:
+        # Cast the single channel straight into each plane: no temporary
+        # float32 image (plane-to-plane copies within `out` would make one,
+        # since NumPy buffers overlapping operands), and faster than a
+        # broadcast uint8→float32 write or np.repeat
+        for channel in range(3):
+            np.copyto(out[:, :, channel], decoded, casting="unsafe")
+    else:
+        np.copyto(out, decoded, casting="unsafe")
+    if preprocessing == "scale_255":
+        np.divide(out, 255.0, out=out)
+    return out
+
+
+def preprocess(source, size=(300, 300), color_mode="grayscale", preprocessing="efficientnet", draft=False, out=None):
+    return to_model_input(decode(source, size, color_mode, draft), out, preprocessing)
+
+# ------------------------------------------------------------
+# ✅ Preallocated Batch Buffer
+# ------------------------------------------------------------
+class BatchBuffer:
+    """Reusable (max_batch, H, W, 3) float32 model input.
+
+    The array returned by batch() is overwritten by the next round of
+    put() calls, so consume it (e.g. run the model) before refilling.
+    """
+
+    def __init__(self, max_batch, size=(300, 300), preprocessing="efficientnet", timer=None):
+        self.array = np.empty((max_batch, size[1], size[0], 3), dtype=np.float32)
+        self.preprocessing = preprocessing
+        self.timer = timer
+
+    @property
+    def capacity(self):
+        return self.array.shape[0]
+
+    def put(self, index, decoded):
+        """Write one decoded uint8 image into slot `index`; `timer` wraps it as "preprocess"."""
+        with self.timer("preprocess") if self.timer else nullcontext():
+            to_model_input(decoded, self.array[index], self.preprocessing)
+
+    def batch(self, count):
+        return self.array[:count]
@@ -0,0 +1,248 @@
+# pyright: reportMissingImports=false
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Pluggable Inference Runtimes
+# ============================================================
+#
+# Every runtime takes an (N, H, W, 3) float32 batch that has already been
+# through load_image() and returns (N, num_classes) probabilities, so the
+# predictor can switch backend without touching preprocessing or top-k.
+#
+#   keras   .h5 model or model bundle (tf.keras)
+#   tflite  .tflite file from TrainingModel/export_runtimes.py
+#   onnx    .onnx file from TrainingModel/export_runtimes.py
+#
+# shared_weights (tflite only) keeps the weights in the read-only mapping
+# of the .tflite file, so every worker process serving the same file uses
+# the same page-cache pages instead of its own copy. The interpreter then
+# runs without the default XNNPACK delegate, which repacks the weights
+# into private memory. Use an fp32 or int8 export: fp16 weights are
+# dequantised into private buffers at load time.
+#
+# Labels and input settings come from the bundle itself, or for exported
+# files from the "<model>.json" sidecar written next to them.
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+DEFAULT_METADATA = {"input_size": [300, 300], "color_mode": "grayscale", "preprocessing": "efficientnet"}
+
+# ------------------------------------------------------------
+# ✅ Metadata Resolution
+# ------------------------------------------------------------
+def sidecar_path(model_path):
+    return os.path.splitext(model_path)[0] + ".json"
+
+
+def index_labels(db_path, split="train"):
+    """Sorted breeds of `split` from a dataset_index.py database (same order as sorted listdir).
+
+    A flat <breed>/<image> tree is indexed with split '', which is used when
+    `split` has no rows. Raises ValueError rather than returning no labels.
+    Also used by TrainingModel/index_dataset.py, so both sides agree.
+    """
+    import sqlite3
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        for candidate in (split, ""):
+            labels = [row[0] for row in conn.execute(
+                "SELECT DISTINCT breed FROM files WHERE split = ? ORDER BY breed", (candidate,))]
+            if labels:
+                return labels
+    finally:
+        conn.close()
+    raise ValueError(f"{db_path} lists no breeds for split '{split}' or a flat layout")
+
+
+def resolve_metadata(model_path, labels_dir=None):
+    """Find labels/input settings for a model file, most specific source first."""
+    if model_path.endswith((".h5", ".hdf5")):
+        import h5py
+        from model_bundle import BUNDLE_ATTR, bundle_metadata
+
+        with h5py.File(model_path, "r") as f:
+            if BUNDLE_ATTR in f.attrs:
+                return bundle_metadata(f)
+    sidecar = sidecar_path(model_path)
+    if os.path.exists(sidecar):
+        with open(sidecar, encoding="utf-8") as f:
+            return {**DEFAULT_METADATA, **json.load(f)}
+    if labels_dir and labels_dir.endswith(".db") and os.path.exists(labels_dir):
+        return {**DEFAULT_METADATA, "labels": index_labels(labels_dir)}
+    if labels_dir and os.path.isdir(labels_dir):
+        return {**DEFAULT_METADATA, "labels": sorted(os.listdir(labels_dir))}
+    raise FileNotFoundError(f"no labels found for {model_path} (expected a bundle or {sidecar})")
+
+
+def file_checksum(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# ------------------------------------------------------------
+# ✅ Runtimes
+# ------------------------------------------------------------
+class Runtime:
+    name = None
+
+    def __init__(self, model_path, labels_dir=None, num_threads=None):
+        self.model_path = model_path
+        meta = self.metadata = resolve_metadata(model_path, labels_dir)
+        self.labels = meta["labels"]
+        self.input_size = tuple(meta["input_size"])
+        self.color_mode = meta["color_mode"]
+        self.preprocessing = meta["preprocessing"]
+        self._checksum = meta.get("weights_sha256")
+        self.num_threads = num_threads
+
+    can_share_weights = False
+
+    @staticmethod
+    def import_backend():
+        """Import the heavy backend module; separate so startup can time it."""
+        return None
+
+    def compile(self):
+        """Prepare a fast inference path; called once after loading."""
+
+    @property
+    def version(self):
+        """Identifier that changes whenever the served weights change."""
+        if self._checksum is None:
+            self._checksum = file_checksum(self.model_path)
+        return f"{self.name}-{self._checksum[:16]}"
+
+    def predict(self, batch):
+        raise NotImplementedError
+
+
+class KerasRuntime(Runtime):
+    name = "keras"
+
+    @staticmethod
+    def import_backend():
+        import tensorflow as tf
+        return tf
+
+    def __init__(self, model_path, labels_dir=None, num_threads=None):
+        super().__init__(model_path, labels_dir, num_threads)
+        tf = self._tf = self.import_backend()
+        self._serve = None
+        if num_threads:
+            # Only takes effect before TensorFlow runs its first op
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        if self._checksum is not None:
+            from model_bundle import load_bundle
+            self.model = load_bundle(model_path, meta=self.metadata).model
+        else:
+            self.model = tf.keras.models.load_model(model_path, compile=False)
+
+    def compile(self):
+        # Fixed signature: one trace serves every batch size, no retracing
+        tf = self._tf
+        width, height = self.input_size
+        spec = tf.TensorSpec([None, height, width, 3], tf.float32)
+        model = self.model
+
+        @tf.function(input_signature=[spec])
+        def serve(images):
+            return model(images, training=False)
+
+        self._serve = serve.get_concrete_function()
+
+    def predict(self, batch):
+        if self._serve is None:
+            return self.model.predict(batch, verbose=0)
+        return self._serve(self._tf.convert_to_tensor(batch, dtype=self._tf.float32)).numpy()
+
+
+class TFLiteRuntime(Runtime):
+    name = "tflite"
+    can_share_weights = True
+
+    @staticmethod
+    def import_backend():
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        return Interpreter
+
+    @staticmethod
+    def op_resolver_types():
+        try:
+            from tflite_runtime.interpreter import OpResolverType
+        except ImportError:
+            import tensorflow as tf
+            OpResolverType = tf.lite.experimental.OpResolverType
+        return OpResolverType
+
+    def __init__(self, model_path, labels_dir=None, num_threads=None, shared_weights=False):
+        super().__init__(model_path, labels_dir, num_threads)
+        Interpreter = self.import_backend()
+        options = {}
+        if shared_weights:
+            # Built-in kernels read the weights straight from the mmap'd file
+            options["experimental_op_resolver_type"] = \
+                self.op_resolver_types().BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads, **options)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        if batch.shape[0] != self._batch_size:
+            # Re-plan only when the batch size actually changes
+            self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch.shape[0]
+        self.interpreter.set_tensor(self._input["index"], batch)
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self._output["index"])
+
+
+class OnnxRuntime(Runtime):
+    name = "onnx"
+
+    @staticmethod
+    def import_backend():
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("the onnx runtime needs `pip install onnxruntime`") from e
+        return ort
+
+    def __init__(self, model_path, labels_dir=None, num_threads=None):
+        super().__init__(model_path, labels_dir, num_threads)
+        ort = self.import_backend()
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input_name: batch})[0]
+
+
+RUNTIMES = {cls.name: cls for cls in (KerasRuntime, TFLiteRuntime, OnnxRuntime)}
+
+
+def load_runtime(name, model_path, labels_dir=None, num_threads=None, shared_weights=False):
+    if name not in RUNTIMES:
+        raise ValueError(f"unknown runtime '{name}' (choose from {', '.join(sorted(RUNTIMES))})")
+    if not shared_weights:
+        return RUNTIMES[name](model_path, labels_dir=labels_dir, num_threads=num_threads)
+    if not RUNTIMES[name].can_share_weights:
+        raise ValueError(f"the {name} runtime keeps a private copy of the weights; "
+                         f"shared weights need the tflite runtime")
+    return RUNTIMES[name](model_path, labels_dir=labels_dir, num_threads=num_threads, shared_weights=True)
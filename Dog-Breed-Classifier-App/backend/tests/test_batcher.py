@@ -0,0 +1,122 @@
+import threading
+
+import numpy as np
+import pytest
+
+from batcher import MicroBatcher
+from preprocessing import BatchBuffer
+
+
+class RecordingModel:
+    """predict_fn that returns each image's sum and remembers batch sizes."""
+
+    def __init__(self, fail=False):
+        self.batch_sizes = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self.lock:
+            self.batch_sizes.append(len(batch))
+        if self.fail:
+            raise RuntimeError("model failed")
+        return batch.reshape(len(batch), -1).sum(axis=1)
+
+
+def image(value):
+    return np.full((2, 2, 3), value, dtype=np.float32)
+
+
+def test_each_caller_gets_its_own_row():
+    model = RecordingModel()
+    with MicroBatcher(model, max_batch_size=8, max_wait_ms=50) as batcher:
+        futures = [batcher.submit(image(i)) for i in range(5)]
+        results = [f.result(timeout=5) for f in futures]
+    assert results == [12.0 * i for i in range(5)]
+
+
+def test_full_batch_flushes_without_waiting():
+    model = RecordingModel()
+    with MicroBatcher(model, max_batch_size=4, max_wait_ms=60_000) as batcher:
+        futures = [batcher.submit(image(1)) for _ in range(4)]
+        for future in futures:
+            future.result(timeout=5)   # would hang for a minute if it waited
+    assert model.batch_sizes == [4]
+
+
+def test_partial_batch_flushes_after_max_wait():
+    model = RecordingModel()
+    with MicroBatcher(model, max_batch_size=16, max_wait_ms=10) as batcher:
+        assert batcher.predict(image(2), timeout=5) == 24.0
+    assert model.batch_sizes == [1]
+
+
+def test_batches_never_exceed_max_batch_size():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=60_000).start()
+    futures = [batcher.submit(image(i)) for i in range(10)]
+    batcher.stop(timeout=5)   # flushes the last, partial batch
+    assert [f.result(timeout=0) for f in futures] == [12.0 * i for i in range(10)]
+    assert model.batch_sizes == [4, 4, 2]
+
+
+def test_model_error_reaches_every_caller_in_the_batch():
+    model = RecordingModel(fail=True)
+    batcher = MicroBatcher(model, max_batch_size=3, max_wait_ms=60_000).start()
+    futures = [batcher.submit(image(0)) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model failed"):
+            future.result(timeout=5)
+    batcher.stop(timeout=5)
+    stats = batcher.stats()
+    assert stats["failed"] == 3 and stats["completed"] == 0
+
+
+def test_cancelled_requests_are_skipped():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=60_000).start()
+    futures = [batcher.submit(image(i)) for i in range(3)]
+    assert futures[1].cancel()
+    batcher.stop(timeout=5)
+    assert model.batch_sizes == [2]
+    assert futures[0].result(timeout=0) == 0.0 and futures[2].result(timeout=0) == 24.0
+
+
+def test_stats_report_batch_sizes():
+    model = RecordingModel()
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=60_000).start()
+    for i in range(6):
+        batcher.submit(image(i))
+    batcher.stop(timeout=5)
+    stats = batcher.stats()
+    assert stats["submitted"] == 6 and stats["completed"] == 6
+    assert stats["batches"] == 2 and stats["mean_batch_size"] == 3.0
+    assert stats["batch_size_histogram"] == {"2": 1, "4": 1}
+
+
+def test_submit_requires_a_running_batcher():
+    with pytest.raises(RuntimeError):
+        MicroBatcher(RecordingModel()).submit(image(0))
+    with pytest.raises(ValueError):
+        MicroBatcher(RecordingModel(), max_batch_size=0)
+
+
+def test_decoded_images_are_written_into_the_buffer():
+    buffer = BatchBuffer(4, size=(2, 2))
+    seen = []
+
+    def model(batch):
+        seen.append(batch)
+        return batch.reshape(len(batch), -1).sum(axis=1)
+
+    with MicroBatcher(model, max_batch_size=4, max_wait_ms=50, buffer=buffer) as batcher:
+        futures = [batcher.submit(np.full((2, 2), i, dtype=np.uint8)) for i in range(3)]
+        results = [f.result(timeout=5) for f in futures]
+    assert results == [12.0 * i for i in range(3)]
+    # The model ran on the reused buffer, not on a stacked copy
+    assert all(np.shares_memory(batch, buffer.array) for batch in seen)
+
+
+def test_buffer_must_hold_a_full_batch():
+    with pytest.raises(ValueError):
+        MicroBatcher(RecordingModel(), max_batch_size=8, buffer=BatchBuffer(4, size=(2, 2)))
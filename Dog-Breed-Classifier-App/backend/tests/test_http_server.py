@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+import predictor
+from http_server import HTTPError, InferenceServer, MultipartReader
+
+BOUNDARY = "----dogbreed1234"
+
+
+class TrickleReader:
+    """Async reader that returns at most `step` bytes per read, like a slow socket."""
+
+    def __init__(self, data, step):
+        self.data = memoryview(data)
+        self.step = step
+        self.reads = 0
+
+    async def read(self, n):
+        chunk, self.data = bytes(self.data[:min(n, self.step)]), self.data[min(n, self.step):]
+        self.reads += 1
+        return chunk
+
+
+def part(name, payload, filename=None, content_type="application/octet-stream"):
+    disposition = f'form-data; name="{name}"' + (f'; filename="{filename}"' if filename else "")
+    return (f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n"
+            f"Content-Type: {content_type}\r\n\r\n").encode() + payload + b"\r\n"
+
+
+def body(*parts, preamble=b"", epilogue=b""):
+    return preamble + b"".join(parts) + f"--{BOUNDARY}--\r\n".encode() + epilogue
+
+
+def read_field(data, field="file", max_bytes=1 << 20, step=1 << 16, length=None):
+    reader = TrickleReader(data, step)
+    multipart = MultipartReader(reader, BOUNDARY, len(data) if length is None else length)
+    return asyncio.run(multipart.read_field(field, max_bytes)), reader
+
+
+IMAGE = bytes(range(256)) * 40 + b"\r\n--not-the-boundary\r\n" + b"\xff\xd8" * 100
+
+
+@pytest.mark.parametrize("step", [1, 7, len(BOUNDARY) + 3, 4096, 1 << 16])
+def test_file_field_survives_any_read_size(step):
+    data = body(part("note", b"hello"), part("file", IMAGE, "dog.jpg", "image/jpeg"), part("extra", b"x" * 5000))
+    found, reader = read_field(data, step=step)
+    assert found == IMAGE
+    assert reader.data.nbytes == 0   # the whole body was consumed, epilogue included
+
+
+def test_missing_field_returns_none():
+    found, _ = read_field(body(part("other", b"data")))
+    assert found is None
+
+
+def test_first_part_with_the_name_wins():
+    found, _ = read_field(body(part("file", b"first"), part("file", b"second")))
+    assert found == b"first"
+
+
+def test_preamble_and_epilogue_are_ignored():
+    found, _ = read_field(body(part("file", b"img"), preamble=b"ignore me\r\n", epilogue=b"trailing junk"))
+    assert found == b"img"
+
+
+def test_empty_file_part():
+    found, _ = read_field(body(part("file", b"")))
+    assert found == b""
+
+
+def test_oversized_field_is_413():
+    with pytest.raises(HTTPError) as err:
+        read_field(body(part("file", b"x" * 2000)), max_bytes=1000, step=100)
+    assert err.value.status == 413 and err.value.close
+
+
+def test_oversized_other_parts_are_streamed_past():
+    found, _ = read_field(body(part("big", b"y" * 300_000), part("file", b"img")), max_bytes=10)
+    assert found == b"img"
+
+
+def test_truncated_body_is_400():
+    data = body(part("file", IMAGE))
+    with pytest.raises(HTTPError) as err:
+        read_field(data[:len(data) // 2], step=512)
+    assert err.value.status == 400
+
+
+def test_content_length_shorter_than_body_is_400():
+    data = body(part("file", IMAGE))
+    with pytest.raises(HTTPError) as err:
+        read_field(data, length=len(data) // 2)
+    assert err.value.status == 400
+
+
+@pytest.mark.parametrize("step", [100, 1 << 16])
+def test_oversized_part_headers_are_400(step):
+    data = (f"--{BOUNDARY}\r\nX-Padding: ".encode() + b"a" * 20_000 + b"\r\n\r\nimg\r\n"
+            + f"--{BOUNDARY}--\r\n".encode())
+    with pytest.raises(HTTPError) as err:
+        read_field(data, step=step)
+    assert err.value.status == 400
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.sent = bytearray()
+
+    def write(self, data):
+        self.sent += data
+
+    async def drain(self):
+        pass
+
+    def can_write_eof(self):
+        return False
+
+    def close(self):
+        pass
+
+
+def serve(raw):
+    """Responses the server sends for `raw` bytes arriving on one connection."""
+    async def run():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        writer = RecordingWriter()
+        await InferenceServer(executor=None).handle_connection(reader, writer)
+        return bytes(writer.sent)
+    return asyncio.run(run())
+
+
+# A complete request hidden in the upload; it must never be answered
+SMUGGLED = b"GET /healthz HTTP/1.1\r\nHost: x\r\n\r\n"
+
+
+def upload_request(target="/predict", extra_headers=""):
+    data = body(part("file", SMUGGLED))
+    return (f"POST {target} HTTP/1.1\r\nHost: x\r\n"
+            f"Content-Type: multipart/form-data; boundary={BOUNDARY}\r\n"
+            f"Content-Length: {len(data)}\r\n{extra_headers}\r\n").encode() + data
+
+
+@pytest.fixture
+def labels(monkeypatch):
+    monkeypatch.setattr(predictor, "class_labels", ["beagle", "boxer", "pug"])
+
+
+@pytest.mark.parametrize("target, extra_headers", [
+    ("/predict?top_k=0", ""),
+    ("/predict?top_k=abc", ""),
+    ("/predict", "X-Request-Timeout-Ms: soon\r\n"),
+])
+def test_rejected_upload_closes_the_connection(labels, target, extra_headers):
+    sent = serve(upload_request(target, extra_headers))
+    assert sent.startswith(b"HTTP/1.1 400 ")
+    assert sent.count(b"HTTP/1.1 ") == 1
+    assert b"Connection: close" in sent
+
+
+def test_unknown_path_with_bad_content_length_is_400():
+    sent = serve(b"POST /nope HTTP/1.1\r\nHost: x\r\nContent-Length: ten\r\n\r\n" + SMUGGLED)
+    assert sent.startswith(b"HTTP/1.1 400 ")
+    assert sent.count(b"HTTP/1.1 ") == 1
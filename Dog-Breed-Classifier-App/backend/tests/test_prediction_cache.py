@@ -0,0 +1,171 @@
+import itertools
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import prediction_cache
+import predictor
+from prediction_cache import PredictionCache
+
+
+def probs(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_key_depends_on_model_version_and_bytes():
+    a, b = PredictionCache("v1"), PredictionCache("v2")
+    assert a.key(b"img") == a.key(memoryview(b"img"))
+    assert a.key(b"img") != a.key(b"img2")
+    assert a.key(b"img") != b.key(b"img")
+
+
+def test_second_lookup_is_a_hit():
+    cache = PredictionCache("v1")
+    calls = []
+    compute = lambda: calls.append(1) or probs(0.2, 0.8)
+    first = cache.get_or_compute("k", compute)
+    second = cache.get_or_compute("k", compute)
+    assert len(calls) == 1
+    np.testing.assert_array_equal(first, second)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = PredictionCache("v1", max_entries=2)
+    for key in ("a", "b"):
+        cache.get_or_compute(key, lambda: probs(1))
+    cache.get_or_compute("a", lambda: pytest.fail("'a' should be cached"))
+    cache.get_or_compute("c", lambda: probs(1))          # evicts "b", not "a"
+    cache.get_or_compute("a", lambda: pytest.fail("'a' should be cached"))
+    recomputed = []
+    cache.get_or_compute("b", lambda: recomputed.append(1) or probs(1))
+    assert recomputed == [1]
+    assert cache.stats()["evictions"] == 2
+
+
+def test_concurrent_requests_for_one_key_compute_once():
+    cache = PredictionCache("v1")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return probs(0.5, 0.5)
+
+    results = []
+    owner = threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow)))
+    owner.start()
+    started.wait(5)
+    waiters = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", slow)))
+               for _ in range(3)]
+    for t in waiters:
+        t.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for t in [owner, *waiters]:
+        t.join(5)
+    assert calls == [1] and len(results) == 4
+    assert cache.stats()["coalesced"] == 3
+
+
+def test_errors_propagate_and_are_not_cached():
+    cache = PredictionCache("v1")
+
+    def broken():
+        raise ValueError("bad image")
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute("k", broken)
+    assert cache.stats()["errors"] == 1 and cache.stats()["in_flight"] == 0
+    np.testing.assert_array_equal(cache.get_or_compute("k", lambda: probs(1)), probs(1))
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    db = str(tmp_path / "cache.db")
+    first = PredictionCache("v1", disk_path=db)
+    first.get_or_compute("k", lambda: probs(0.1, 0.9))
+    first.close()
+
+    second = PredictionCache("v1", disk_path=db)
+    value = second.get_or_compute("k", lambda: pytest.fail("should come from disk"))
+    np.testing.assert_array_equal(value, probs(0.1, 0.9))
+    assert second.stats()["disk_hits"] == 1
+    second.close()
+
+
+def test_new_model_version_drops_old_disk_entries(tmp_path):
+    db = str(tmp_path / "cache.db")
+    old = PredictionCache("v1", disk_path=db)
+    old.get_or_compute(old.key(b"img"), lambda: probs(1))
+    old.close()
+
+    new = PredictionCache("v2", disk_path=db)
+    assert new.stats()["disk_entries"] == 0
+    new.close()
+
+
+class ServedModel:
+    version = "tflite-0123456789abcdef"
+
+
+@pytest.mark.parametrize("setting, value", [
+    ("FAST_DECODE", True), ("COLOR_MODE", "rgb"), ("PREPROCESSING", "scale_255"), ("IMG_SIZE", (224, 224)),
+])
+def test_changing_input_settings_misses_the_disk_tier(tmp_path, monkeypatch, setting, value):
+    monkeypatch.setattr(predictor, "runtime", ServedModel())
+    for name, default in (("FAST_DECODE", False), ("COLOR_MODE", "grayscale"),
+                          ("PREPROCESSING", "efficientnet"), ("IMG_SIZE", (300, 300))):
+        monkeypatch.setattr(predictor, name, default)
+    path = str(tmp_path / "cache.db")
+    before = PredictionCache(predictor.cache_version(), disk_path=path)
+    before.get_or_compute(before.key(b"img"), lambda: probs(0.3, 0.7))
+    before.close()
+
+    monkeypatch.setattr(predictor, setting, value)
+    after = PredictionCache(predictor.cache_version(), disk_path=path)
+    calls = []
+    after.get_or_compute(after.key(b"img"), lambda: calls.append(1) or probs(0.6, 0.4))
+    assert calls == [1]
+    after.close()
+
+
+def test_disk_tier_is_capped_least_recently_used_first(tmp_path, monkeypatch):
+    clock = itertools.count(1)
+    monkeypatch.setattr(prediction_cache.time, "time", lambda: float(next(clock)))
+    cache = PredictionCache("v1", max_entries=0, disk_path=str(tmp_path / "cache.db"), disk_max_entries=10)
+    for i in range(10):
+        cache.get_or_compute(f"k{i}", lambda: probs(1))
+    cache.get_or_compute("k0", lambda: pytest.fail("k0 should come from disk"))   # now most recent
+    cache.get_or_compute("k10", lambda: probs(1))   # 11 rows: within the 10% slack
+    cache.get_or_compute("k11", lambda: probs(1))   # 12 rows: pruned back to 10
+
+    keys = {row[0] for row in cache._db.execute("SELECT key FROM predictions")}
+    assert keys == {"k0", *(f"k{i}" for i in range(3, 12))}
+    stats = cache.stats()
+    assert stats["disk_entries"] == 10 and stats["disk_evictions"] == 2
+    cache.close()
+
+
+def test_disk_files_from_before_the_cap_are_upgraded(tmp_path):
+    db = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE predictions (key TEXT PRIMARY KEY, version TEXT, probs BLOB)")
+    conn.executemany("INSERT INTO predictions VALUES (?, 'v1', ?)",
+                     [(f"old{i}", probs(1).tobytes()) for i in range(5)])
+    conn.commit()
+    conn.close()
+
+    cache = PredictionCache("v1", disk_path=db, disk_max_entries=3)
+    assert cache.stats()["disk_entries"] == 3          # pruned on open
+    cache.get_or_compute("new", lambda: probs(2))
+    row = cache._db.execute("SELECT last_used FROM predictions WHERE key = 'new'").fetchone()
+    assert row[0] > 0
+    cache.close()
@@ -0,0 +1,60 @@
+import io
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import predictor
+import worker_pool
+
+
+def lines(*messages):
+    return b"".join(json.dumps(m).encode() + b"\n" for m in messages)
+
+
+def run_stream(data):
+    writer = io.StringIO()
+    with ThreadPoolExecutor(2) as executor:
+        predictor.serve_stream(io.BytesIO(data), writer, executor)
+    return [json.loads(line) for line in writer.getvalue().splitlines()]
+
+
+class IdlePool:
+    def stats(self, memory=False):
+        return {"workers": []}
+
+
+def run_pool_stdio(data, monkeypatch):
+    stdout = io.StringIO()
+    monkeypatch.setattr(sys, "stdin", io.TextIOWrapper(io.BytesIO(data)))
+    monkeypatch.setattr(sys, "stdout", stdout)
+    worker_pool.serve_stdio(IdlePool())
+    return [json.loads(line) for line in stdout.getvalue().splitlines()][1:]   # skip the ready line
+
+
+BAD_SIZES = ["abc", None, -1, 1.5, True, predictor.MAX_UPLOAD_BYTES + 1]
+
+
+def test_framed_size_accepts_the_upload_range():
+    assert predictor.framed_size({"image_size": 0}) == 0
+    assert predictor.framed_size({"image_size": predictor.MAX_UPLOAD_BYTES}) == predictor.MAX_UPLOAD_BYTES
+
+
+@pytest.mark.parametrize("size", BAD_SIZES)
+def test_worker_answers_bad_image_size_and_stops_reading(size):
+    responses = run_stream(lines({"id": 1, "cmd": "ping"}, {"id": 2, "image_size": size})
+                           + b"\xff\xd8 image bytes\n" + lines({"id": 3, "cmd": "ping"}))
+    assert responses[0] == {"id": 1, "ok": True}
+    assert responses[1]["id"] == 2 and "image_size" in responses[1]["error"]
+    # The framing is lost, so nothing after the bad header is interpreted
+    assert len(responses) == 2
+
+
+@pytest.mark.parametrize("size", BAD_SIZES)
+def test_pool_answers_bad_image_size_and_stops_reading(size, monkeypatch):
+    responses = run_pool_stdio(lines({"id": 1, "cmd": "ping"}, {"id": 2, "image_size": size})
+                               + lines({"id": 3, "cmd": "ping"}), monkeypatch)
+    assert responses[0] == {"id": 1, "ok": True}
+    assert responses[1]["id"] == 2 and "image_size" in responses[1]["error"]
+    assert len(responses) == 2
@@ -0,0 +1,133 @@
+# pyright: reportMissingImports=false
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Serving Export Parity Check
+# ============================================================
+#
+# Usage:
+#   python verify_serving_export.py efficientnetb3_serving --data final_dataset/test
+#   python verify_serving_export.py efficientnetb3_serving --data splits.csv --limit 500
+#
+# Compares the bytes-in SavedModel written by TrainingModel/export_serving.py
+# with what the live predictor returns (predictor.predict_breed on the
+# same files). Reports top-1 agreement, identical top-k ranking, the
+# largest confidence difference and the throughput of both paths. Exits
+# non-zero when top-1 agreement is below --min-agreement.
+#
+# In-graph decode/resize is not bit-identical to PIL (and the predictor
+# uses JPEG draft decoding when PREDICTOR_FAST_DECODE=1), so small
+# confidence differences are expected; the labels and the ranking are
+# what must hold.
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from compare_runtimes import labelled_images
+from runtimes import sidecar_path
+
+
+def load_export(export_dir):
+    import tensorflow as tf
+
+    with open(sidecar_path(export_dir.rstrip("/\\")), encoding="utf-8") as f:
+        meta = json.load(f)
+    serve = tf.saved_model.load(export_dir).signatures["serving_default"]
+    return serve, meta
+
+
+def run_export(serve, paths, batch_size):
+    import tensorflow as tf
+
+    indices, scores = [], []
+    start = time.perf_counter()
+    for offset in range(0, len(paths), batch_size):
+        blobs = []
+        for path in paths[offset:offset + batch_size]:
+            with open(path, "rb") as f:
+                blobs.append(f.read())
+        out = serve(images=tf.constant(blobs))
+        indices.append(out["indices"].numpy())
+        scores.append(out["scores"].numpy())
+    return np.concatenate(indices), np.concatenate(scores), time.perf_counter() - start
+
+
+def run_predictor(paths, top_k):
+    import predictor
+
+    predictor.load()
+    results = []
+    start = time.perf_counter()
+    for path in paths:
+        results.append(predictor.predict_breed(path, top_k))
+    return predictor.class_labels, results, time.perf_counter() - start
+
+
+def compare(labels, export_indices, export_scores, reference, top_k):
+    top1 = same_ranking = 0
+    max_diff = 0.0
+    diffs = []
+    for row_idx, row_scores, ref in zip(export_indices, export_scores, reference):
+        names = [labels[i] for i in row_idx[:top_k]]
+        ref_names = [breed for breed, _ in ref]
+        top1 += int(names[0] == ref_names[0])
+        same_ranking += int(names == ref_names)
+        # predictor confidences are percentages; the export returns 0..1
+        diff = abs(float(row_scores[0]) * 100.0 - ref[0][1])
+        diffs.append(diff)
+        max_diff = max(max_diff, diff)
+    n = len(reference)
+    return {
+        "images": n,
+        "top1_agreement": top1 / n if n else 0.0,
+        "topk_same_ranking": same_ranking / n if n else 0.0,
+        "top1_confidence_diff_pp_mean": float(np.mean(diffs)) if diffs else 0.0,
+        "top1_confidence_diff_pp_max": max_diff,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a bytes-in SavedModel export against predict_breed")
+    parser.add_argument("export_dir")
+    parser.add_argument("--data", default="final_dataset/test", help="image folder or split index .csv")
+    parser.add_argument("--split", default="test", help="split to use when --data is an index")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--min-agreement", type=float, default=0.99, help="required top-1 agreement")
+    parser.add_argument("-o", "--output", default=None, help="optional JSON report")
+    args = parser.parse_args()
+
+    paths = [path for path, _ in labelled_images(args.data, args.limit, args.split)]
+    if not paths:
+        raise SystemExit(f"No images found in {args.data}")
+
+    serve, meta = load_export(args.export_dir)
+    top_k = min(args.top_k, meta.get("top_k", args.top_k))
+    labels, reference, predictor_seconds = run_predictor(paths, top_k)
+    if list(meta["labels"]) != list(labels):
+        raise SystemExit("❌ Export labels differ from the predictor's label table")
+
+    export_indices, export_scores, export_seconds = run_export(serve, paths, args.batch_size)
+    report = compare(labels, export_indices, export_scores, reference, top_k)
+    report["predictor_images_per_sec"] = len(paths) / predictor_seconds
+    report["export_images_per_sec"] = len(paths) / export_seconds
+    report["export_batch_size"] = args.batch_size
+
+    print(f"\n📊 {report['images']} images")
+    print(f"   top-1 agreement:        {report['top1_agreement'] * 100:.2f}%")
+    print(f"   same top-{top_k} ranking:     {report['topk_same_ranking'] * 100:.2f}%")
+    print(f"   top-1 confidence diff:  mean {report['top1_confidence_diff_pp_mean']:.2f} pp, "
+          f"max {report['top1_confidence_diff_pp_max']:.2f} pp")
+    print(f"   predict_breed:          {report['predictor_images_per_sec']:.1f} img/s (one image per call)")
+    print(f"   export:                 {report['export_images_per_sec']:.1f} img/s (batches of {args.batch_size})")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if report["top1_agreement"] < args.min_agreement:
+        print(f"❌ Top-1 agreement below {args.min_agreement * 100:.1f}%")
+        sys.exit(1)
+    print("✅ Export matches the predictor")
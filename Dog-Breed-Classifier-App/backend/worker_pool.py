@@ -0,0 +1,536 @@
+# ============================================================
+# 🐶 DOG BREED CLASSIFIER - Predictor Worker Pool Supervisor
+# ============================================================
+#
+# Usage:
+#   python worker_pool.py serve --workers 4 --threads 8           pool on stdin/stdout
+#   python worker_pool.py serve --config pool_config.json         settings from autotune
+#   python worker_pool.py autotune --workers 1 2 4 8 --threads 1 2 4 8 -o pool_config.json
+#   python worker_pool.py memory --workers 4 --shared-weights     unique vs shared memory per worker
+#
+# One TensorFlow process on a many-core box serves batch-1 requests badly:
+# its intra/inter-op pools (and OpenMP/oneDNN underneath) spread each small
+# op over every core and the threads mostly contend. The pool instead runs
+# N `predictor.py --worker --socket ...` processes, each pinned to its own
+# slice of cores, with every thread knob set to that slice:
+#
+#   PREDICTOR_THREADS / TF_NUM_INTRAOP_THREADS / OMP_NUM_THREADS /
+#   MKL_NUM_THREADS = threads, TF_NUM_INTEROP_THREADS = inter_op
+#
+# Requests go to the live worker with the fewest outstanding requests.
+# A worker that exits is restarted (with backoff); requests it held fail
+# with an error instead of hanging.
+#
+# `serve` speaks the predictor's worker protocol on stdin/stdout
+# (image_path, image_b64 and framed image_size requests, ping, stats,
+# shutdown), so app.js can spawn it in place of a single predictor
+# (PREDICTOR_POOL=1).
+#
+# `autotune` starts the pool for every workers x threads combination that
+# fits the cores this process may use, drives it with concurrent framed
+# requests from --data, and writes the combination with the best
+# throughput (optionally under a p95 latency cap) to a JSON config.
+#
+# Every worker loads its own copy of the model, so memory grows with the
+# worker count. --shared-weights starts the workers with
+# PREDICTOR_SHARED_WEIGHTS=1: with the tflite runtime the weights then stay
+# in the read-only mapping of the model file, which the kernel shares
+# between all workers (see runtimes.py). Forking workers from one process
+# after loading is not an option: TensorFlow's thread pools do not survive
+# fork. `memory` starts the pool, pushes some requests through it so every
+# worker has allocated its buffers, and prints each worker's unique and
+# shared memory and its real total (see memory_report.py); the `stats`
+# command takes {"memory": true} for the same numbers on a live pool.
+
+import argparse
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+
+import memory_report
+from predictor import framed_size
+from runtimes import RUNTIMES
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 30.0
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def partition_cores(cores, workers, threads):
+    """Core list per worker; slices wrap around when workers x threads exceeds the cores."""
+    return [[cores[(i * threads + j) % len(cores)] for j in range(threads)] for i in range(workers)]
+
+
+def thread_env(threads, inter_op):
+    return {
+        "PREDICTOR_THREADS": str(threads),
+        "TF_NUM_INTRAOP_THREADS": str(threads),
+        "TF_NUM_INTEROP_THREADS": str(inter_op),
+        "OMP_NUM_THREADS": str(threads),
+        "MKL_NUM_THREADS": str(threads),
+        "OPENBLAS_NUM_THREADS": str(threads),
+    }
+
+# ------------------------------------------------------------
+# ✅ One Worker Process
+# ------------------------------------------------------------
+class Worker:
+    def __init__(self, slot, cores, threads, inter_op, socket_dir, worker_args=(), shared_weights=False):
+        self.slot = slot
+        self.cores = cores
+        self.threads = threads
+        self.inter_op = inter_op
+        self.socket_path = os.path.join(socket_dir, f"predictor-{os.getpid()}-{slot}.sock")
+        self.worker_args = list(worker_args)
+        self.shared_weights = shared_weights
+        self.model = None
+        self.proc = None
+        self.sock = None
+        self.ready = False
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.restarts = 0
+        self.completed = 0
+
+    def start(self):
+        env = {**os.environ, **thread_env(self.threads, self.inter_op)}
+        env.setdefault("KMP_BLOCKTIME", "1")   # do not spin OpenMP threads between small requests
+        if self.shared_weights:
+            env["PREDICTOR_SHARED_WEIGHTS"] = "1"
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.proc = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, "predictor.py"), "--worker", "--socket", self.socket_path,
+             *self.worker_args],
+            cwd=HERE, env=env, stdout=subprocess.PIPE)
+        try:
+            if hasattr(os, "sched_setaffinity"):
+                # Pinned from here rather than with preexec_fn, which is not
+                # safe while other threads run (WorkerPool.start spawns from a
+                # thread pool). The child is still importing, and the threads
+                # it starts later inherit the mask.
+                os.sched_setaffinity(self.proc.pid, set(self.cores))
+            line = self.proc.stdout.readline()   # {"ready": true, ...} once the model is warm
+            if not line:
+                raise RuntimeError(f"worker {self.slot} exited during startup ({self.proc.wait()})")
+            ready = json.loads(line)
+            self.startup = ready.get("startup")
+            self.model = ready.get("model")
+            threading.Thread(target=self._drain_stdout, args=(self.proc.stdout,), daemon=True).start()
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.connect(self.socket_path)
+            self.reader = self.sock.makefile("rb")
+        except BaseException:
+            # Never leave a half-started child behind: the supervisor waits on it
+            self._kill()
+            raise
+        self.ready = True
+        threading.Thread(target=self._read_responses, name=f"worker-{self.slot}-reader", daemon=True).start()
+
+    def _kill(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.proc.kill()
+        self.proc.wait()
+
+    @staticmethod
+    def _drain_stdout(stdout):
+        # Nothing else is expected on stdout; pass it on so the pipe never fills
+        for line in stdout:
+            sys.stderr.buffer.write(line)
+            sys.stderr.flush()
+
+    def _read_responses(self):
+        for line in self.reader:
+            try:
+                response = json.loads(line)
+            except ValueError:
+                continue
+            with self.lock:
+                future = self.pending.pop(response.get("id"), None)
+            if future is not None:
+                self.completed += 1
+                future.set_result(response)
+
+    def send(self, request_id, request, payload=None):
+        future = Future()
+        message = {**request, "id": request_id}
+        if payload is not None:
+            message["image_size"] = len(payload)
+        data = json.dumps(message).encode("utf-8") + b"\n"
+        with self.lock:
+            if not self.ready:
+                raise ConnectionError(f"worker {self.slot} is not running")
+            self.pending[request_id] = future
+            try:
+                self.sock.sendall(data)
+                if payload is not None:
+                    self.sock.sendall(payload)
+            except OSError:
+                self.pending.pop(request_id, None)
+                raise
+        return future
+
+    def fail_pending(self, reason):
+        with self.lock:
+            self.ready = False
+            pending, self.pending = self.pending, {}
+        for request_id, future in pending.items():
+            future.set_result({"id": request_id, "error": reason})
+
+    def stop(self, timeout=10):
+        if self.proc is None or self.proc.poll() is not None:
+            return
+        try:
+            self.send(0, {"cmd": "shutdown"}).result(timeout)
+        except Exception:
+            self.proc.terminate()
+        try:
+            self.proc.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+    def info(self):
+        return {"slot": self.slot, "pid": self.proc.pid if self.proc else None, "ready": self.ready,
+                "cores": self.cores, "threads": self.threads, "inter_op": self.inter_op,
+                "pending": len(self.pending), "completed": self.completed, "restarts": self.restarts}
+
+    def memory(self):
+        if self.proc is None or self.proc.poll() is not None:
+            return None
+        return memory_report.process_memory(self.proc.pid, self.model)
+
+# ------------------------------------------------------------
+# ✅ Pool
+# ------------------------------------------------------------
+class WorkerPool:
+    def __init__(self, workers=2, threads=None, inter_op=1, cores=None, socket_dir="/tmp", worker_args=(),
+                 shared_weights=False):
+        cores = cores or available_cores()
+        threads = threads or max(1, len(cores) // workers)
+        if workers * threads > len(cores):
+            print(f"⚠️ {workers} workers x {threads} threads > {len(cores)} cores; slices will overlap",
+                  file=sys.stderr)
+        self.workers = [Worker(i, slice_, threads, inter_op, socket_dir, worker_args, shared_weights)
+                        for i, slice_ in enumerate(partition_cores(cores, workers, threads))]
+        self._ids = itertools.count(1)
+        self._closing = False
+
+    def start(self):
+        # Workers load their models in parallel
+        try:
+            with ThreadPoolExecutor(len(self.workers)) as pool:
+                list(pool.map(lambda w: w.start(), self.workers))
+        except BaseException:
+            for worker in self.workers:
+                worker.stop()
+            raise
+        for worker in self.workers:
+            threading.Thread(target=self._supervise, args=(worker,), name=f"worker-{worker.slot}-supervisor",
+                             daemon=True).start()
+        return self
+
+    def _supervise(self, worker):
+        delay = RESTART_DELAY
+        while not self._closing:
+            code = worker.proc.wait()
+            worker.fail_pending(f"predictor worker {worker.slot} exited with code {code}")
+            if self._closing:
+                return
+            print(f"⚠️ Predictor worker {worker.slot} exited ({code}), restarting in {delay:.0f}s...",
+                  file=sys.stderr)
+            time.sleep(delay)
+            try:
+                worker.start()
+                worker.restarts += 1
+                delay = RESTART_DELAY
+            except Exception as e:
+                print(f"❌ Restarting worker {worker.slot} failed: {e}", file=sys.stderr)
+                delay = min(delay * 2, MAX_RESTART_DELAY)
+
+    def pick(self):
+        live = [w for w in self.workers if w.ready]
+        if not live:
+            return None
+        return min(live, key=lambda w: len(w.pending))
+
+    def submit(self, request, payload=None):
+        """Send one predict request to the least loaded worker; returns a Future of its response dict."""
+        worker = self.pick()
+        if worker is None:
+            future = Future()
+            future.set_result({"error": "No predictor worker available"})
+            return future
+        try:
+            return worker.send(next(self._ids), request, payload)
+        except OSError as e:
+            future = Future()
+            future.set_result({"error": f"worker {worker.slot} unavailable: {e}"})
+            return future
+
+    def stats(self, memory=False):
+        stats = {"workers": [w.info() for w in self.workers]}
+        if memory:
+            reports = [w.memory() for w in self.workers]
+            for info, report in zip(stats["workers"], reports):
+                info["memory"] = report
+            stats["memory"] = memory_report.totals([r for r in reports if r is not None])
+        return stats
+
+    def close(self):
+        self._closing = True
+        with ThreadPoolExecutor(len(self.workers)) as pool:
+            list(pool.map(lambda w: w.stop(), self.workers))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ------------------------------------------------------------
+# ✅ serve: worker protocol on stdin/stdout
+# ------------------------------------------------------------
+def serve_stdio(pool):
+    write_lock = threading.Lock()
+
+    def respond(response):
+        with write_lock:
+            sys.stdout.write(json.dumps(response) + "\n")
+            sys.stdout.flush()
+
+    def forward(client_id, future):
+        future.add_done_callback(lambda f: respond({**f.result(), "id": client_id}))
+
+    respond({"ready": True, "pid": os.getpid(), "pool": pool.stats()["workers"]})
+    reader = sys.stdin.buffer
+    for line in iter(reader.readline, b""):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            respond({"id": None, "error": f"invalid JSON: {e}"})
+            continue
+        if not isinstance(request, dict):
+            respond({"id": None, "error": "request must be a JSON object"})
+            continue
+        payload = None
+        if "image_size" in request:
+            try:
+                size = framed_size(request)
+            except ValueError as e:
+                respond({"id": request.get("id"), "error": str(e)})
+                break
+            del request["image_size"]
+            payload = reader.read(size)
+            if len(payload) < size:
+                respond({"id": request.get("id"), "error": f"stream ended after {len(payload)} of {size} image bytes"})
+                break
+        cmd = request.get("cmd", "predict")
+        if cmd == "ping":
+            respond({"id": request.get("id"), "ok": True})
+        elif cmd == "stats":
+            respond({"id": request.get("id"), "stats": pool.stats(bool(request.get("memory")))})
+        elif cmd == "shutdown":
+            respond({"id": request.get("id"), "ok": True})
+            return
+        elif cmd == "predict":
+            forward(request.get("id"), pool.submit(request, payload))
+        else:
+            respond({"id": request.get("id"), "error": f"unknown cmd '{cmd}'"})
+
+# ------------------------------------------------------------
+# ✅ autotune
+# ------------------------------------------------------------
+def load_test(pool, images, concurrency, seconds, warmup=2.0):
+    """Closed-loop load: `concurrency` clients each keep one framed request in flight."""
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + warmup + seconds
+    measure_from = time.perf_counter() + warmup
+
+    def client(offset):
+        nonlocal errors
+        i = offset
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            response = pool.submit({"top_k": 3}, images[i % len(images)]).result()
+            elapsed = time.perf_counter() - t0
+            i += concurrency
+            if t0 < measure_from:
+                continue
+            with lock:
+                if "error" in response:
+                    errors += 1
+                else:
+                    latencies.append(elapsed * 1000.0)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {
+        "images_per_sec": len(latencies) / seconds,
+        "latency_ms_p50": float(np.percentile(latencies, 50)) if latencies else None,
+        "latency_ms_p95": float(np.percentile(latencies, 95)) if latencies else None,
+        "errors": errors,
+    }
+
+
+def read_images(data, limit, split):
+    from compare_runtimes import labelled_images
+
+    images = []
+    for path, _ in labelled_images(data, limit, split):
+        with open(path, "rb") as f:
+            images.append(f.read())
+    if not images:
+        raise SystemExit(f"No images found in {data}")
+    return images
+
+
+def autotune(args):
+    images = read_images(args.data, args.limit, args.split)
+
+    cores = available_cores()
+    results = []
+    for workers, threads in itertools.product(args.workers, args.threads):
+        if workers * threads > len(cores):
+            continue
+        concurrency = args.concurrency or 2 * workers
+        print(f"⏱️  workers={workers} threads={threads} concurrency={concurrency} ...", flush=True)
+        try:
+            # Repeated test images must not be answered from the prediction cache
+            worker_args = ["--cache-size", "0", *args.worker_args]
+            with WorkerPool(workers, threads, args.inter_op, cores, worker_args=worker_args,
+                            shared_weights=args.shared_weights) as pool:
+                result = load_test(pool, images, concurrency, args.seconds)
+        except Exception as e:
+            print(f"❌ failed: {e}")
+            continue
+        results.append({"workers": workers, "threads": threads, "inter_op": args.inter_op,
+                        "concurrency": concurrency, **result})
+        print(f"   {result['images_per_sec']:.1f} img/s, p50 {result['latency_ms_p50'] or 0:.1f} ms, "
+              f"p95 {result['latency_ms_p95'] or 0:.1f} ms, errors {result['errors']}")
+
+    eligible = [r for r in results if not r["errors"] and r["latency_ms_p95"] is not None
+                and (args.max_p95_ms is None or r["latency_ms_p95"] <= args.max_p95_ms)]
+    if not eligible:
+        raise SystemExit("No configuration met the constraints.")
+    best = max(eligible, key=lambda r: r["images_per_sec"])
+    config = {"workers": best["workers"], "threads": best["threads"], "inter_op": best["inter_op"],
+              "cores": len(cores), "host": socket.gethostname(), "results": results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    print(f"\n✅ Best: {best['workers']} workers x {best['threads']} threads "
+          f"({best['images_per_sec']:.1f} img/s, p95 {best['latency_ms_p95']:.1f} ms) → {args.output}")
+
+# ------------------------------------------------------------
+# ✅ memory
+# ------------------------------------------------------------
+def measure_memory(args):
+    images = read_images(args.data, args.limit, args.split)
+    with WorkerPool(args.workers, args.threads, args.inter_op or 1, worker_args=args.worker_args,
+                    shared_weights=args.shared_weights) as pool:
+        # Buffers and arenas are sized on first use; measure after some traffic
+        load_test(pool, images, 2 * args.workers, args.seconds, warmup=0.0)
+        stats = pool.stats(memory=True)
+    reports = [w["memory"] for w in stats["workers"] if w["memory"] is not None]
+    print(f"\n🧠 {args.workers} workers, shared weights {'on' if args.shared_weights else 'off'}")
+    memory_report.print_report(reports)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"shared_weights": args.shared_weights, "workers": stats["workers"],
+                       "totals": stats["memory"]}, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Supervise a pool of pinned predictor workers")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="run the pool behind the worker protocol on stdin/stdout")
+    serve.add_argument("--config", help="JSON written by autotune (workers, threads, inter_op)")
+    serve.add_argument("--workers", type=int, default=None)
+    serve.add_argument("--threads", type=int, default=None, help="threads per worker (default: cores / workers)")
+    serve.add_argument("--inter-op", type=int, default=None)
+    serve.add_argument("--shared-weights", action="store_true",
+                       help="workers share one read-only copy of the weights (tflite runtime)")
+
+    tune = sub.add_parser("autotune", help="benchmark workers x threads and write the best config")
+    tune.add_argument("--data", default="final_dataset/test", help="image folder or split index .csv")
+    tune.add_argument("--split", default="test")
+    tune.add_argument("--limit", type=int, default=200)
+    tune.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    tune.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    tune.add_argument("--inter-op", type=int, default=1)
+    tune.add_argument("--concurrency", type=int, default=None, help="clients in flight (default: 2 x workers)")
+    tune.add_argument("--seconds", type=float, default=15.0, help="measured seconds per combination")
+    tune.add_argument("--max-p95-ms", type=float, default=None, help="ignore combinations slower than this")
+    tune.add_argument("--shared-weights", action="store_true")
+    tune.add_argument("-o", "--output", default="pool_config.json")
+
+    mem = sub.add_parser("memory", help="report unique vs shared memory per worker under load")
+    mem.add_argument("--data", default="final_dataset/test", help="image folder or split index .csv")
+    mem.add_argument("--split", default="test")
+    mem.add_argument("--limit", type=int, default=50)
+    mem.add_argument("--workers", type=int, default=4)
+    mem.add_argument("--threads", type=int, default=None)
+    mem.add_argument("--inter-op", type=int, default=None)
+    mem.add_argument("--seconds", type=float, default=5.0, help="traffic before measuring")
+    mem.add_argument("--shared-weights", action="store_true")
+    mem.add_argument("-o", "--output", default=None, help="optional JSON report")
+
+    for p in (serve, tune, mem):
+        p.add_argument("worker_args", nargs=argparse.REMAINDER,
+                       help="extra predictor.py arguments after --, e.g. -- --max-batch-size 8")
+    args = parser.parse_args()
+    args.worker_args = [a for a in args.worker_args if a != "--"]
+    # Workers read the runtime from the environment; refuse here rather than
+    # let every one of them fail at load and be restarted forever
+    runtime = os.environ.get("PREDICTOR_RUNTIME", "keras")
+    if args.shared_weights and not (runtime in RUNTIMES and RUNTIMES[runtime].can_share_weights):
+        parser.error(f"--shared-weights needs PREDICTOR_RUNTIME=tflite (workers would use '{runtime}')")
+
+    if args.command == "autotune":
+        autotune(args)
+        sys.exit(0)
+    if args.command == "memory":
+        measure_memory(args)
+        sys.exit(0)
+
+    config = {"workers": 2, "threads": None, "inter_op": 1}
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            config.update({k: v for k, v in json.load(f).items() if k in config})
+    for key in config:
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+
+    pool = WorkerPool(config["workers"], config["threads"], config["inter_op"], worker_args=args.worker_args,
+                      shared_weights=args.shared_weights)
+    try:
+        pool.start()
+        serve_stdio(pool)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
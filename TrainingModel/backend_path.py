@@ -0,0 +1,19 @@
+import os
+import sys
+
+# ============================================================
+# 🧩 Makes the serving modules importable from TrainingModel
+# ============================================================
+# Training reuses a few backend helpers (bundle metadata, label order from
+# the dataset index) rather than keeping copies that drift apart:
+#
+#   import backend_path  # noqa: F401
+#   from model_bundle import read_metadata
+#
+# The backend folder is appended, so modules here win on a name clash.
+
+BACKEND_DIR = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "Dog-Breed-Classifier-App", "backend"))
+
+if BACKEND_DIR not in sys.path:
+    sys.path.append(BACKEND_DIR)
@@ -9,15 +9,20 @@ from PIL import Image
 # ============================================================
 base_dir = "final_dataset"          # same folder as in training
 model_path = "efficientnetb3_clean_rgb.h5"   # your trained model
+labels_path = "breed_labels.txt"             # ordered label table
 
 train_dir = os.path.join(base_dir, "train")
-if not os.path.exists(train_dir):
-    raise FileNotFoundError(f"Train folder not found: {train_dir}")
 
 # ============================================================
 # ✅ Load class names
 # ============================================================
-breed_labels = sorted(os.listdir(train_dir))
+if os.path.exists(labels_path):
+    with open(labels_path, encoding="utf-8") as f:
+        breed_labels = [line.strip() for line in f if line.strip()]
+elif os.path.exists(train_dir):
+    breed_labels = sorted(os.listdir(train_dir))
+else:
+    raise FileNotFoundError(f"Neither {labels_path} nor train folder {train_dir} found")
 print(f"Loaded {len(breed_labels)} class labels.")
 print("Example breeds:", breed_labels[:5])
 
@@ -0,0 +1,214 @@
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.layers import Dense, Dropout, GlobalAveragePooling2D, Input
+from tensorflow.keras.models import Model
+
+from feature_cache import hash_paths
+from index_dataset import image_dataset
+
+# ============================================================
+# 🧩 Knowledge distillation into a smaller, CPU-friendly student
+# ============================================================
+# The teacher (the served EfficientNetB3) runs once over each split and
+# its log-probabilities are stored next to the dataset:
+#
+#   <cache_dir>/<split>_teacher.npy         float16 (images, classes)
+#   <cache_dir>/<split>_teacher_labels.npy  int32   (images,)
+#   <cache_dir>/<split>_teacher_meta.json   written last; marks the cache complete
+#
+# The student is then trained on the same images at its own input size
+# against both the true label and the teacher's softened distribution.
+# Labels and the teacher targets travel together in y_true
+# ([one-hot | teacher log-probs]), so the student stays a plain softmax
+# model: ModelCheckpoint/EarlyStopping work unchanged and the saved .h5
+# loads in the predictor like the teacher does.
+#
+# Teacher targets come from the plain (unaugmented) image, so the student
+# only gets a horizontal flip, which leaves the teacher's answer unchanged.
+
+STUDENTS = {
+    # Both include their own input rescaling and take 0..255 pixels, which is
+    # what the predictor's "efficientnet" (pass-through) preprocessing feeds
+    "efficientnetb0": lambda x: tf.keras.applications.EfficientNetB0(
+        include_top=False, weights='imagenet', input_tensor=x),
+    "mobilenetv3large": lambda x: tf.keras.applications.MobileNetV3Large(
+        include_top=False, weights='imagenet', input_tensor=x, include_preprocessing=True),
+    "mobilenetv3small": lambda x: tf.keras.applications.MobileNetV3Small(
+        include_top=False, weights='imagenet', input_tensor=x, include_preprocessing=True),
+}
+
+
+def build_student(arch, num_classes, img_size=(224, 224)):
+    base_input = Input(shape=(img_size[0], img_size[1], 3))
+    x = tf.keras.layers.RandomFlip("horizontal", name="data_augmentation")(base_input)
+    backbone = STUDENTS[arch](x)
+    x = GlobalAveragePooling2D()(backbone.output)
+    x = Dropout(0.2)(x)
+    output = Dense(num_classes, activation='softmax', dtype='float32')(x)
+    return Model(inputs=base_input, outputs=output, name=f"{arch}_student")
+
+# ============================================================
+# 🧩 Teacher cache
+# ============================================================
+def _teacher_id(teacher_path):
+    stat = os.stat(teacher_path)
+    return {"teacher": os.path.basename(teacher_path), "teacher_size": stat.st_size,
+            "teacher_mtime_ns": stat.st_mtime_ns}
+
+
+def build_teacher_cache(teacher_path, data_dir, cache_dir, split, batch_size=32):
+    """
+    Teacher log-probabilities for every image of `data_dir` (a split
+    folder, or a split index .csv read for `split`), in the sorted order
+    image_dataset_from_directory lists them. Returns
+    (log_probs, labels, file_paths, class_names). An existing cache is
+    reused when it matches the file list and the teacher file, in which
+    case the teacher is not even loaded.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    logits_path = os.path.join(cache_dir, f"{split}_teacher.npy")
+    labels_path = os.path.join(cache_dir, f"{split}_teacher_labels.npy")
+    meta_path = os.path.join(cache_dir, f"{split}_teacher_meta.json")
+
+    # Listing only (nothing is decoded); the teacher's input size is applied below
+    _, file_paths, class_names = image_dataset(data_dir, split, (256, 256), batch_size)
+    meta = {"files": len(file_paths), "files_fingerprint": hash_paths(file_paths),
+            "class_names": class_names, **_teacher_id(teacher_path)}
+
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            if json.load(f) == meta:
+                print(f"✅ Reusing {split} teacher outputs ({meta['files']} images)")
+                return np.load(logits_path), np.load(labels_path), file_paths, class_names
+        os.remove(meta_path)
+
+    teacher = tf.keras.models.load_model(teacher_path, compile=False)
+    teacher_size = tuple(teacher.input_shape[1:3])
+    if teacher.output_shape[-1] != len(class_names):
+        raise ValueError(f"teacher outputs {teacher.output_shape[-1]} classes but {data_dir} has {len(class_names)}")
+    dataset, _, _ = image_dataset(data_dir, split, teacher_size, batch_size)
+
+    @tf.function
+    def teacher_log_probs(images):
+        probs = tf.cast(teacher(images, training=False), tf.float32)
+        return tf.math.log(tf.clip_by_value(probs, 1e-7, 1.0))
+
+    print(f"🧩 Caching {split} teacher outputs: {meta['files']} images → {logits_path}")
+    log_probs = np.empty((meta["files"], len(class_names)), dtype=np.float16)
+    labels = np.empty(meta["files"], dtype=np.int32)
+    start = time.perf_counter()
+    offset = 0
+    for images, batch_labels in dataset.prefetch(tf.data.AUTOTUNE):
+        n = len(batch_labels)
+        log_probs[offset:offset + n] = teacher_log_probs(images).numpy()
+        labels[offset:offset + n] = batch_labels.numpy()
+        offset += n
+    print(f"   done in {time.perf_counter() - start:.0f}s")
+
+    np.save(logits_path, log_probs)
+    np.save(labels_path, labels)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return log_probs, labels, file_paths, class_names
+
+
+def distillation_dataset(file_paths, labels, teacher_log_probs, img_size, batch_size=32, shuffle=False, seed=42):
+    """(image, [one-hot | teacher log-probs]) batches at the student's input size."""
+    num_classes = teacher_log_probs.shape[1]
+    targets = np.concatenate([np.eye(num_classes, dtype=np.float32)[labels],
+                              teacher_log_probs.astype(np.float32)], axis=1)
+
+    def load(path, target):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        return tf.image.resize(image, img_size, method="bilinear"), target
+
+    ds = tf.data.Dataset.from_tensor_slices((list(file_paths), targets))
+    if shuffle:
+        ds = ds.shuffle(len(file_paths), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.map(load, num_parallel_calls=tf.data.AUTOTUNE).batch(batch_size)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+# ============================================================
+# 🧩 Loss / metric on packed targets
+# ============================================================
+def distillation_loss(num_classes, temperature=4.0, alpha=0.3, label_smoothing=0.1):
+    """alpha * CE(labels) + (1 - alpha) * T² * KL(teacher_T || student_T).
+
+    The student outputs probabilities; softmax(log p / T) equals
+    softmax(logits / T), so temperature scaling works on them directly.
+    """
+    ce = tf.keras.losses.CategoricalCrossentropy(label_smoothing=label_smoothing)
+
+    def loss(y_true, y_pred):
+        y_pred = tf.cast(y_pred, tf.float32)
+        one_hot, teacher = y_true[:, :num_classes], y_true[:, num_classes:]
+        student_log_t = tf.nn.log_softmax(tf.math.log(tf.clip_by_value(y_pred, 1e-7, 1.0)) / temperature)
+        teacher_t = tf.nn.softmax(teacher / temperature)
+        kl = tf.reduce_sum(teacher_t * (tf.nn.log_softmax(teacher / temperature) - student_log_t), axis=-1)
+        return alpha * ce(one_hot, y_pred) + (1.0 - alpha) * temperature ** 2 * tf.reduce_mean(kl)
+
+    loss.__name__ = "distillation_loss"
+    return loss
+
+
+def distillation_accuracy(num_classes):
+    def accuracy(y_true, y_pred):
+        return tf.keras.metrics.categorical_accuracy(y_true[:, :num_classes], y_pred)
+    return accuracy
+
+# ============================================================
+# 🧩 Accuracy vs latency
+# ============================================================
+def cpu_latency_ms(model, img_size, runs=50, batch_size=1):
+    """p50/p95 CPU latency of one forward pass, as the predictor sees it."""
+    x = tf.random.uniform((batch_size, img_size[0], img_size[1], 3), 0, 255)
+    with tf.device('/CPU:0'):
+        infer = tf.function(lambda images: model(images, training=False))
+        infer(x)  # trace + warm-up
+        times = []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            infer(x).numpy()
+            times.append((time.perf_counter() - t0) * 1000.0)
+    return {"p50_ms": float(np.percentile(times, 50)), "p95_ms": float(np.percentile(times, 95))}
+
+
+def compare_models(entries, test_dir, out_path, batch_size=32, runs=50):
+    """entries: {name: model_path}; writes test accuracy, latency and size per model.
+
+    `test_dir` is the test folder or a split index .csv.
+    """
+    report = {}
+    for name, path in entries.items():
+        model = tf.keras.models.load_model(path, compile=False)
+        img_size = tuple(model.input_shape[1:3])
+        test, _, _ = image_dataset(test_dir, 'test', img_size, batch_size, label_mode='categorical')
+        model.compile(metrics=['accuracy'], loss='categorical_crossentropy')
+        _, accuracy = model.evaluate(test.prefetch(tf.data.AUTOTUNE), verbose=0)
+        report[name] = {"model": os.path.basename(path), "input_size": list(img_size),
+                        "params": int(model.count_params()), "file_mb": round(os.path.getsize(path) / 1e6, 1),
+                        "test_accuracy": float(accuracy), **cpu_latency_ms(model, img_size, runs)}
+
+    print(f"\n{'model':<12} {'input':>9} {'params':>11} {'MB':>7} {'test acc':>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, r in report.items():
+        print(f"{name:<12} {'x'.join(map(str, r['input_size'])):>9} {r['params']:>11,} {r['file_mb']:>7.1f} "
+              f"{r['test_accuracy'] * 100:>8.2f}% {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Comparison written to {out_path}")
+    return report
+
+
+def write_sidecar(model_path, class_names, img_size, teacher_path):
+    """<model>.json with the labels and input settings backend/runtimes.py reads."""
+    meta = {"labels": list(class_names), "input_size": [img_size[1], img_size[0]],   # (width, height)
+            "color_mode": "rgb", "preprocessing": "efficientnet",
+            "source": os.path.basename(model_path), "teacher": os.path.basename(teacher_path)}
+    sidecar = os.path.splitext(model_path)[0] + ".json"
+    with open(sidecar, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return sidecar
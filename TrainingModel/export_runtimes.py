@@ -0,0 +1,122 @@
+import argparse
+import json
+import os
+import random
+
+import h5py
+import tensorflow as tf
+
+import backend_path  # noqa: F401
+from model_bundle import BUNDLE_ATTR, bundle_metadata, read_labels
+from preprocessing import preprocess
+from runtimes import DEFAULT_METADATA
+
+# ============================================================
+# 🧩 Exports the Keras model to CPU-friendly runtimes
+# ============================================================
+#   fp32 / fp16 / int8  → TensorFlow Lite (int8 calibrated on train images)
+#   onnx                → ONNX (needs `pip install tf2onnx`)
+#
+# Each exported file gets a "<name>.json" sidecar with the ordered labels
+# and input settings, which backend/runtimes.py reads at startup.
+#
+#   python export_runtimes.py efficientnetb3_clean_rgb.h5 --formats fp16 int8 onnx
+
+def read_metadata(model_path, labels_path):
+    """Sidecar metadata: from the bundle when the model is one, else the label file and defaults."""
+    with h5py.File(model_path, "r") as f:
+        if BUNDLE_ATTR in f.attrs:
+            meta = bundle_metadata(f)
+            return {k: meta[k] for k in ("labels", "input_size", "color_mode", "preprocessing")}
+    return {**DEFAULT_METADATA, "labels": read_labels(labels_path)}
+
+
+def load_calibration_image(path, meta):
+    # The serving preprocessing itself, so int8 ranges fit what the predictor feeds the model
+    return preprocess(path, tuple(meta["input_size"]), meta["color_mode"], meta["preprocessing"])
+
+
+def calibration_paths(train_dir, num_samples, seed=42):
+    paths = []
+    for breed in sorted(os.listdir(train_dir)):
+        breed_dir = os.path.join(train_dir, breed)
+        if os.path.isdir(breed_dir):
+            paths += [os.path.join(breed_dir, f) for f in sorted(os.listdir(breed_dir))
+                      if f.lower().endswith((".jpg", ".jpeg", ".png"))]
+    random.Random(seed).shuffle(paths)
+    return paths[:num_samples]
+
+# ============================================================
+# 🧩 Converters
+# ============================================================
+def serving_function(model, input_size):
+    # Fixed inference-mode signature; augmentation layers become no-ops
+    # input_size is (width, height) like PIL
+    @tf.function(input_signature=[tf.TensorSpec([None, input_size[1], input_size[0], 3], tf.float32)])
+    def serve(x):
+        return model(x, training=False)
+    return serve.get_concrete_function()
+
+
+def export_tflite(model, meta, fmt, out_path, calibration=None):
+    converter = tf.lite.TFLiteConverter.from_concrete_functions(
+        [serving_function(model, meta["input_size"])], model)
+    if fmt == "fp16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif fmt == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([img[None, ...]] for img in calibration())
+        # Keep float32 input/output so the runtime interface does not change
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, meta, out_path, opset=13):
+    try:
+        import tf2onnx
+    except ImportError:
+        raise ImportError("ONNX export needs `pip install tf2onnx`")
+    spec = (tf.TensorSpec([None, meta["input_size"][1], meta["input_size"][0], 3], tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=out_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the classifier to TFLite / ONNX")
+    parser.add_argument("model_path", nargs="?", default="efficientnetb3_clean_rgb.h5")
+    parser.add_argument("--labels", default="breed_labels.txt", help="used when the model is not a bundle")
+    parser.add_argument("--formats", nargs="+", choices=["fp32", "fp16", "int8", "onnx"], default=["fp16", "int8"])
+    parser.add_argument("--train-dir", default=os.path.join("final_dataset", "train"),
+                        help="images sampled for int8 calibration")
+    parser.add_argument("--calibration-samples", type=int, default=200)
+    parser.add_argument("--out-dir", default=".")
+    parser.add_argument("--prefix", default="efficientnetb3")
+    args = parser.parse_args()
+
+    meta = read_metadata(args.model_path, args.labels)
+    print("🔍 Loading Keras model...")
+    model = tf.keras.models.load_model(args.model_path, compile=False)
+    if model.output_shape[-1] != len(meta["labels"]):
+        raise ValueError(f"{len(meta['labels'])} labels but the model outputs {model.output_shape[-1]} classes")
+
+    def calibration():
+        for path in calibration_paths(args.train_dir, args.calibration_samples):
+            yield load_calibration_image(path, meta)
+
+    for fmt in args.formats:
+        ext = ".onnx" if fmt == "onnx" else ".tflite"
+        name = args.prefix if fmt == "onnx" else f"{args.prefix}_{fmt}"
+        out_path = os.path.join(args.out_dir, name + ext)
+        try:
+            print(f"⚙️  Exporting {fmt} → {out_path}")
+            if fmt == "onnx":
+                export_onnx(model, meta, out_path)
+            else:
+                export_tflite(model, meta, fmt, out_path, calibration)
+        except Exception as e:
+            print(f"❌ {fmt} export failed: {e}")
+            continue
+        with open(os.path.splitext(out_path)[0] + ".json", "w", encoding="utf-8") as f:
+            json.dump({**meta, "source": os.path.basename(args.model_path), "format": fmt}, f, indent=2)
+        print(f"✅ {out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB)")
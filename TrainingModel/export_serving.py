@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from export_runtimes import read_metadata
+
+# ============================================================
+# 🧩 Inference-only SavedModel: encoded image bytes → top-k
+# ============================================================
+# The trained .h5 still carries everything needed for training: the
+# data_augmentation block, BatchNormalization layers with their moving
+# statistics and the mixed-precision policy. This export rebuilds it for
+# serving only:
+#
+#   - data_augmentation is replaced by an identity
+#   - every BatchNormalization directly after a Conv2D/DepthwiseConv2D is
+#     folded into that convolution's kernel and bias, and the head's
+#     BatchNormalization is folded into the Dense after it (Dropout in
+#     between is an inference no-op)
+#   - all layers run in float32 (float16 is slow on CPU)
+#   - decode (JPEG/PNG/BMP/GIF), colour conversion, resize and the
+#     model's preprocessing run inside the graph
+#
+# The signature takes a batch of encoded images and returns the top-k
+# class indices and probabilities (0..1). Labels and settings go to the
+# usual "<name>.json" sidecar next to the SavedModel directory.
+#
+#   python export_serving.py efficientnetb3_clean_rgb.h5 -o efficientnetb3_serving --top-k 5
+#
+# Check it against the live predictor with backend/verify_serving_export.py.
+
+CONV_LAYERS = (tf.keras.layers.Conv2D, tf.keras.layers.DepthwiseConv2D)
+
+
+def _producer(layer):
+    return layer.input._keras_history.layer
+
+
+def _consumers(layer):
+    return [node.outbound_layer for node in layer._outbound_nodes]
+
+# ============================================================
+# 🧩 BatchNormalization folding plan
+# ============================================================
+def fold_plan(model):
+    """{conv name: bn} and {dense name: bn} for every BN that can be folded away."""
+    into_conv, into_dense = {}, {}
+    for layer in model.layers:
+        if not isinstance(layer, tf.keras.layers.BatchNormalization):
+            continue
+        axis = np.atleast_1d(layer.axis)
+        if len(axis) != 1 or axis[0] not in (-1, len(layer.input.shape) - 1):
+            continue   # only per-channel (last axis) normalisation can be folded
+        producer = _producer(layer)
+        if isinstance(producer, CONV_LAYERS) and len(_consumers(producer)) == 1:
+            into_conv[producer.name] = layer
+            continue
+        # BN → (Dropout)* → Dense: fold the normalisation into the Dense inputs
+        consumer = layer
+        while len(_consumers(consumer)) == 1:
+            consumer = _consumers(consumer)[0]
+            if not isinstance(consumer, tf.keras.layers.Dropout):
+                break
+        if isinstance(consumer, tf.keras.layers.Dense) and consumer is not layer:
+            into_dense[consumer.name] = layer
+    return into_conv, into_dense
+
+
+def _bn_scale_shift(bn):
+    """Per-channel (scale, shift) with bn(x) == x * scale + shift at inference."""
+    mean = bn.moving_mean.numpy().astype(np.float64)
+    var = bn.moving_variance.numpy().astype(np.float64)
+    gamma = bn.gamma.numpy().astype(np.float64) if bn.gamma is not None else np.ones_like(mean)
+    beta = bn.beta.numpy().astype(np.float64) if bn.beta is not None else np.zeros_like(mean)
+    scale = gamma / np.sqrt(var + bn.epsilon)
+    return scale, beta - mean * scale
+
+
+def _folded_conv(conv, bn):
+    depthwise = isinstance(conv, tf.keras.layers.DepthwiseConv2D)
+    kernel = (conv.depthwise_kernel if depthwise else conv.kernel).numpy().astype(np.float64)
+    bias = conv.bias.numpy().astype(np.float64) if conv.use_bias else 0.0
+    scale, shift = _bn_scale_shift(bn)
+    if depthwise:
+        # Output channel c = in_channel * multiplier + m
+        kernel = kernel * scale.reshape(kernel.shape[2], kernel.shape[3])
+    else:
+        kernel = kernel * scale
+    return [kernel.astype(np.float32), (bias * scale + shift).astype(np.float32)]
+
+
+def _folded_dense(dense, bn):
+    kernel = dense.kernel.numpy().astype(np.float64)
+    bias = dense.bias.numpy().astype(np.float64) if dense.use_bias else np.zeros(kernel.shape[1])
+    scale, shift = _bn_scale_shift(bn)
+    return [(kernel * scale[:, None]).astype(np.float32), (bias + shift @ kernel).astype(np.float32)]
+
+# ============================================================
+# 🧩 Inference model
+# ============================================================
+def inference_model(model):
+    """float32 copy of `model` without augmentation and with BatchNormalization folded."""
+    into_conv, into_dense = fold_plan(model)
+    folded_bn = {bn.name for bn in list(into_conv.values()) + list(into_dense.values())}
+
+    def clone_layer(layer):
+        if layer.name == "data_augmentation" or layer.name in folded_bn:
+            return tf.keras.layers.Activation("linear", name=layer.name)
+        config = {**layer.get_config(), "dtype": "float32"}
+        if layer.name in into_conv or layer.name in into_dense:
+            config.update(use_bias=True, bias_initializer="zeros")
+        return layer.__class__.from_config(config)
+
+    clone = tf.keras.models.clone_model(model, clone_function=clone_layer)
+    for layer in clone.layers:
+        source = model.get_layer(layer.name)
+        if layer.name in into_conv:
+            layer.set_weights(_folded_conv(source, into_conv[layer.name]))
+        elif layer.name in into_dense:
+            layer.set_weights(_folded_dense(source, into_dense[layer.name]))
+        elif source.weights and layer.weights:
+            layer.set_weights(source.get_weights())
+    print(f"🧩 Folded {len(into_conv)} BatchNormalization layers into convolutions "
+          f"and {len(into_dense)} into Dense layers")
+    return clone
+
+
+def check_folding(model, clone, input_size, samples=4, seed=0):
+    """Largest probability difference between the original and the inference model."""
+    x = tf.random.stateless_uniform((samples, input_size[1], input_size[0], 3), (seed, 0), 0, 255)
+    original = tf.cast(model(x, training=False), tf.float32).numpy()
+    folded = clone(x, training=False).numpy()
+    return float(np.abs(original - folded).max())
+
+# ============================================================
+# 🧩 Serving signature
+# ============================================================
+def serving_module(model, meta, top_k=5):
+    width, height = meta["input_size"]   # (width, height) like PIL
+    grayscale = meta["color_mode"] == "grayscale"
+    scale_255 = meta["preprocessing"] == "scale_255"
+
+    def decode(data):
+        # Same order as preprocessing.decode: colour conversion, then resize,
+        # then back to whole 0..255 values
+        image = tf.io.decode_image(data, channels=3, expand_animations=False)
+        image.set_shape([None, None, 3])
+        if grayscale:
+            image = tf.image.rgb_to_grayscale(image)
+        image = tf.image.resize(image, (height, width), method="bicubic", antialias=True)
+        image = tf.clip_by_value(tf.round(image), 0.0, 255.0)
+        if grayscale:
+            image = tf.tile(image, [1, 1, 3])
+        if scale_255:
+            image = image / 255.0
+        return image
+
+    module = tf.Module()
+    module.model = model
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string, name="images")])
+    def serve(images):
+        batch = tf.map_fn(decode, images, fn_output_signature=tf.TensorSpec([height, width, 3], tf.float32),
+                          parallel_iterations=16)
+        probs = model(batch, training=False)
+        scores, indices = tf.math.top_k(probs, k=top_k)
+        return {"indices": indices, "scores": scores}
+
+    module.serve = serve
+    return module
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export an inference-only SavedModel taking encoded image bytes")
+    parser.add_argument("model_path", nargs="?", default="efficientnetb3_clean_rgb.h5")
+    parser.add_argument("--labels", default="breed_labels.txt", help="used when the model is not a bundle")
+    parser.add_argument("--color-mode", choices=["grayscale", "rgb"], default=None,
+                        help="override the colour mode from the bundle/defaults")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("-o", "--output", default="efficientnetb3_serving")
+    args = parser.parse_args()
+
+    meta = read_metadata(args.model_path, args.labels)
+    if args.color_mode:
+        meta["color_mode"] = args.color_mode
+    print("🔍 Loading Keras model...")
+    model = tf.keras.models.load_model(args.model_path, compile=False)
+    if model.output_shape[-1] != len(meta["labels"]):
+        raise ValueError(f"{len(meta['labels'])} labels but the model outputs {model.output_shape[-1]} classes")
+
+    clone = inference_model(model)
+    diff = check_folding(model, clone, meta["input_size"])
+    print(f"   max |Δprob| vs the original model: {diff:.2e}")
+
+    module = serving_module(clone, meta, args.top_k)
+    tf.saved_model.save(module, args.output, signatures={"serving_default": module.serve})
+    sidecar = args.output.rstrip("/\\") + ".json"
+    with open(sidecar, "w", encoding="utf-8") as f:
+        json.dump({**meta, "source": os.path.basename(args.model_path), "format": "savedmodel_bytes",
+                   "top_k": args.top_k}, f, indent=2)
+    print(f"✅ {args.output} (labels and settings in {sidecar})")
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.layers import GlobalAveragePooling2D, Input
+from tensorflow.keras.models import Model
+
+from index_dataset import image_dataset
+
+# ============================================================
+# 🧩 Frozen-backbone feature cache for Stage 1 head training
+# ============================================================
+# While the backbone is frozen its output for a given image never
+# changes, so Stage 1 only needs one backbone pass per image (or per
+# fixed augmented view) instead of one per image per epoch. The pooled
+# features go to memory-mapped .npy files:
+#
+#   <cache_dir>/<split>_features.npy   float16 (views, images, features)
+#   <cache_dir>/<split>_labels.npy     int32   (images,)
+#   <cache_dir>/<split>_meta.json      written last; marks the cache complete
+#
+# The head model built by `head_model()` shares its layers with the full
+# model, so training it updates the full model in place and Stage 2
+# fine-tuning continues from the trained head.
+
+
+def _split_layers(model):
+    """Index of the GlobalAveragePooling2D layer separating backbone and head."""
+    for i, layer in enumerate(model.layers):
+        if isinstance(layer, GlobalAveragePooling2D):
+            return i
+    raise ValueError("model has no GlobalAveragePooling2D layer")
+
+
+def feature_extractor(model):
+    """Full model input → pooled backbone features (augmentation inactive)."""
+    return Model(model.input, model.layers[_split_layers(model)].output, name="feature_extractor")
+
+
+def head_model(model):
+    """Features → class probabilities, reusing (not copying) the model's head layers."""
+    gap = model.layers[_split_layers(model)]
+    features = Input(shape=gap.output.shape[1:], name="cached_features")
+    x = features
+    for layer in model.layers[_split_layers(model) + 1:]:
+        x = layer(x)
+    return Model(features, x, name="classifier_head")
+
+
+def _meta(file_paths, class_names, views, extractor):
+    return {
+        "files": len(file_paths),
+        "files_fingerprint": hash_paths(file_paths),
+        "class_names": list(class_names),
+        "views": views,
+        "feature_dim": int(extractor.output.shape[-1]),
+        "input_shape": list(extractor.input.shape[1:]),
+    }
+
+
+def hash_paths(paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(os.path.dirname(path)).encode("utf-8"))
+        digest.update(os.path.basename(path).encode("utf-8"))
+    return digest.hexdigest()
+
+# ============================================================
+# 🧩 Build / Load
+# ============================================================
+def build_feature_cache(model, data_dir, cache_dir, split, img_size, batch_size=32,
+                        views=1, augmentation=None, seed=42):
+    """
+    Run the frozen backbone over `data_dir` (a split folder, or a split
+    index .csv read for `split`) once per view and store the features. View 0 is the plain image; views 1..n-1 pass the batch
+    through `augmentation` first. Returns (features memmap, labels).
+    An existing cache is reused when it matches the file list and settings.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    features_path = os.path.join(cache_dir, f"{split}_features.npy")
+    labels_path = os.path.join(cache_dir, f"{split}_labels.npy")
+    meta_path = os.path.join(cache_dir, f"{split}_meta.json")
+
+    dataset, file_paths, class_names = image_dataset(data_dir, split, img_size, batch_size)
+    extractor = feature_extractor(model)
+    meta = _meta(file_paths, class_names, views, extractor)
+
+    if os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            if json.load(f) == meta:
+                print(f"✅ Reusing {split} feature cache ({meta['files']} images × {views} views)")
+                return np.load(features_path, mmap_mode='r'), np.load(labels_path)
+        os.remove(meta_path)
+
+    print(f"🧩 Caching {split} features: {meta['files']} images × {views} views → {features_path}")
+    features = np.lib.format.open_memmap(
+        features_path, mode='w+', dtype=np.float16, shape=(views, meta["files"], meta["feature_dim"]))
+    labels = np.empty(meta["files"], dtype=np.int32)
+
+    @tf.function
+    def extract(images, augment):
+        if augment:
+            images = augmentation(images, training=True)
+        return extractor(images, training=False)
+
+    tf.random.set_seed(seed)
+    start = time.perf_counter()
+    for view in range(views):
+        offset = 0
+        for images, batch_labels in dataset.prefetch(tf.data.AUTOTUNE):
+            n = len(batch_labels)
+            features[view, offset:offset + n] = extract(images, view > 0 and augmentation is not None).numpy()
+            labels[offset:offset + n] = batch_labels.numpy()
+            offset += n
+        print(f"   view {view + 1}/{views} done ({time.perf_counter() - start:.0f}s)")
+    features.flush()
+    np.save(labels_path, labels)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    del features
+    return np.load(features_path, mmap_mode='r'), labels
+
+
+class CachedFeatureSequence(tf.keras.utils.Sequence):
+    """Batches of cached features; each epoch draws one random view per image."""
+
+    def __init__(self, features, labels, num_classes, batch_size=32, shuffle=True, seed=42):
+        super().__init__()
+        self.features = features
+        self.labels = labels
+        self.num_classes = num_classes
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.rng = np.random.default_rng(seed)
+        self.on_epoch_end()
+
+    def __len__(self):
+        return int(np.ceil(len(self.labels) / self.batch_size))
+
+    def __getitem__(self, index):
+        rows = self.order[index * self.batch_size:(index + 1) * self.batch_size]
+        # Sorted rows keep memmap reads mostly sequential
+        rows = np.sort(rows)
+        x = self.features[self.views[rows], rows].astype(np.float32)
+        y = np.eye(self.num_classes, dtype=np.float32)[self.labels[rows]]
+        return x, y
+
+    def on_epoch_end(self):
+        n = len(self.labels)
+        self.order = self.rng.permutation(n) if self.shuffle else np.arange(n)
+        num_views = self.features.shape[0]
+        self.views = self.rng.integers(0, num_views, n) if self.shuffle else np.zeros(n, dtype=np.int64)
@@ -0,0 +1,108 @@
+import csv
+import os
+import sqlite3
+
+import tensorflow as tf
+
+import backend_path  # noqa: F401
+from runtimes import index_labels  # noqa: F401  (class order from dataset_index.py, shared with serving)
+
+# ============================================================
+# 🧩 tf.data pipeline straight from a split index
+# ============================================================
+# Reads the CSV written by DataCleaning/.../split_index.py (path,breed,split,
+# paths relative to the index file) so training does not need a physical
+# train/val/test folder tree. Batches match image_dataset_from_directory:
+# float32 images resized to img_size and one-hot labels, with classes in
+# sorted breed order.
+#
+# The SQLite database of DataCleaning/.../dataset_index.py (.db) works the
+# same way: files are listed from it instead of walking the folders, which
+# is slow on the Drive mount, and classes are its sorted train breeds.
+
+
+def read_index(index_path):
+    base = os.path.dirname(os.path.abspath(index_path))
+    with open(index_path, newline="", encoding="utf-8") as f:
+        return [(os.path.normpath(os.path.join(base, row["path"])), row["breed"], row["split"])
+                for row in csv.DictReader(f)]
+
+
+def is_db(source):
+    return str(source).lower().endswith(".db")
+
+
+def index_class_names(index_path):
+    if is_db(index_path):
+        return index_labels(index_path)
+    return sorted({breed for _, breed, _ in read_index(index_path)})
+
+
+def db_files(db_path, split):
+    """split_files() for a dataset_index.py database; paths are under the root it indexed."""
+    class_names = index_labels(db_path)
+    class_index = {name: i for i, name in enumerate(class_names)}
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        root = conn.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()[0]
+        rows = conn.execute(
+            "SELECT breed, name FROM files WHERE split = ? ORDER BY breed, name", (split,)).fetchall()
+    finally:
+        conn.close()
+    if not rows:
+        raise ValueError(f"No '{split}' images in {db_path}")
+    unknown = sorted({breed for breed, _ in rows} - class_index.keys())
+    if unknown:
+        raise ValueError(f"'{split}' breeds missing from the train split of {db_path}: {', '.join(unknown)}")
+    paths = [os.path.join(root, split, breed, name) for breed, name in rows]
+    return paths, [class_index[breed] for breed, _ in rows], class_names
+
+
+def split_files(index_path, split):
+    """(paths, int labels, class_names) of one split, in image_dataset_from_directory order."""
+    if is_db(index_path):
+        return db_files(index_path, split)
+    rows = read_index(index_path)
+    class_names = sorted({breed for _, breed, _ in rows})
+    class_index = {name: i for i, name in enumerate(class_names)}
+    selected = sorted((class_index[breed], path) for path, breed, s in rows if s == split)
+    if not selected:
+        raise ValueError(f"No '{split}' images in {index_path}")
+    return [path for _, path in selected], [label for label, _ in selected], class_names
+
+
+def _index_dataset(paths, labels, num_classes, img_size, batch_size, label_mode, shuffle=False, seed=None):
+    def load(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, img_size, method="bilinear")
+        return image, tf.one_hot(label, num_classes) if label_mode == "categorical" else label
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if shuffle:
+        ds = ds.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    return ds.map(load, num_parallel_calls=tf.data.AUTOTUNE).batch(batch_size)
+
+
+def is_index(source):
+    return str(source).lower().endswith((".csv", ".db"))
+
+
+def image_dataset(source, split, img_size, batch_size=32, label_mode="int"):
+    """
+    Unshuffled (dataset, file_paths, class_names) for one split. `source` is
+    either that split's <breed>/<image> folder or a split index (.csv/.db), so
+    code that needs the file list (feature/teacher caches) works with both.
+    """
+    if is_index(source):
+        paths, labels, class_names = split_files(source, split)
+        ds = _index_dataset(paths, labels, len(class_names), img_size, batch_size, label_mode)
+        return ds, paths, class_names
+    ds = tf.keras.preprocessing.image_dataset_from_directory(
+        source, image_size=img_size, batch_size=batch_size, label_mode=label_mode, shuffle=False)
+    return ds, list(ds.file_paths), list(ds.class_names)
+
+
+def dataset_from_index(index_path, split, img_size=(300, 300), batch_size=32, shuffle=False, seed=None):
+    paths, labels, class_names = split_files(index_path, split)
+    ds = _index_dataset(paths, labels, len(class_names), img_size, batch_size, "categorical", shuffle, seed)
+    return ds.prefetch(tf.data.AUTOTUNE)
@@ -0,0 +1,187 @@
+import argparse
+import json
+import os
+import random
+import time
+
+import tensorflow as tf
+
+from index_dataset import index_class_names, is_index, split_files
+
+# ============================================================
+# 🧩 Sharded, pre-decoded dataset (TFRecord)
+# ============================================================
+# Decodes every image once, resizes it to the training resolution and
+# writes raw uint8 pixels into TFRecord shards, so training epochs no
+# longer decode JPEGs or upsample 224 → 300. Each record carries its
+# label index and breed name; <split>_index.json lists the shards, the
+# ordered class names and the image size.
+#
+#   python shard_dataset.py final_dataset --out final_dataset_shards --shard-size 1024
+#
+# Training reads them back with `load_split()` (see USE_SHARDS in train.py).
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def list_split(split_dir, class_names):
+    items = []
+    for index, breed in enumerate(class_names):
+        breed_dir = os.path.join(split_dir, breed)
+        if not os.path.isdir(breed_dir):
+            continue
+        items += [(os.path.join(breed_dir, f), index) for f in sorted(os.listdir(breed_dir))
+                  if f.lower().endswith(IMAGE_EXTENSIONS)]
+    return items
+
+
+def _decode(path, img_size):
+    # Same decode/resize as image_dataset_from_directory, rounded to uint8
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, img_size, method="bilinear")
+    return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8)
+
+
+def _example(image, label, breed):
+    feature = {
+        "image": tf.train.Feature(bytes_list=tf.train.BytesList(value=[image.tobytes()])),
+        "label": tf.train.Feature(int64_list=tf.train.Int64List(value=[label])),
+        "breed": tf.train.Feature(bytes_list=tf.train.BytesList(value=[breed.encode("utf-8")])),
+    }
+    return tf.train.Example(features=tf.train.Features(feature=feature)).SerializeToString()
+
+# ============================================================
+# 🧩 Writer
+# ============================================================
+def write_split(data_dir, out_dir, split, class_names, img_size=(300, 300), shard_size=1024, seed=42):
+    """Shards for one split of `data_dir` (a <split>/<breed>/ tree or a split index .csv/.db)."""
+    if is_index(data_dir):
+        paths, labels, index_classes = split_files(data_dir, split)
+        class_index = {name: i for i, name in enumerate(class_names)}
+        items = [(path, class_index[index_classes[label]]) for path, label in zip(paths, labels)]
+    else:
+        items = list_split(os.path.join(data_dir, split), class_names)
+    # Mix breeds across shards so a few interleaved shards already look shuffled
+    random.Random(seed).shuffle(items)
+    os.makedirs(out_dir, exist_ok=True)
+
+    paths = tf.data.Dataset.from_tensor_slices(([p for p, _ in items], [l for _, l in items]))
+    decoded = paths.map(lambda p, l: (_decode(p, img_size), l),
+                        num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+    shards, writer = [], None
+    start = time.perf_counter()
+    for i, (image, label) in enumerate(decoded.as_numpy_iterator()):
+        if i % shard_size == 0:
+            if writer:
+                writer.close()
+            name = f"{split}-{len(shards):05d}.tfrecord"
+            shards.append(name)
+            writer = tf.io.TFRecordWriter(os.path.join(out_dir, name))
+        writer.write(_example(image, int(label), class_names[label]))
+    if writer:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    index = {
+        "split": split,
+        "num_images": len(items),
+        "image_size": list(img_size),
+        "class_names": class_names,
+        "shards": shards,
+    }
+    with open(os.path.join(out_dir, f"{split}_index.json"), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    print(f"✅ {split}: {len(items)} images → {len(shards)} shards "
+          f"({elapsed:.0f}s, {len(items) / max(elapsed, 1e-9):.0f} images/sec)")
+    return index
+
+# ============================================================
+# 🧩 Loader
+# ============================================================
+def load_split(shard_dir, split, batch_size=32, shuffle=False, cache=False,
+               shuffle_buffer=2048, label_mode="categorical", seed=None):
+    """
+    tf.data pipeline equivalent to image_dataset_from_directory(...,
+    label_mode='categorical'): float32 images in [0, 255] and one-hot labels.
+    `cache=True` keeps the decoded uint8 records in memory after epoch 1.
+    """
+    with open(os.path.join(shard_dir, f"{split}_index.json"), encoding="utf-8") as f:
+        index = json.load(f)
+    height, width = index["image_size"]
+    num_classes = len(index["class_names"])
+    files = [os.path.join(shard_dir, name) for name in index["shards"]]
+
+    def parse(record):
+        parsed = tf.io.parse_single_example(record, {
+            "image": tf.io.FixedLenFeature([], tf.string),
+            "label": tf.io.FixedLenFeature([], tf.int64),
+        })
+        image = tf.reshape(tf.io.decode_raw(parsed["image"], tf.uint8), (height, width, 3))
+        return image, parsed["label"]
+
+    ds = tf.data.Dataset.from_tensor_slices(files)
+    if shuffle:
+        ds = ds.shuffle(len(files), seed=seed)
+    ds = ds.interleave(tf.data.TFRecordDataset, cycle_length=min(len(files), 8),
+                       num_parallel_calls=tf.data.AUTOTUNE, deterministic=not shuffle)
+    ds = ds.map(parse, num_parallel_calls=tf.data.AUTOTUNE)
+    if cache:
+        ds = ds.cache()
+    if shuffle:
+        ds = ds.shuffle(shuffle_buffer, seed=seed)
+
+    def to_model_input(images, labels):
+        if label_mode == "categorical":
+            labels = tf.one_hot(labels, num_classes)
+        return tf.cast(images, tf.float32), labels
+
+    ds = ds.batch(batch_size).map(to_model_input, num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.prefetch(tf.data.AUTOTUNE)
+
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """
+    Prints wall time per epoch and how much of it was spent waiting for
+    input (gaps between one train batch ending and the next beginning).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.history = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = self._last_end = time.perf_counter()
+        self._stall = 0.0
+
+    def on_train_batch_begin(self, batch, logs=None):
+        self._stall += time.perf_counter() - self._last_end
+
+    def on_train_batch_end(self, batch, logs=None):
+        self._last_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        wall = time.perf_counter() - self._epoch_start
+        self.history.append({"epoch": epoch, "wall_seconds": wall, "input_stall_seconds": self._stall})
+        print(f"⏱️  Epoch {epoch + 1}: {wall:.1f}s wall, {self._stall:.1f}s waiting for input "
+              f"({self._stall / max(wall, 1e-9) * 100:.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write final_dataset splits as pre-decoded TFRecord shards")
+    parser.add_argument("data_dir", nargs="?", default="final_dataset",
+                        help="dataset folder, the cleaned dataset's split index .csv or a dataset_index.py .db")
+    parser.add_argument("--out", default="final_dataset_shards")
+    parser.add_argument("--splits", nargs="+", default=["train", "val", "test"])
+    parser.add_argument("--img-size", type=int, nargs=2, default=(300, 300), metavar=("H", "W"))
+    parser.add_argument("--shard-size", type=int, default=1024, help="images per shard")
+    args = parser.parse_args()
+
+    if is_index(args.data_dir):
+        class_names = index_class_names(args.data_dir)
+    else:
+        train_dir = os.path.join(args.data_dir, "train")
+        class_names = sorted(d for d in os.listdir(train_dir) if os.path.isdir(os.path.join(train_dir, d)))
+    print(f"📊 {len(class_names)} classes")
+    for split in args.splits:
+        write_split(args.data_dir, args.out, split, class_names, tuple(args.img_size), args.shard_size)
@@ -31,20 +31,51 @@ test_dir  = os.path.join(base_dir, 'test')
 model_path = os.path.join(base_dir, 'efficientnetb3_best.h5')
 final_model_path = os.path.join(base_dir, 'efficientnetb3_final.h5')
 log_path = os.path.join(base_dir, 'training_log.csv')
+# Index of the cleaned dataset (splits.csv written next to its output by
+# DataCleaning/.../clean_dataset.py); when set, images are read from the paths
+# it lists instead of the train/val/test folders. Not the raw index from
+# split_index.py build, which lists uncleaned images.
+split_index_path = None
+# SQLite index from dataset_index.py (refreshed with --root base_dir); when
+# set, classes and files come from it instead of walking the folders on the
+# Drive mount. split_index_path takes precedence.
+dataset_index_db = None
 
 # ============================================================
 # ✅ Verify Dataset Folders
 # ============================================================
-for d in [train_dir, val_dir, test_dir]:
-    if not os.path.exists(d):
-        raise FileNotFoundError(f"Directory not found: {d}")
+if split_index_path:
+    if not os.path.exists(split_index_path):
+        raise FileNotFoundError(f"Split index not found: {split_index_path}")
+else:
+    for d in [train_dir, val_dir, test_dir]:
+        if not os.path.exists(d):
+            raise FileNotFoundError(f"Directory not found: {d}")
+
+    if not dataset_index_db:
+        print("Dataset folders exist. Train classes:", os.listdir(train_dir))
 
-print("Dataset folders exist. Train classes:", os.listdir(train_dir))
+# What the datasets and caches below read each split from: the split index
+# (no physical train/val/test tree needed) or the dataset index when set,
+# otherwise the folders
+index_source = split_index_path or dataset_index_db
+train_source = index_source or train_dir
+val_source = index_source or val_dir
+test_source = index_source or test_dir
 
 # ============================================================
 # ✅ Detect Number of Classes
 # ============================================================
-NUM_CLASSES = len(os.listdir(train_dir))
+if split_index_path:
+    from index_dataset import index_class_names
+    NUM_CLASSES = len(index_class_names(split_index_path))
+elif dataset_index_db:
+    from index_dataset import index_labels
+    class_names = index_labels(dataset_index_db)
+    print("Train classes (from dataset index):", class_names)
+    NUM_CLASSES = len(class_names)
+else:
+    NUM_CLASSES = len(os.listdir(train_dir))
 print(f"Detected {NUM_CLASSES} dog breeds.")
 
 # ============================================================
@@ -65,6 +96,69 @@ EPOCHS = 50
 FINE_TUNE_EPOCHS = 20
 AUTOTUNE = tf.data.AUTOTUNE
 
+# Stage 1 from cached backbone features (see feature_cache.py): the frozen
+# backbone runs once per view instead of once per image per epoch
+USE_FEATURE_CACHE = False
+FEATURE_CACHE_VIEWS = 5          # view 0 = plain image, the rest augmented
+feature_cache_dir = os.path.join(base_dir, 'feature_cache')
+
+# Read pre-decoded TFRecord shards written by shard_dataset.py instead of JPEG folders;
+# with a split index, build them from it: python shard_dataset.py <splits.csv>
+USE_SHARDS = False
+CACHE_SHARDS_IN_MEMORY = False   # keeps decoded train/val records in RAM after epoch 1
+shard_dir = os.path.join(os.path.dirname(base_dir), 'final_dataset_shards')
+
+# Distillation mode (see distill.py): train a smaller student against the
+# served EfficientNetB3 instead of training the B3 itself. Set to
+# "efficientnetb0", "mobilenetv3large" or "mobilenetv3small"; reads the
+# train/val/test folders, or the split index when set.
+DISTILL_STUDENT = None
+STUDENT_IMG_SIZE = (224, 224)
+DISTILL_EPOCHS = 40
+DISTILL_TEMPERATURE = 4.0
+DISTILL_ALPHA = 0.3              # weight of the true-label loss; the rest follows the teacher
+teacher_path = os.path.join(base_dir, 'efficientnetb3_clean_rgb.h5')
+teacher_cache_dir = os.path.join(base_dir, 'teacher_cache')
+
+# ============================================================
+# ✅ Distillation (replaces the B3 training below when enabled)
+# ============================================================
+if DISTILL_STUDENT:
+    import sys
+    from distill import (build_teacher_cache, distillation_dataset, distillation_loss,
+                         distillation_accuracy, build_student, write_sidecar, compare_models)
+
+    student_path = os.path.join(base_dir, f'{DISTILL_STUDENT}_student.h5')
+    train_logp, train_labels, train_files, class_names = build_teacher_cache(
+        teacher_path, train_source, teacher_cache_dir, 'train', BATCH_SIZE)
+    val_logp, val_labels, val_files, _ = build_teacher_cache(
+        teacher_path, val_source, teacher_cache_dir, 'val', BATCH_SIZE)
+
+    student = build_student(DISTILL_STUDENT, NUM_CLASSES, STUDENT_IMG_SIZE)
+    student.compile(
+        optimizer=Adam(learning_rate=tf.keras.optimizers.schedules.CosineDecay(1e-3, 20000)),
+        loss=distillation_loss(NUM_CLASSES, DISTILL_TEMPERATURE, DISTILL_ALPHA),
+        metrics=[distillation_accuracy(NUM_CLASSES)]
+    )
+    student.fit(
+        distillation_dataset(train_files, train_labels, train_logp, STUDENT_IMG_SIZE, BATCH_SIZE, shuffle=True),
+        validation_data=distillation_dataset(val_files, val_labels, val_logp, STUDENT_IMG_SIZE, BATCH_SIZE),
+        epochs=DISTILL_EPOCHS,
+        callbacks=[
+            ModelCheckpoint(filepath=student_path, monitor='val_accuracy', save_best_only=True, verbose=1),
+            EarlyStopping(monitor='val_accuracy', mode='max', patience=8, restore_best_weights=True, verbose=1),
+            CSVLogger(os.path.join(base_dir, f'{DISTILL_STUDENT}_distill_log.csv')),
+        ]
+    )
+    student.save(student_path)
+    sidecar = write_sidecar(student_path, class_names, STUDENT_IMG_SIZE, teacher_path)
+    print(f"✅ Student saved at {student_path} (labels and input settings in {sidecar})")
+
+    print("\n📊 Teacher vs student on the test set...")
+    compare_models({"teacher": teacher_path, "student": student_path}, test_source,
+                   os.path.join(base_dir, f'{DISTILL_STUDENT}_vs_teacher.json'), BATCH_SIZE)
+    sys.exit(0)
+
 # ============================================================
 # ✅ Data Augmentation
 # ============================================================
@@ -79,29 +173,40 @@ data_augmentation = tf.keras.Sequential([
 # ============================================================
 # ✅ Datasets
 # ============================================================
-train_dataset = tf.keras.preprocessing.image_dataset_from_directory(
-    train_dir,
-    image_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    label_mode='categorical',
-    shuffle=True
-).prefetch(AUTOTUNE)
-
-val_dataset = tf.keras.preprocessing.image_dataset_from_directory(
-    val_dir,
-    image_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    label_mode='categorical',
-    shuffle=False
-).prefetch(AUTOTUNE)
-
-test_dataset = tf.keras.preprocessing.image_dataset_from_directory(
-    test_dir,
-    image_size=IMG_SIZE,
-    batch_size=BATCH_SIZE,
-    label_mode='categorical',
-    shuffle=False
-).prefetch(AUTOTUNE)
+if USE_SHARDS:
+    from shard_dataset import load_split
+    train_dataset = load_split(shard_dir, 'train', BATCH_SIZE, shuffle=True, cache=CACHE_SHARDS_IN_MEMORY)
+    val_dataset = load_split(shard_dir, 'val', BATCH_SIZE, cache=CACHE_SHARDS_IN_MEMORY)
+    test_dataset = load_split(shard_dir, 'test', BATCH_SIZE)
+elif index_source:
+    from index_dataset import dataset_from_index
+    train_dataset = dataset_from_index(index_source, 'train', IMG_SIZE, BATCH_SIZE, shuffle=True)
+    val_dataset = dataset_from_index(index_source, 'val', IMG_SIZE, BATCH_SIZE)
+    test_dataset = dataset_from_index(index_source, 'test', IMG_SIZE, BATCH_SIZE)
+else:
+    train_dataset = tf.keras.preprocessing.image_dataset_from_directory(
+        train_dir,
+        image_size=IMG_SIZE,
+        batch_size=BATCH_SIZE,
+        label_mode='categorical',
+        shuffle=True
+    ).prefetch(AUTOTUNE)
+
+    val_dataset = tf.keras.preprocessing.image_dataset_from_directory(
+        val_dir,
+        image_size=IMG_SIZE,
+        batch_size=BATCH_SIZE,
+        label_mode='categorical',
+        shuffle=False
+    ).prefetch(AUTOTUNE)
+
+    test_dataset = tf.keras.preprocessing.image_dataset_from_directory(
+        test_dir,
+        image_size=IMG_SIZE,
+        batch_size=BATCH_SIZE,
+        label_mode='categorical',
+        shuffle=False
+    ).prefetch(AUTOTUNE)
 
 # ============================================================
 # ✅ Learning Rate Scheduler
@@ -130,7 +235,9 @@ early_stop = EarlyStopping(
     verbose=1
 )
 csv_logger = CSVLogger(log_path, append=True)
-callbacks = [checkpoint_cb, early_stop, csv_logger]
+from shard_dataset import EpochTimer
+epoch_timer = EpochTimer()   # per-epoch wall time and input-pipeline stall time
+callbacks = [checkpoint_cb, early_stop, csv_logger, epoch_timer]
 
 # ============================================================
 # ✅ Model Definition or Resume
@@ -181,13 +288,40 @@ if os.path.exists(log_path):
 # ============================================================
 if not fine_tuning_started:
     print("\n🔥 Stage 1: Training frozen EfficientNetB3...")
-    history_1 = model.fit(
-        train_dataset,
-        validation_data=val_dataset,
-        epochs=EPOCHS,
-        initial_epoch=initial_epoch,
-        callbacks=callbacks
-    )
+    if USE_FEATURE_CACHE:
+        from feature_cache import build_feature_cache, head_model, CachedFeatureSequence
+
+        augmentation = model.get_layer("data_augmentation")
+        train_feats, train_labels = build_feature_cache(
+            model, train_source, feature_cache_dir, 'train', IMG_SIZE, BATCH_SIZE,
+            views=FEATURE_CACHE_VIEWS, augmentation=augmentation)
+        val_feats, val_labels = build_feature_cache(
+            model, val_source, feature_cache_dir, 'val', IMG_SIZE, BATCH_SIZE)
+
+        # The head shares its layers with `model`, so its weights land in the full model
+        head = head_model(model)
+        head.compile(
+            optimizer=Adam(learning_rate=lr_schedule),
+            loss=tf.keras.losses.CategoricalCrossentropy(label_smoothing=0.1),
+            metrics=['accuracy']
+        )
+        history_1 = head.fit(
+            CachedFeatureSequence(train_feats, train_labels, NUM_CLASSES, BATCH_SIZE),
+            validation_data=CachedFeatureSequence(val_feats, val_labels, NUM_CLASSES, BATCH_SIZE, shuffle=False),
+            epochs=EPOCHS,
+            initial_epoch=initial_epoch,
+            callbacks=[early_stop, csv_logger, epoch_timer]
+        )
+        model.save(model_path)
+        print(f"✅ Stage 1 head trained from cached features, full model saved at {model_path}")
+    else:
+        history_1 = model.fit(
+            train_dataset,
+            validation_data=val_dataset,
+            epochs=EPOCHS,
+            initial_epoch=initial_epoch,
+            callbacks=callbacks
+        )
 
     # Fine-tune last 100 layers
     print("\n🎯 Stage 2: Fine-tuning last 100 layers...")